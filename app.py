@@ -6,23 +6,27 @@
 import os
 import sys
 import json
+import hashlib
 import time
 import tempfile
 import logging
+import shutil
+import traceback
 import gradio as gr
 from typing import List, Tuple, Dict, Any, Optional
 from pathlib import Path
 import re
+import functools
+from collections import OrderedDict
 
 # 加载补丁
 from patch_openai import patch_openai_client, patch_langchain_openai
 
 # 加载环境变量
 from dotenv import load_dotenv
-if os.path.exists(".env"):
-    load_dotenv(".env")
-elif os.path.exists("env.local"):
-    load_dotenv("env.local")
+env_file = next((p for p in (".env", "env.local") if os.path.exists(p)), None)
+if env_file:
+    load_dotenv(env_file)
 
 # LangSmith Tracing 初始化
 # 确保环境变量已设置，并显式初始化，以保证追踪的可靠性
@@ -52,12 +56,30 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 已确认存在的目录，避免重复的makedirs系统调用
+_created_dirs = set()
+
+def ensure_dir(dir_path):
+    """确保目录存在，同一路径在进程内只创建一次"""
+    if dir_path not in _created_dirs:
+        os.makedirs(dir_path, exist_ok=True)
+        _created_dirs.add(dir_path)
+
 # 确保输出目录存在
-os.makedirs("output", exist_ok=True)
-os.makedirs("output/raw", exist_ok=True)
-os.makedirs("output/plan", exist_ok=True)
-os.makedirs("output/tex", exist_ok=True)
-os.makedirs("static/themes", exist_ok=True)
+for dir_path in ["output/raw", "output/plan", "output/tex", "static/themes"]:
+    ensure_dir(dir_path)
+
+# \usetheme总是出现在导言区，只需读取TEX文件开头部分
+_RE_USETHEME = re.compile(r'\\usetheme\{([^}]+)\}')
+THEME_SCAN_BYTES = 8192
+
+# 演示计划缓存目录：相同PDF内容、模型和语言直接复用已生成的计划
+# 可通过环境变量PLAN_CACHE_DIR修改，设为空字符串则禁用缓存
+PLAN_CACHE_DIR = os.environ.get("PLAN_CACHE_DIR", os.path.join("cache", "plans"))
+# 计划缓存格式变化时递增，使旧的缓存条目失效
+PLAN_CACHE_VERSION = 1
+# 决定演示计划内容的源文件（提示词、内容提取和规划代码），修改后旧的缓存条目自动失效
+PLAN_CACHE_SOURCES = ["prompts.py", "modules/pdf_parser.py", "modules/lightweight_extractor.py", "modules/lightweight_planner.py"]
 
 # 定义可用的Beamer主题
 AVAILABLE_THEMES = [
@@ -66,8 +88,20 @@ AVAILABLE_THEMES = [
     "CambridgeUS", "Boadilla", "Pittsburgh", "Rochester"
 ]
 
-# 存储当前会话的规划器实例
-active_planners = {}
+# 存储当前会话的规划器实例，按最近使用顺序排列，超过上限时淘汰最久未用的会话
+active_planners = OrderedDict()
+MAX_SESSIONS = 64
+
+def _touch(session_id):
+    """将会话标记为最近使用，并在超过上限时淘汰最旧的会话"""
+    active_planners.move_to_end(session_id)
+    while len(active_planners) > MAX_SESSIONS:
+        active_planners.popitem(last=False)
+
+def _plan_hash(presentation_plan):
+    """计算演示计划序列化后的哈希，用于判断计划是否发生变化"""
+    serialized = json.dumps(presentation_plan, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode('utf-8')).hexdigest()
 
 # 主题预览图片路径
 def get_theme_preview_path(theme_name):
@@ -79,14 +113,93 @@ def get_theme_preview_path(theme_name):
         # 返回占位图片路径
         return os.path.join("static", "themes", "placeholder.png")
 
+def find_latest_file(dir_path, suffix):
+    """
+    在目录中查找指定后缀的最新文件（单次scandir遍历）
+    
+    Args:
+        dir_path: 目录路径
+        suffix: 文件后缀，如.json
+        
+    Returns:
+        Optional[str]: 最新文件的完整路径，没有匹配文件时返回None
+    """
+    latest_path, latest_mtime = None, None
+    with os.scandir(dir_path) as entries:
+        for entry in entries:
+            if entry.name.endswith(suffix) and entry.is_file():
+                mtime = entry.stat().st_mtime
+                if latest_mtime is None or mtime > latest_mtime:
+                    latest_path, latest_mtime = entry.path, mtime
+    return latest_path
+
+@functools.lru_cache(maxsize=1)
+def _plan_cache_fingerprint():
+    """计算缓存版本和决定演示计划内容的源文件的哈希，进程内只计算一次"""
+    digest = hashlib.sha256(str(PLAN_CACHE_VERSION).encode('utf-8'))
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    for source in PLAN_CACHE_SOURCES:
+        try:
+            with open(os.path.join(base_dir, source), 'rb') as f:
+                digest.update(f.read())
+        except OSError:
+            digest.update(source.encode('utf-8'))
+    return digest.hexdigest()
+
+def get_plan_cache_path(pdf_file, model_name, language):
+    """
+    根据PDF文件内容、模型名称、语言以及提示词和规划代码的指纹计算演示计划缓存文件路径
+
+    提取出的内容JSON经过LLM增强，每次运行都会略有不同，
+    因此以原始PDF字节作为缓存键
+
+    Args:
+        pdf_file: PDF文件路径
+        model_name: 语言模型名称
+        language: 输出语言
+
+    Returns:
+        Optional[str]: 缓存文件路径，缓存被禁用时返回None
+    """
+    if not PLAN_CACHE_DIR:
+        return None
+    digest = hashlib.sha256()
+    with open(pdf_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(f"|{model_name}|{language}|{_plan_cache_fingerprint()}".encode('utf-8'))
+    digest = digest.hexdigest()
+    return os.path.join(PLAN_CACHE_DIR, f"{digest}.json")
+
+def load_cached_plan(cache_path):
+    """读取缓存的演示计划，缓存被禁用、不存在或损坏时返回None"""
+    if not cache_path:
+        return None
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_cached_plan(cache_path, presentation_plan):
+    """将演示计划写入缓存，先写临时文件再替换，避免并发读到半个文件"""
+    ensure_dir(PLAN_CACHE_DIR)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(presentation_plan, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"写入演示计划缓存失败: {str(e)}")
+
 def update_theme_preview(theme_name):
     """更新主题预览图片"""
     preview_path = get_theme_preview_path(theme_name)
     return preview_path
 
-def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", max_retries=5):
+def iter_process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", max_retries=5):
     """
-    处理PDF文件，生成Beamer幻灯片
+    处理PDF文件，生成Beamer幻灯片，并在每个步骤产生日志时返回中间进度
     
     Args:
         pdf_file: 上传的PDF文件路径
@@ -95,13 +208,15 @@ def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", ma
         theme: Beamer主题，如Madrid, Berlin, Singapore等
         max_retries: 编译失败时的最大重试次数
         
-    Returns:
-        Tuple[str, str, List[str], str]: (状态信息, 生成的PDF文件路径, 日志消息列表, 会话ID)
+    Yields:
+        Tuple[str, str, List[str], str]: (状态信息, 生成的PDF文件路径, 日志消息列表, 会话ID)；
+        处理过程中状态信息为None，最后一项为最终结果
     """
     # 检查API密钥
     api_key = os.environ.get("OPENAI_API_KEY")
     if not api_key:
-        return "错误：未设置OPENAI_API_KEY环境变量", None, ["未设置OPENAI_API_KEY环境变量，请检查环境配置"], None
+        yield "错误：未设置OPENAI_API_KEY环境变量", None, ["未设置OPENAI_API_KEY环境变量，请检查环境配置"], None
+        return
     
     # 使用唯一的会话ID来区分不同的请求
     session_id = f"{int(time.time())}"
@@ -115,56 +230,89 @@ def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", ma
     
     # 创建目录
     for dir_path in [raw_dir, plan_dir, tex_dir, img_dir]:
-        os.makedirs(dir_path, exist_ok=True)
+        ensure_dir(dir_path)
     
     try:
         # 步骤1: 提取PDF内容
         log_message = "步骤1: 提取PDF内容..."
         logger.info(log_message)
         logs.append(log_message)
+        yield None, None, logs, session_id
         
-        # 提取PDF内容
-        raw_content, raw_content_path = extract_pdf_content(pdf_file, raw_dir, cleanup_temp=False)
+        # 相同内容已生成过计划时直接复用；增强后的内容只用于生成计划，命中缓存时跳过LLM增强
+        cache_path = get_plan_cache_path(pdf_file, model_name, language)
+        cached_plan = load_cached_plan(cache_path)
+        
+        # 提取PDF内容（图片仍需提取，供TEX生成使用）
+        raw_content, raw_content_path = extract_pdf_content(
+            pdf_file, raw_dir, cleanup_temp=False, enable_llm_enhancement=cached_plan is None
+        )
         if not raw_content:
             log_message = "PDF内容提取失败"
             logger.error(log_message)
             logs.append(log_message)
-            return "错误：PDF内容提取失败", None, logs, None
+            yield "错误：PDF内容提取失败", None, logs, None
+            return
         
         log_message = f"PDF内容已保存到: {raw_content_path}"
         logger.info(log_message)
         logs.append(log_message)
+        yield None, None, logs, session_id
         
         # 步骤2: 生成演示计划
         log_message = "步骤2: 生成演示计划..."
         logger.info(log_message)
         logs.append(log_message)
+        yield None, None, logs, session_id
         
-        # 直接从原始内容生成演示计划，并获取规划器实例
-        presentation_plan, plan_path, planner = generate_presentation_plan(
-            raw_content_path=raw_content_path,
-            output_dir=plan_dir,
-            model_name=model_name,
-            language=language
-        )
-        
+        # 命中缓存时直接使用已有计划，跳过语言模型调用
+        presentation_plan = cached_plan
+        if presentation_plan:
+            planner = PresentationPlanner(
+                raw_content_path=raw_content_path,
+                output_dir=plan_dir,
+                model_name=model_name,
+                language=language
+            )
+            planner.set_presentation_plan(presentation_plan)
+            plan_path = planner.save_presentation_plan(presentation_plan)
+
+            log_message = f"命中演示计划缓存: {cache_path}"
+            logger.info(log_message)
+            logs.append(log_message)
+        else:
+            # 直接从原始内容生成演示计划，并获取规划器实例
+            presentation_plan, plan_path, planner = generate_presentation_plan(
+                raw_content_path=raw_content_path,
+                output_dir=plan_dir,
+                model_name=model_name,
+                language=language
+            )
+            if presentation_plan and cache_path:
+                save_cached_plan(cache_path, presentation_plan)
+
         if not presentation_plan:
             log_message = "演示计划生成失败"
             logger.error(log_message)
             logs.append(log_message)
-            return "错误：演示计划生成失败", None, logs, None
+            yield "错误：演示计划生成失败", None, logs, None
+            return
         
         # 保存规划器实例，以便后续对话使用
+        planner._last_plan_hash = _plan_hash(presentation_plan)
         active_planners[session_id] = planner
+        _touch(session_id)
         
         log_message = f"演示计划已保存到: {plan_path}"
         logger.info(log_message)
         logs.append(log_message)
+        yield None, None, logs, session_id
         
         # 步骤3: 运行TEX工作流（生成TEX并编译）
         log_message = "步骤3: 生成和编译TEX..."
         logger.info(log_message)
         logs.append(log_message)
+        yield None, None, logs, session_id
         
         success, message, pdf_path = run_tex_workflow(
             presentation_plan_path=plan_path,
@@ -186,7 +334,8 @@ def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", ma
             logger.info(log_message)
             logs.append(log_message)
             
-            return "成功：幻灯片生成完成", abs_pdf_path, logs, session_id
+            yield "成功：幻灯片生成完成", abs_pdf_path, logs, session_id
+            return
         else:
             log_message = f"TEX生成和编译失败: {message}"
             logger.error(log_message)
@@ -197,9 +346,11 @@ def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", ma
             if os.path.exists(tex_file):
                 abs_tex_path = os.path.abspath(tex_file)
                 logs.append(f"TEX文件已生成，您可以手动编译: {abs_tex_path}")
-                return "部分成功：TEX文件已生成，但编译失败", abs_tex_path, logs, session_id
+                yield "部分成功：TEX文件已生成，但编译失败", abs_tex_path, logs, session_id
+                return
             else:
-                return "错误：TEX文件生成失败", None, logs, session_id
+                yield "错误：TEX文件生成失败", None, logs, session_id
+                return
     
     except Exception as e:
         log_message = f"处理PDF时出错: {str(e)}"
@@ -207,28 +358,62 @@ def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", ma
         logs.append(log_message)
         
         # 打印完整的错误堆栈
-        import traceback
         error_stack = traceback.format_exc()
         logger.error(error_stack)
-        return f"错误：{str(e)}", None, logs, None
+        yield f"错误：{str(e)}", None, logs, None
+
+def process_pdf(pdf_file, language="zh", model_name="gpt-4o", theme="Madrid", max_retries=5):
+    """
+    处理PDF文件，生成Beamer幻灯片
+    
+    Args:
+        pdf_file: 上传的PDF文件路径
+        language: 输出语言，zh为中文，en为英文
+        model_name: 要使用的语言模型名称
+        theme: Beamer主题，如Madrid, Berlin, Singapore等
+        max_retries: 编译失败时的最大重试次数
+        
+    Returns:
+        Tuple[str, str, List[str], str]: (状态信息, 生成的PDF文件路径, 日志消息列表, 会话ID)
+    """
+    result = None
+    for result in iter_process_pdf(pdf_file, language, model_name, theme, max_retries):
+        pass
+    return result
 
 def process_and_return(pdf_file, language, model_name, theme, max_retries):
-    """Gradio界面调用的处理函数"""
-    status, result_path, logs, session_id = process_pdf(pdf_file, language, model_name, theme, max_retries)
-    logs_text = "\n".join(logs)
-    
-    # 返回处理结果
-    if result_path and os.path.exists(result_path):
-        file_extension = os.path.splitext(result_path)[1].lower()
-        if file_extension == ".pdf":
-            return status, result_path, logs_text, result_path, session_id or ""
+    """Gradio界面调用的处理函数，以流式方式逐步输出日志"""
+    logs_text = ""
+    joined_count = 0
+    started = False
+    for status, result_path, logs, session_id in iter_process_pdf(pdf_file, language, model_name, theme, max_retries):
+        # 只拼接新增的日志行，避免每一步都重新join全部日志
+        if len(logs) > joined_count:
+            new_text = "\n".join(logs[joined_count:])
+            logs_text = f"{logs_text}\n{new_text}" if logs_text else new_text
+            joined_count = len(logs)
+        
+        # 处理中：首次清空上一次的结果，之后只刷新日志，其余组件不重复传输
+        if status is None:
+            if not started:
+                started = True
+                yield "处理中...", "", logs_text, None, ""
+            else:
+                yield gr.update(), gr.update(), logs_text, gr.update(), gr.update()
+            continue
+        
+        # 返回处理结果
+        if result_path and os.path.exists(result_path):
+            file_extension = os.path.splitext(result_path)[1].lower()
+            if file_extension == ".pdf":
+                yield status, result_path, logs_text, result_path, session_id or ""
+            else:
+                # 如果是TEX文件，返回文本内容
+                with open(result_path, 'r', encoding='utf-8') as f:
+                    tex_content = f.read()
+                yield status, tex_content, logs_text, None, session_id or ""
         else:
-            # 如果是TEX文件，返回文本内容
-            with open(result_path, 'r', encoding='utf-8') as f:
-                tex_content = f.read()
-            return status, tex_content, logs_text, None, session_id or ""
-    else:
-        return status, "没有生成任何输出文件", logs_text, None, session_id or ""
+            yield status, "没有生成任何输出文件", logs_text, None, session_id or ""
 
 def chat_with_planner(session_id, user_message, chat_history):
     """
@@ -251,15 +436,18 @@ def chat_with_planner(session_id, user_message, chat_history):
     
     # 获取规划器实例
     planner = active_planners[session_id]
+    _touch(session_id)
     
     try:
         # 处理用户消息
         response, updated_plan = planner.continue_conversation(user_message)
         
-        # 保存更新后的计划
+        # 保存更新后的计划，计划未变化时跳过写盘
         if updated_plan:
-            plan_dir = os.path.join("output", "plan", session_id)
-            plan_path = planner.save_presentation_plan(updated_plan)
+            plan_hash = _plan_hash(updated_plan)
+            if plan_hash != getattr(planner, "_last_plan_hash", None):
+                planner.save_presentation_plan(updated_plan)
+                planner._last_plan_hash = plan_hash
             
             # 更新聊天历史
             return chat_history + [
@@ -274,7 +462,6 @@ def chat_with_planner(session_id, user_message, chat_history):
     
     except Exception as e:
         logger.error(f"对话处理出错: {str(e)}")
-        import traceback
         logger.error(traceback.format_exc())
         return chat_history + [
             {"role": "user", "content": user_message},
@@ -299,6 +486,7 @@ def regenerate_pdf(session_id, theme, chat_history):
     
     # 获取规划器实例和计划
     planner = active_planners[session_id]
+    _touch(session_id)
     presentation_plan = planner.presentation_plan
     
     if not presentation_plan:
@@ -306,7 +494,7 @@ def regenerate_pdf(session_id, theme, chat_history):
     
     # 准备输出目录
     tex_dir = os.path.join("output", "tex", session_id)
-    os.makedirs(tex_dir, exist_ok=True)
+    ensure_dir(tex_dir)
     
     # 保存更新后的计划
     plan_dir = os.path.join("output", "plan", session_id)
@@ -359,7 +547,6 @@ def regenerate_pdf(session_id, theme, chat_history):
         logs.append(log_message)
         
         # 打印完整的错误堆栈
-        import traceback
         error_stack = traceback.format_exc()
         logger.error(error_stack)
         logs.append(error_stack)
@@ -389,40 +576,34 @@ def revise_presentation(session_id, feedback, chat_history):
     plan_dir = os.path.join("output", "plan", session_id)
     tex_dir = os.path.join("output", "tex", session_id)
     
-    # 查找计划文件
-    plan_files = [f for f in os.listdir(plan_dir) if f.endswith(".json")]
-    if not plan_files:
+    # 查找计划文件，使用最新的计划文件
+    plan_file = find_latest_file(plan_dir, ".json")
+    if not plan_file:
         return chat_history + [
             {"role": "user", "content": feedback},
             {"role": "assistant", "content": "错误：找不到演示计划文件。"}
         ], None, "错误：找不到演示计划文件"
     
-    # 使用最新的计划文件
-    plan_file = os.path.join(plan_dir, plan_files[0])
-    
-    # 查找TEX文件
-    tex_files = [f for f in os.listdir(tex_dir) if f.endswith(".tex")]
-    if not tex_files:
+    # 查找TEX文件，使用最新的TEX文件
+    tex_file = find_latest_file(tex_dir, ".tex")
+    if not tex_file:
         return chat_history + [
             {"role": "user", "content": feedback},
             {"role": "assistant", "content": "错误：找不到TEX文件。"}
         ], None, "错误：找不到TEX文件"
     
-    # 使用最新的TEX文件
-    tex_file = os.path.join(tex_dir, tex_files[0])
-    
     # 创建修订版输出目录
     revision_dir = os.path.join(tex_dir, f"revision_{int(time.time())}")
-    os.makedirs(revision_dir, exist_ok=True)
+    ensure_dir(revision_dir)
     
     # 获取主题（从TEX文件中提取）
     theme = "Madrid"  # 默认主题
     try:
-        with open(tex_file, 'r', encoding='utf-8') as f:
-            tex_content = f.read()
-            theme_match = re.search(r'\\usetheme{([^}]+)}', tex_content)
-            if theme_match:
-                theme = theme_match.group(1)
+        with open(tex_file, 'rb') as f:
+            tex_head = f.read(THEME_SCAN_BYTES).decode('utf-8', errors='ignore')
+        theme_match = _RE_USETHEME.search(tex_head)
+        if theme_match:
+            theme = theme_match.group(1)
     except Exception as e:
         logger.warning(f"提取主题时出错: {str(e)}")
     
@@ -452,7 +633,6 @@ def revise_presentation(session_id, feedback, chat_history):
         
         # 将新生成的TEX文件复制到主TEX目录，以便后续修订
         try:
-            import shutil
             new_tex_file = os.path.join(revision_dir, os.path.basename(pdf_path).replace(".pdf", ".tex"))
             if os.path.exists(new_tex_file):
                 target_tex = os.path.join(tex_dir, f"output_revised_{int(time.time())}.tex")
@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估脚本公共模块
+运行子进程命令、解析生成脚本的输出；在当前进程中导入各项评估器并直接调用，
+省去每篇论文、每项指标启动一次Python解释器和重新加载模型的开销。
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import codecs
+import selectors
+import subprocess
+import hashlib
+import logging
+import threading
+import importlib
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# 文件锁仅在POSIX系统可用，缺失时只在进程内加锁
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# 给出line_handler时，run_command为排查失败保留的标准错误行数
+COMMAND_STDERR_TAIL_LINES = 50
+
+# 解析main.py输出中生成的.tex文件路径的正则，模块加载时编译一次
+MAIN_TEX_RE = re.compile(r"--previous-tex='([^']+\.tex)'")
+
+# 评估结果中的指标名到基准测试指标名的映射
+COVERAGE_KEYS = {"bertscore_f1": "bertscore_f1", "rouge_l": "rouge_l"}
+FIDELITY_KEYS = {"recall": "fidelity_recall", "precision": "fidelity_precision", "f1_score": "fidelity_f1_score"}
+LOGICAL_CHAIN_KEYS = {"average_score": "logical_chain_avg_score", "coherence_rate": "logical_chain_coherence_rate"}
+COHERENCE_KEYS = {"average_coherence_score": "text_figure_coherence"}
+
+# 评估脚本所在目录；各评估器以"目录名.脚本名"导入，同名的run_evaluation.py互不冲突
+EVAL_DIR = Path(__file__).resolve().parent
+
+# 评估器名称 -> (模块, 入口函数, 指标名映射, 日志中的名称)
+EVALUATORS = {
+    "coverage": ("content_coverage.run_evaluation", "main", COVERAGE_KEYS, "内容覆盖度"),
+    "fidelity": ("key_elements_fidelity.evaluate_fidelity", "run", FIDELITY_KEYS, "关键元素保真度"),
+    "logical_chain": ("logical_chain_strength.run_evaluation", "run_evaluation", LOGICAL_CHAIN_KEYS, "逻辑链条强度"),
+    "coherence": ("text_figure_coherence.run_evaluation", "run", COHERENCE_KEYS, "图文匹配度"),
+}
+
+# 内容覆盖度和保真度在本进程中加载BERTScore/CLIP模型，多篇论文并行时同一模型依次使用
+_MODEL_LOCKS = {"coverage": threading.Lock(), "fidelity": threading.Lock()}
+
+# 分数缓存：输入文件未变化时直接复用上次的分数，按写入顺序最多保留SCORE_CACHE_MAX_ENTRIES条
+SCORE_CACHE_PATH = EVAL_DIR / "_cache" / "scores.json"
+SCORE_CACHE_MAX_ENTRIES = 10000
+# 评估逻辑或分数定义变化时递增，使旧的缓存条目失效
+SCORE_CACHE_VERSION = 2
+_score_cache_lock = threading.Lock()
+
+# 基准集准备脚本及其输入的时间戳文件；输入图片未变化时跳过OCR
+PREPARE_GROUND_TRUTH_SCRIPT = EVAL_DIR / "key_elements_fidelity" / "prepare_ground_truth.py"
+GROUND_TRUTH_STAMP_NAME = ".gt_stamp"
+# 准备脚本在部分图片OCR出错时输出的错误日志
+GROUND_TRUTH_OCR_ERROR_RE = re.compile(r"\d+ 张图片OCR出错")
+# 生成流程中每个进程每分钟允许的语言模型请求数（见modules/llm_rate_limiter.py）
+LLM_REQUESTS_PER_MINUTE_ENV = "LLM_REQUESTS_PER_MINUTE"
+
+def run_command(command: List[str], env: Optional[Dict[str, str]] = None,
+                line_handler: Optional[Callable[[str], None]] = None) -> Tuple[bool, str, str]:
+    """
+    运行命令并返回其成功状态、标准输出和标准错误。
+
+    子进程的标准输出和标准错误边产生边读取，两个管道都不会写满阻塞子进程。
+    给出line_handler时，两个管道的每一行在产生时交给它处理且不再保留：返回的标准输出为空字符串，
+    标准错误只保留最后COMMAND_STDERR_TAIL_LINES行供失败时排查，内存占用与子进程的输出长度无关。
+    """
+    logger.info(f"运行命令: {' '.join(command)}")
+    # 没有额外变量时直接继承当前环境，无需复制
+    full_env = {**os.environ, **env} if env else None
+    try:
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=full_env,
+        )
+    except FileNotFoundError as e:
+        logger.error(f"找不到命令: {e}")
+        return False, "", str(e)
+
+    label = os.path.basename(command[1] if len(command) > 1 else command[0])
+    chunks = {process.stdout: [], process.stderr: []}
+    decoders = {pipe: codecs.getincrementaldecoder("utf-8")(errors="replace") for pipe in chunks}
+    pending = {pipe: "" for pipe in chunks}
+    stderr_tail = deque(maxlen=COMMAND_STDERR_TAIL_LINES)
+    with selectors.DefaultSelector() as selector:
+        for pipe in chunks:
+            selector.register(pipe, selectors.EVENT_READ)
+        while selector.get_map():
+            for key, _ in selector.select():
+                pipe = key.fileobj
+                data = os.read(pipe.fileno(), 65536)
+                text = decoders[pipe].decode(data, final=not data)
+                if line_handler is None:
+                    chunks[pipe].append(text)
+                # 按完整行处理实时输出，不完整的行留到下次拼接
+                lines = (pending[pipe] + text).split("\n")
+                pending[pipe] = lines.pop()
+                if not data:
+                    selector.unregister(pipe)
+                    pipe.close()
+                    if pending[pipe]:
+                        lines.append(pending[pipe])
+                for line in lines:
+                    logger.debug(f"[{label}] {line}")
+                    if line_handler is not None:
+                        line_handler(line)
+                        if pipe is process.stderr:
+                            stderr_tail.append(line)
+    process.wait()
+
+    stdout = "".join(chunks[process.stdout])
+    stderr = "\n".join(stderr_tail) if line_handler is not None else "".join(chunks[process.stderr])
+    if process.returncode != 0:
+        logger.error(f"命令失败: {' '.join(command)}")
+        logger.error(f"Stderr: {stderr}")
+        return False, stdout, stderr
+    return True, stdout, stderr
+
+def _ground_truth_stamp(dataset_path: Path) -> str:
+    """
+    由数据集中caption/graph图片的数量和最新修改时间，以及准备脚本的修改时间生成时间戳；
+    增删或修改图片、修改准备脚本都会改变它
+    """
+    mtimes = [image.stat().st_mtime_ns for image in dataset_path.glob("*/*/*.png")
+              if image.parent.name in ("caption", "graph")]
+    return f"{len(mtimes)}:{max(mtimes, default=0)}:{PREPARE_GROUND_TRUTH_SCRIPT.stat().st_mtime_ns}"
+
+def _ground_truth_complete(dataset_path: Path) -> bool:
+    """准备脚本处理的每篇论文（同时有caption和graph目录）都已生成ground_truth_visuals.json"""
+    return all((paper_dir / "ground_truth_visuals.json").exists()
+               for paper_dir in list_paper_dirs(dataset_path)
+               if (paper_dir / "caption").is_dir() and (paper_dir / "graph").is_dir())
+
+def prepare_ground_truth(dataset_path: Path) -> bool:
+    """
+    运行prepare_ground_truth.py为数据集生成基准集。
+
+    脚本成功退出、没有图片OCR出错且每篇论文都已生成基准文件后，把输入图片的时间戳写入数据集目录下的
+    GROUND_TRUTH_STAMP_NAME，再次运行时若时间戳未变化则直接跳过，不再启动OCR；否则不写入，下次重新准备。
+
+    Args:
+        dataset_path: 数据集根目录
+
+    Returns:
+        基准集是否就绪
+    """
+    stamp_path = dataset_path / GROUND_TRUTH_STAMP_NAME
+    stamp = _ground_truth_stamp(dataset_path)
+    if stamp_path.exists() and stamp_path.read_text(encoding="utf-8") == stamp:
+        logger.info(f"数据集 {dataset_path} 的图片未变化，跳过基准集准备。")
+        return True
+
+    command = ["python3", str(PREPARE_GROUND_TRUTH_SCRIPT), "--dataset-path", str(dataset_path)]
+    success, error_lines = run_command_matching(command, [GROUND_TRUTH_OCR_ERROR_RE])
+    if not success:
+        return False
+    if error_lines:
+        logger.warning(f"数据集 {dataset_path} 中部分图片OCR出错，下次运行时将重新准备。")
+    elif _ground_truth_complete(dataset_path):
+        stamp_path.write_text(stamp, encoding="utf-8")
+    else:
+        logger.warning(f"数据集 {dataset_path} 中部分论文没有生成基准文件，下次运行时将重新准备。")
+    return True
+
+def list_paper_dirs(dataset_path: Path) -> List[Path]:
+    """
+    按名称顺序列出数据集中的论文目录。
+
+    os.scandir在读取目录时已得到各条目的类型，判断是否为目录不再逐个stat，数据集位于网络存储时能省去大量往返。
+    """
+    with os.scandir(dataset_path) as entries:
+        names = sorted(entry.name for entry in entries if entry.is_dir())
+    return [dataset_path / name for name in names]
+
+def _read_manifest_journal(journal_path: Path) -> List[Dict[str, Any]]:
+    """读取生成日志中的清单条目；中断时可能写了一半的最后一行被忽略"""
+    entries = []
+    if journal_path.exists():
+        with open(journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entries.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"忽略生成日志 {journal_path} 中不完整的一行。")
+    return entries
+
+def _file_sha256(path: Path) -> Optional[str]:
+    """计算文件内容的SHA-256，文件不存在时返回None"""
+    try:
+        with open(path, "rb") as f:
+            digest = hashlib.sha256()
+            for block in iter(lambda: f.read(1 << 20), b""):
+                digest.update(block)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+def prefetch_files(paths: Iterable[Path]) -> None:
+    """
+    提示内核在后台把这些文件预读进页缓存（posix_fadvise WILLNEED，调用立即返回）。
+
+    数据集位于网络存储时，生成流程打开论文PDF时就不必再等待冷读取；不支持posix_fadvise的平台上不做任何事。
+    """
+    if not hasattr(os, "posix_fadvise"):
+        return
+    for path in paths:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            continue
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass
+        finally:
+            os.close(fd)
+
+def generator_fingerprint(main_script: str, model_name: str = "gpt-4o") -> str:
+    """
+    计算生成器指纹：入口脚本名、模型名，以及入口脚本、提示词和modules/下各源文件的内容。
+
+    清单条目记录生成时的指纹，规划器、提示词或模型变化后不再复用旧的生成结果。
+
+    Args:
+        main_script: 仓库根目录下的生成入口脚本，如main.py
+        model_name: 生成使用的语言模型
+
+    Returns:
+        十六进制的SHA-256指纹
+    """
+    repo_root = EVAL_DIR.parent
+    digest = hashlib.sha256(f"{main_script}\n{model_name}\n".encode("utf-8"))
+    sources = [repo_root / main_script, repo_root / "prompts.py"] + sorted((repo_root / "modules").glob("*.py"))
+    for source in sources:
+        digest.update(f"{source.relative_to(repo_root)}\n".encode("utf-8"))
+        with contextlib.suppress(OSError):
+            digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+def _is_reusable(entry: Dict[str, Any], fingerprint: Optional[str]) -> bool:
+    """已有的清单条目可以复用：由同一生成器生成，生成的.tex仍存在，且论文PDF与生成时内容相同"""
+    return (entry.get("generator_fingerprint") == fingerprint
+            and Path(entry.get("tex_path") or "").is_file()
+            and entry.get("pdf_sha256") is not None
+            and entry["pdf_sha256"] == _file_sha256(Path(entry["pdf_path"])))
+
+def generate_manifest(paper_dirs: List[Path], generate: Callable[[Path], Optional[Dict[str, Any]]],
+                      manifest_path: Path, concurrency: int = 1, force: bool = False,
+                      main_script: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    对各论文运行生成函数并写出评估清单。
+
+    每生成完一篇论文，就把它的条目（附带论文PDF的SHA-256）追加到清单旁的.jsonl生成日志中。
+    再次运行时，已有清单或生成日志（上次运行中断时）中记录的论文，若.tex文件仍存在且PDF内容未变，
+    且生成器指纹（见generator_fingerprint）未变，直接复用而不再调用语言模型重新生成。全部完成后按论文目录顺序写出JSON清单
+    （先写临时文件再替换，不会留下写了一半的清单），并删除生成日志。
+
+    Args:
+        paper_dirs: 论文目录
+        generate: 为一篇论文生成文件并返回清单条目的函数，失败时返回None
+        manifest_path: 清单文件路径
+        concurrency: 同时生成的论文数
+        force: 忽略已有的清单和生成日志，重新生成全部论文
+        main_script: generate调用的生成入口脚本，用于计算生成器指纹
+
+    Returns:
+        成功生成的清单条目，没有任何成功时不写出清单
+    """
+    journal_path = manifest_path.with_suffix(".jsonl")
+    fingerprint = generator_fingerprint(main_script) if main_script else None
+    recorded = {}
+    if not force:
+        previous = []
+        if manifest_path.exists():
+            try:
+                with open(manifest_path, encoding="utf-8") as f:
+                    previous = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                logger.warning(f"无法读取已有清单 {manifest_path}，将重新生成: {e}")
+        # 生成日志中的条目更新，覆盖旧清单中同一论文的条目
+        for entry in previous + _read_manifest_journal(journal_path):
+            if _is_reusable(entry, fingerprint):
+                recorded[entry["paper_dir"]] = entry
+        if recorded:
+            logger.info(f"{len(recorded)} 篇论文已由同一生成器生成且PDF未变化，将直接复用（使用--force重新生成）。")
+    else:
+        journal_path.unlink(missing_ok=True)
+    journal_lock = threading.Lock()
+    prefetch_files(paper_dir / "paper.pdf" for paper_dir in paper_dirs if str(paper_dir.resolve()) not in recorded)
+
+    def generate_and_record(paper_dir: Path) -> Optional[Dict[str, Any]]:
+        entry = recorded.get(str(paper_dir.resolve()))
+        if entry:
+            logger.info(f"{paper_dir.name} 已生成，跳过。")
+            return entry
+        entry = generate(paper_dir)
+        if entry:
+            entry["pdf_sha256"] = _file_sha256(Path(entry["pdf_path"]))
+            entry["main_script"] = main_script
+            entry["generator_fingerprint"] = fingerprint
+            with journal_lock, open(journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        return entry
+
+    # 每篇论文在独立的会话目录中生成，按论文目录顺序汇总
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+        entries = [entry for entry in executor.map(generate_and_record, paper_dirs) if entry]
+
+    if entries:
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, indent=4)
+        os.replace(tmp_path, manifest_path)
+        journal_path.unlink(missing_ok=True)
+    return entries
+
+def configure_llm_rate_limit(requests_per_minute: Optional[float], processes: int) -> None:
+    """
+    设置生成流程的语言模型请求限速，通过环境变量传给生成子进程（或当前进程中导入的生成流程）。
+
+    每个进程有各自的限速器，因此总速率按同时运行的生成进程数均分；在当前进程中生成时所有论文共享一个限速器。
+
+    Args:
+        requests_per_minute: 所有论文合计每分钟允许的请求数，为None时沿用环境中已设置的值，不大于0时不限速
+        processes: 同时运行的生成进程数
+    """
+    if requests_per_minute is None:
+        try:
+            requests_per_minute = float(os.environ.get(LLM_REQUESTS_PER_MINUTE_ENV) or 0)
+        except ValueError:
+            requests_per_minute = 0
+    if requests_per_minute <= 0:
+        os.environ.pop(LLM_REQUESTS_PER_MINUTE_ENV, None)
+        return
+    per_process = requests_per_minute / max(1, processes)
+    os.environ[LLM_REQUESTS_PER_MINUTE_ENV] = f"{per_process:g}"
+    logger.info(f"语言模型请求限速: 合计每分钟 {requests_per_minute:g} 次，{max(1, processes)} 个生成进程各 {per_process:g} 次")
+
+def generation_session_id(paper_dir: Path) -> str:
+    """为一篇论文的生成子进程分配会话ID（时间戳加论文目录名），同一秒内并行启动的生成互不覆盖输出目录"""
+    return f"{int(time.time())}_{paper_dir.name}"
+
+def run_command_matching(command: List[str], patterns: List[re.Pattern],
+                         env: Optional[Dict[str, str]] = None) -> Tuple[bool, List[str]]:
+    """
+    运行命令，只保留匹配patterns之一的输出行。
+
+    生成脚本的输出可能有数MB的日志，而调用方只需要其中报告输出路径的一两行；
+    逐行匹配后丢弃其余内容，多篇论文并行生成时内存占用也不随日志长度增长。
+
+    Returns:
+        (是否成功, 按产生顺序排列的匹配行)
+    """
+    matched = []
+
+    def keep_matching(line: str) -> None:
+        if any(pattern.search(line) for pattern in patterns):
+            matched.append(line)
+
+    success, _, _ = run_command(command, env=env, line_handler=keep_matching)
+    return success, matched
+
+def search_outputs(pattern: re.Pattern, *outputs: str) -> Optional[re.Match]:
+    """依次在各段输出（如标准输出、标准错误）中查找，返回第一个匹配；无需先把它们拼接成一个字符串"""
+    for output in outputs:
+        match = pattern.search(output)
+        if match:
+            return match
+    return None
+
+def parse_main_output(*outputs: str) -> Optional[str]:
+    """从main.py的输出（标准输出、标准错误）中解析生成的.tex文件路径。"""
+    match = search_outputs(MAIN_TEX_RE, *outputs)
+    if match:
+        path = match.group(1)
+        logger.info(f"找到生成的tex文件: {path}")
+        return path
+    logger.warning("在main.py的输出中找不到.tex文件路径。")
+    return None
+
+def load_evaluators(names: Optional[Iterable[str]] = None) -> Dict[str, Optional[ModuleType]]:
+    """
+    导入评估模块，整个评估过程只付一次模型库的导入开销。
+
+    评估脚本以同目录的兄弟模块为顶层模块导入（如latex_utils），因此把各脚本目录加入sys.path。
+
+    Args:
+        names: 要导入的评估器名称，为None时导入全部
+
+    Returns:
+        评估器名称到模块的映射，导入失败的评估器为None，其指标将被跳过
+    """
+    # 模型从镜像下载；需在导入transformers之前设置
+    os.environ["HF_ENDPOINT"] = "https://hf-mirror.com"
+    if str(EVAL_DIR) not in sys.path:
+        sys.path.insert(0, str(EVAL_DIR))
+
+    evaluators = {}
+    for name in names or EVALUATORS:
+        module_name = EVALUATORS[name][0]
+        script_dir = str(EVAL_DIR / module_name.split(".")[0])
+        if script_dir not in sys.path:
+            sys.path.append(script_dir)
+        try:
+            evaluators[name] = importlib.import_module(module_name)
+        except Exception as e:
+            logger.error(f"导入评估模块 {module_name} 失败，将跳过该项评估: {e}")
+            evaluators[name] = None
+    return evaluators
+
+def _score_cache_key(name: str, args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> str:
+    """由评估器名称和参数生成缓存键；作为路径存在的参数按文件的路径、修改时间和大小计入"""
+    parts = [str(SCORE_CACHE_VERSION), name]
+    for arg in list(args) + [f"{key}={value}" for key, value in sorted(kwargs.items())]:
+        path = Path(arg) if isinstance(arg, (str, Path)) else None
+        if path is not None and path.exists():
+            stat = path.stat()
+            parts.append(f"{path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}")
+        else:
+            parts.append(repr(arg))
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+@contextlib.contextmanager
+def _open_score_cache():
+    """加锁打开分数缓存文件（进程内用线程锁，进程间用文件锁），产出(文件, 缓存字典)"""
+    with _score_cache_lock:
+        SCORE_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(SCORE_CACHE_PATH, "a+", encoding="utf-8") as f:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                cache = json.loads(f.read() or "{}")
+            except json.JSONDecodeError:
+                logger.warning(f"分数缓存文件损坏，已忽略: {SCORE_CACHE_PATH}")
+                cache = {}
+            yield f, cache
+
+def get_cached_scores(key: str) -> Optional[Dict[str, float]]:
+    """读取缓存的分数，不存在时返回None"""
+    with _open_score_cache() as (_, cache):
+        return cache.get(key)
+
+def set_cached_scores(key: str, scores: Dict[str, float]) -> None:
+    """写入分数缓存，超出SCORE_CACHE_MAX_ENTRIES时淘汰最早写入的条目"""
+    with _open_score_cache() as (f, cache):
+        cache.pop(key, None)
+        cache[key] = scores
+        for old_key in list(cache)[:max(0, len(cache) - SCORE_CACHE_MAX_ENTRIES)]:
+            del cache[old_key]
+        f.seek(0)
+        f.truncate()
+        json.dump(cache, f, ensure_ascii=False)
+
+def run_evaluator(evaluators: Dict[str, Optional[ModuleType]], name: str, *args,
+                  use_cache: bool = False, **kwargs) -> Optional[Dict[str, float]]:
+    """
+    调用评估器并取出基准测试关心的分数。
+
+    Args:
+        evaluators: load_evaluators导入的评估模块
+        name: 评估器名称，见EVALUATORS
+        *args, **kwargs: 传给评估器入口函数的参数
+        use_cache: 输入文件未变化时复用SCORE_CACHE_PATH中缓存的分数，不再调用评估器
+
+    Returns:
+        数值有效的分数，评估器不可用、评估失败或没有有效分数时返回None
+    """
+    module = evaluators.get(name)
+    if module is None:
+        return None
+    _, func_name, key_map, label = EVALUATORS[name]
+
+    cache_key = _score_cache_key(name, args, kwargs) if use_cache else None
+    if cache_key:
+        scores = get_cached_scores(cache_key)
+        if scores:
+            logger.info(f"使用缓存的{label}分数: {scores}")
+            return scores
+
+    try:
+        with _MODEL_LOCKS.get(name) or contextlib.nullcontext():
+            data = getattr(module, func_name)(*args, **kwargs)
+    except Exception as e:
+        logger.error(f"{label}评估失败: {e}")
+        return None
+
+    scores = {
+        metric: float(data[key])
+        for key, metric in key_map.items()
+        if data and isinstance(data.get(key), (int, float))
+    }
+    if not scores:
+        logger.warning(f"无法从{label}评估结果中获取分数。")
+        return None
+    logger.info(f"找到{label}分数: {scores}")
+    if cache_key:
+        set_cached_scores(cache_key, scores)
+    return scores
+
+def average_scores(all_scores: List[Dict[str, Any]]) -> Dict[str, float]:
+    """
+    计算各项指标在所有论文上的平均分，缺少某项指标的论文不计入该项的平均。
+
+    一次遍历同时累加各项的总和与计数，非数值字段（如paper_name）被忽略。
+
+    Args:
+        all_scores: 每篇论文的分数字典
+
+    Returns:
+        按指标名排序的平均分
+    """
+    totals: Dict[str, float] = {}
+    counts: Dict[str, int] = {}
+    for scores in all_scores:
+        for key, value in scores.items():
+            if isinstance(value, (int, float)):
+                totals[key] = totals.get(key, 0) + value
+                counts[key] = counts.get(key, 0) + 1
+    return {key: totals[key] / counts[key] for key in sorted(totals)}
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+BERTScore批量打分模块
+模型只加载一次，所有(生成文本, 参考文本)对合并为一次批量计算；已计算过的文本对从磁盘缓存读取
+"""
+
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import torch
+from bert_score import BERTScorer as _BERTScorer
+
+from disk_cache import get_cache, make_key
+
+logger = logging.getLogger(__name__)
+
+class BertScorer:
+    def __init__(self, lang: str = "en", device: Optional[str] = None, batch_size: int = 32,
+                 model_type: Optional[str] = None, idf: bool = False):
+        """
+        初始化BERTScore打分器，底层模型在首次需要计算时加载一次
+
+        Args:
+            lang: 语言代码，用于选择默认模型（与evaluate的bertscore一致）
+            device: 计算设备，为None时自动选择cuda或cpu
+            batch_size: 批大小，显存不足时会自动减半重试
+            model_type: 模型名称，为None时使用lang对应的默认模型；如distilbert-base-uncased比默认的roberta-large快约3倍
+            idf: 是否按IDF加权，IDF由每次score_batch传入的全部参考文本计算
+        """
+        self.lang = lang
+        self.model_type = model_type
+        self.idf = idf
+        self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.batch_size = batch_size
+        self._scorer = None
+
+    def _get_scorer(self) -> _BERTScorer:
+        """加载底层BERTScore模型（只加载一次）"""
+        if self._scorer is None:
+            self._scorer = _BERTScorer(lang=self.lang, model_type=self.model_type, idf=self.idf,
+                                       device=self.device, batch_size=self.batch_size)
+            logger.info(f"已加载BERTScore模型: lang={self.lang}, model_type={self._scorer.model_type}, idf={self.idf}, device={self.device}")
+        return self._scorer
+
+    def score_batch(self, predictions: List[str], references: List[str]) -> List[float]:
+        """
+        批量计算BERTScore F1
+
+        Args:
+            predictions: 生成文本列表
+            references: 参考文本列表，与predictions一一对应
+
+        Returns:
+            每一对文本的F1分数列表
+        """
+        if not predictions:
+            return []
+
+        # IDF加权时分数还取决于参考文本语料，语料一并计入缓存键
+        settings = [self.lang]
+        if self.model_type:
+            settings.append(self.model_type)
+        if self.idf:
+            settings.append(make_key("idf", *sorted(set(references))))
+
+        # 先查磁盘缓存，只对未命中的文本对调用模型
+        cache = get_cache()
+        keys = [make_key("bertscore", *settings, pred, ref) for pred, ref in zip(predictions, references)]
+        scores = [cache.get(key) if cache else None for key in keys]
+        missing = [i for i, score in enumerate(scores) if score is None]
+        if missing:
+            # 重复的文本对只送入模型一次
+            unique_pairs = list(dict.fromkeys((predictions[i], references[i]) for i in missing))
+            if self.idf:
+                self._set_idf_corpus(references)
+            f1_scores = self._score_uncached([pred for pred, _ in unique_pairs], [ref for _, ref in unique_pairs])
+            f1_by_pair = dict(zip(unique_pairs, f1_scores))
+            for i in missing:
+                scores[i] = f1_by_pair[(predictions[i], references[i])]
+                if cache:
+                    cache.set(keys[i], scores[i])
+        return scores
+
+    def _set_idf_corpus(self, references: List[str]) -> None:
+        """用全部参考文本（各篇论文的摘要和结论）计算IDF权重"""
+        unique_refs = list(dict.fromkeys(references))
+        if len(unique_refs) < 2:
+            logger.warning("IDF语料只有一篇参考文本，所有词的IDF相同，建议批量评估多篇论文时再启用IDF")
+        self._get_scorer().compute_idf(unique_refs)
+
+    def _score_uncached(self, predictions: List[str], references: List[str]) -> List[float]:
+        """调用模型批量计算F1，显存不足时减半批大小重试"""
+        scorer = self._get_scorer()
+        while True:
+            try:
+                _, _, f1 = scorer.score(predictions, references, batch_size=self.batch_size)
+                return f1.tolist()
+            except torch.cuda.OutOfMemoryError:
+                if self.batch_size <= 1:
+                    raise
+                torch.cuda.empty_cache()
+                self.batch_size //= 2
+                logger.warning(f"BERTScore显存不足，批大小减半为 {self.batch_size} 后重试")
+
+# 每种配置只保留一个打分器实例
+_scorers: Dict[Tuple[str, Optional[str], bool], BertScorer] = {}
+
+def get_scorer(lang: str = "en", model_type: Optional[str] = None, idf: bool = False) -> BertScorer:
+    """获取指定配置的共享打分器，模型在首次计算时加载"""
+    key = (lang, model_type, idf)
+    scorer = _scorers.get(key)
+    if scorer is None:
+        scorer = _scorers[key] = BertScorer(lang=lang, model_type=model_type, idf=idf)
+    return scorer
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+评估结果磁盘缓存模块
+基于sqlite的键值缓存，用于在多次运行之间复用文本提取和BERTScore结果
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import functools
+import threading
+from typing import Any, Callable, Optional
+
+# 缓存文件路径，可通过环境变量CONTENT_COVERAGE_CACHE修改，设为空字符串则禁用缓存
+CACHE_PATH = os.environ.get("CONTENT_COVERAGE_CACHE", os.path.join(".cache", "content_coverage.sqlite"))
+
+# 提取逻辑变化时递增，使旧的缓存条目失效
+CACHE_VERSION = 2
+
+class DiskCache:
+    def __init__(self, path: str):
+        """
+        打开（或创建）sqlite缓存文件
+
+        评估在多个线程中进行，连接允许跨线程使用，所有读写由一把锁串行化
+
+        Args:
+            path: 缓存文件路径
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存值，不存在时返回None"""
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: Any) -> None:
+        """写入缓存值（需可JSON序列化）"""
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO cache (key, value) VALUES (?, ?)", (key, json.dumps(value, ensure_ascii=False)))
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+
+def get_cache() -> Optional[DiskCache]:
+    """获取共享的缓存实例（各线程共用一个），缓存被禁用时返回None"""
+    global _cache
+    if _cache is None and CACHE_PATH:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache(CACHE_PATH)
+    return _cache
+
+def make_key(*parts: Any) -> str:
+    """由若干部分生成缓存键"""
+    raw = "\x1f".join(str(part) for part in (CACHE_VERSION,) + parts)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def cached_by_file(func: Callable[[str], str]) -> Callable[[str], str]:
+    """
+    按文件路径、修改时间和大小缓存单参数文件处理函数的结果，文件变化后自动失效
+
+    Args:
+        func: 以文件路径为唯一参数的函数
+
+    Returns:
+        带缓存的函数
+    """
+    @functools.wraps(func)
+    def wrapper(path: str) -> str:
+        cache = get_cache()
+        if cache is None:
+            return func(path)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return func(path)
+
+        key = make_key(func.__name__, os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        result = cache.get(key)
+        if result is None:
+            result = func(path)
+            # 空结果通常意味着提取失败，不缓存，便于修复后重试
+            if result:
+                cache.set(key, result)
+        return result
+    return wrapper
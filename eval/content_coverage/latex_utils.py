@@ -6,8 +6,223 @@ LaTeX文本处理工具
 """
 
 import re
+import hashlib
 from typing import Dict, List, Tuple
 
+# 预编译的正则表达式，避免每次调用时重复解析
+_RE_WS = re.compile(r'\s+')
+_RE_FRAME_TITLE = re.compile(r'\\frametitle\{(.*?)\}')
+# frame环境的起止标记，用str.find直接定位
+_FRAME_BEGIN = '\\begin{frame}'
+_FRAME_END = '\\end{frame}'
+# 扫描器用：下一个需要特殊处理的字符，以及括号匹配时关心的字符
+_RE_SPECIAL_CHAR = re.compile(r"[%$\\{}`']")
+_RE_BRACKET_CHARS = {
+    ('{', '}'): re.compile(r'[\\{}]'),
+    ('[', ']'): re.compile(r'[\\\[\]]'),
+}
+_RE_SPACES = re.compile(r'\s*')
+_RE_CMD_NAME = re.compile(r'[a-zA-Z]*')
+
+# extract_text_from_latex的结果缓存：内容摘要 -> 纯文本，超出上限时先进先出淘汰
+_TEXT_CACHE: Dict[bytes, str] = {}
+_TEXT_CACHE_MAX_SIZE = 4096
+
+# 整体替换为公式占位符的数学环境
+_MATH_ENVS = frozenset(
+    env + star
+    for env in ('equation', 'align', 'gather', 'multline', 'eqnarray')
+    for star in ('', '*')
+)
+# 参数作为标题输出（后接换行）的命令
+_TITLE_COMMANDS = frozenset(('frametitle', 'framesubtitle'))
+# 直接映射为字符的命令
+_SYMBOL_COMMANDS = {
+    'textbackslash': '\\',
+    'textasciicircum': '^',
+    'textasciitilde': '~',
+    'textbar': '|',
+    'textgreater': '>',
+    'textless': '<',
+}
+# 第一个花括号参数不是正文（颜色名、链接地址）的命令，只保留其后参数中的文本
+_NON_TEXT_FIRST_ARG_COMMANDS = frozenset(('textcolor', 'color', 'colorbox', 'href'))
+# 反斜杠转义后保留原字符的符号
+_ESCAPED_CHARS = frozenset('&%#_~^${}')
+
+def _find_closing(s: str, i: int, open_char: str = '{', close_char: str = '}') -> int:
+    """
+    查找与s[i]处开括号匹配的闭括号位置，跳过转义的括号
+    
+    Args:
+        s: LaTeX文本
+        i: 开括号位置
+        open_char: 开括号字符
+        close_char: 闭括号字符
+        
+    Returns:
+        闭括号位置；括号不配对时返回len(s)
+    """
+    depth = 0
+    n = len(s)
+    search = _RE_BRACKET_CHARS[(open_char, close_char)].search
+    m = search(s, i)
+    while m:
+        i = m.start()
+        c = s[i]
+        if c == '\\':
+            i += 2
+        else:
+            if c == open_char:
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 0:
+                    return i
+            i += 1
+        m = search(s, i)
+    return n
+
+def _skip_spaces(s: str, i: int) -> int:
+    """跳过s[i]起的空白字符，返回第一个非空白字符的位置"""
+    return _RE_SPACES.match(s, i).end()
+
+def _skip_optional_arg(s: str, i: int) -> int:
+    """如果s[i]处是[...]形式的可选参数则跳过它"""
+    if i < len(s) and s[i] == '[':
+        return _find_closing(s, i, '[', ']') + 1
+    return i
+
+def _read_command(s: str, i: int, parts: List[str]) -> int:
+    """
+    处理从s[i]（反斜杠）开始的命令，把对应的文本写入parts
+    
+    Args:
+        s: LaTeX文本
+        i: 反斜杠位置
+        parts: 输出文本片段列表
+        
+    Returns:
+        命令之后的下一个位置
+    """
+    n = len(s)
+    j = _RE_CMD_NAME.match(s, i + 1).end()
+    name = s[i + 1:j]
+    
+    # 控制符号，如 \% \\ \( \[
+    if not name:
+        if j >= n:
+            return n
+        c = s[j]
+        if c in '([':
+            end = s.find('\\' + (')' if c == '(' else ']'), j + 1)
+            parts.append(' [公式] ')
+            return n if end == -1 else end + 2
+        parts.append(c if c in _ESCAPED_CHARS else ' ')
+        return j + 1
+    
+    # 带星号的命令变体（如\section*）与原命令同样处理
+    if j < n and s[j] == '*':
+        j += 1
+    k = _skip_spaces(s, j)
+    
+    # 环境标记：数学环境整体替换为占位符，其余环境只去掉外壳
+    if name in ('begin', 'end'):
+        if k < n and s[k] == '{':
+            close = _find_closing(s, k)
+            env = s[k + 1:close]
+            if name == 'begin' and env in _MATH_ENVS:
+                end_marker = '\\end{' + env + '}'
+                end = s.find(end_marker, close)
+                parts.append(' [公式] ')
+                return n if end == -1 else end + len(end_marker)
+            parts.append(' ')
+            return close + 1
+        parts.append(' ')
+        return k
+    
+    if name == 'item':
+        parts.append('* ')
+        return k
+    
+    if name in _SYMBOL_COMMANDS:
+        parts.append(_SYMBOL_COMMANDS[name])
+        return k
+    
+    if name == 'includegraphics':
+        k = _skip_spaces(s, _skip_optional_arg(s, k))
+        if k < n and s[k] == '{':
+            k = _find_closing(s, k) + 1
+        parts.append(' [图片] ')
+        return k
+    
+    # 一般命令：跳过可选参数，保留花括号参数中的文本；
+    # 连续的多个参数之间以空格分隔，避免拼接出不存在的词
+    k = _skip_optional_arg(s, k)
+    if k < n and s[k] == '{':
+        first = True
+        while True:
+            close = _find_closing(s, k)
+            if not (first and name in _NON_TEXT_FIRST_ARG_COMMANDS):
+                if not first:
+                    parts.append(' ')
+                parts.append(_tokenize_latex(s[k + 1:close]))
+            first = False
+            k = _skip_spaces(s, close + 1)
+            if k >= n or s[k] != '{':
+                break
+        if name in _TITLE_COMMANDS:
+            parts.append('\n')
+        return close + 1
+    parts.append(' ')
+    return k
+
+def _tokenize_latex(s: str) -> str:
+    """
+    单次从左到右扫描LaTeX文本，输出去掉命令后的文本
+    
+    Args:
+        s: LaTeX文本
+        
+    Returns:
+        未做空白规范化的纯文本
+    """
+    parts = []
+    i = 0
+    n = len(s)
+    search = _RE_SPECIAL_CHAR.search
+    while i < n:
+        # 普通文本整段复制，由正则引擎在C层面定位下一个特殊字符
+        m = search(s, i)
+        if m is None:
+            parts.append(s[i:])
+            break
+        if m.start() > i:
+            parts.append(s[i:m.start()])
+            i = m.start()
+        c = s[i]
+        if c == '%':
+            # 注释：跳到行尾，保留换行
+            end = s.find('\n', i)
+            i = n if end == -1 else end
+        elif c == '$':
+            # 行内/行间公式替换为占位符
+            delim = '$$' if s.startswith('$$', i) else '$'
+            end = s.find(delim, i + len(delim))
+            parts.append(' [公式] ')
+            i = n if end == -1 else end + len(delim)
+        elif c == '\\':
+            i = _read_command(s, i, parts)
+        elif c == '{' or c == '}':
+            i += 1
+        elif (c == '`' or c == "'") and s.startswith(c * 2, i):
+            parts.append('"')
+            i += 2
+        else:
+            parts.append(c)
+            i += 1
+    return ''.join(parts)
+
 def extract_text_from_latex(latex_text: str) -> str:
     """
     从LaTeX文本中提取纯文本内容，过滤掉LaTeX命令
@@ -18,86 +233,67 @@ def extract_text_from_latex(latex_text: str) -> str:
     Returns:
         提取的纯文本
     """
-    # 保存处理后的文本
-    processed_text = latex_text
-    
-    # 移除注释行
-    processed_text = re.sub(r'%.*?\n', '\n', processed_text)
-    
-    # 提取和保存文本内容
-    # 1. 移除常见的环境，但保留内容
-    environments_to_simplify = [
-        'center', 'flushleft', 'flushright', 'quote', 'quotation', 
-        'itemize', 'enumerate', 'description', 'small', 'large',
-        'tiny', 'scriptsize', 'footnotesize', 'normalsize',
-        'large', 'Large', 'LARGE', 'huge', 'Huge'
-    ]
-    
-    for env in environments_to_simplify:
-        processed_text = re.sub(
-            r'\\begin{' + env + r'}(.*?)\\end{' + env + r'}',
-            r'\1',
-            processed_text, 
-            flags=re.DOTALL
-        )
-    
-    # 2. 移除块数学公式环境，替换为占位符
-    processed_text = re.sub(
-        r'\\begin{(equation|align|gather|multline|eqnarray)[\*]?}.*?\\end{\1[\*]?}',
-        ' [公式] ',
-        processed_text,
-        flags=re.DOTALL
-    )
-    
-    # 3. 移除行内数学公式，替换为占位符
-    processed_text = re.sub(r'\$\$(.*?)\$\$', ' [公式] ', processed_text, flags=re.DOTALL)
-    processed_text = re.sub(r'\$(.*?)\$', ' [公式] ', processed_text, flags=re.DOTALL)
-    processed_text = re.sub(r'\\[(](.*?)\\[)]', ' [公式] ', processed_text, flags=re.DOTALL)
-    
-    # 4. 提取图片标题
-    processed_text = re.sub(r'\\includegraphics\s*(?:\[.*?\])?\s*{.*?}', ' [图片] ', processed_text)
-    
-    # 5. 处理列表项
-    processed_text = re.sub(r'\\item\s*', '* ', processed_text)
-    
-    # 6. 提取frame标题和子标题
-    processed_text = re.sub(r'\\frametitle\s*{(.*?)}', r'\1\n', processed_text)
-    processed_text = re.sub(r'\\framesubtitle\s*{(.*?)}', r'\1\n', processed_text)
-    
-    # 7. 处理一般的LaTeX命令
-    # 提取带括号命令的参数文本
-    processed_text = re.sub(r'\\[a-zA-Z]+\s*{(.*?)}', r'\1', processed_text)
-    
-    # 8. 处理没有参数的命令
-    processed_text = re.sub(r'\\[a-zA-Z]+\s*', ' ', processed_text)
-    
-    # 9. 处理特殊字符和符号
-    special_chars = {
-        r'\\textbackslash': '\\',
-        r'\\textasciicircum': '^',
-        r'\\textasciitilde': '~',
-        r'\\textbar': '|',
-        r'\\textgreater': '>',
-        r'\\textless': '<',
-        r'\\&': '&',
-        r'\\%': '%',
-        r'\\#': '#',
-        r'\\_': '_',
-        r'\\~': '~',
-        r'\\^': '^',
-        r'``': '"',
-        r"''": '"',
-    }
-    
-    for pattern, replacement in special_chars.items():
-        processed_text = processed_text.replace(pattern, replacement)
-    
-    # 10. 移除多余空白
-    processed_text = re.sub(r'\s+', ' ', processed_text)
+    # 不含任何LaTeX特殊字符的纯文本只需规范化空白，无需哈希和扫描
+    if _RE_SPECIAL_CHAR.search(latex_text) is None:
+        return _RE_WS.sub(' ', latex_text).strip()
+    
+    # 相同内容（如多个指标重复处理同一frame）直接复用之前的结果
+    key = hashlib.blake2b(latex_text.encode('utf-8'), digest_size=16).digest()
+    cached = _TEXT_CACHE.get(key)
+    if cached is not None:
+        return cached
+    
+    processed_text = _tokenize_latex(latex_text)
+    
+    # 移除多余空白
+    processed_text = _RE_WS.sub(' ', processed_text)
     processed_text = processed_text.strip()
     
+    if len(_TEXT_CACHE) >= _TEXT_CACHE_MAX_SIZE:
+        del _TEXT_CACHE[next(iter(_TEXT_CACHE))]
+    _TEXT_CACHE[key] = processed_text
+    
     return processed_text
 
+def _find_frame_spans(tex_content: str) -> List[Tuple[int, int]]:
+    """
+    定位所有最外层frame环境内容的起止位置
+    
+    用str.find在\\begin{frame}和\\end{frame}两个锚点之间跳转，并维护嵌套深度，
+    嵌套的frame作为外层frame内容的一部分保留
+    
+    Args:
+        tex_content: 整个Beamer文件的内容
+        
+    Returns:
+        (内容起点, 内容终点)列表，不包含\\begin{frame}和\\end{frame}本身
+    """
+    spans = []
+    find = tex_content.find
+    begin_len = len(_FRAME_BEGIN)
+    end_len = len(_FRAME_END)
+    pos = find(_FRAME_BEGIN)
+    while pos != -1:
+        start = pos + begin_len
+        depth = 1
+        cursor = start
+        next_begin = find(_FRAME_BEGIN, cursor)
+        while True:
+            end = find(_FRAME_END, cursor)
+            if end == -1:
+                return spans
+            # 当前\end{frame}之前出现的\begin{frame}都属于嵌套层
+            while next_begin != -1 and next_begin < end:
+                depth += 1
+                next_begin = find(_FRAME_BEGIN, next_begin + begin_len)
+            depth -= 1
+            cursor = end + end_len
+            if depth == 0:
+                break
+        spans.append((start, end))
+        pos = next_begin
+    return spans
+
 def extract_frames(tex_content: str) -> List[Dict[str, str]]:
     """
     从Beamer文件中提取所有frame及其内容
@@ -110,15 +306,13 @@ def extract_frames(tex_content: str) -> List[Dict[str, str]]:
     """
     frames = []
     
-    # 查找所有frame环境
-    frame_pattern = re.compile(r'\\begin{frame}(.*?)\\end{frame}', re.DOTALL)
-    frame_matches = frame_pattern.findall(tex_content)
-    
-    for i, frame_content in enumerate(frame_matches):
+    # 查找所有frame环境，只对每个frame的切片做后续处理
+    for i, (start, end) in enumerate(_find_frame_spans(tex_content)):
+        frame_content = tex_content[start:end]
         frame_info = {'index': i + 1, 'content': frame_content}
         
         # 提取frame标题
-        title_match = re.search(r'\\frametitle{(.*?)}', frame_content)
+        title_match = _RE_FRAME_TITLE.search(frame_content)
         if title_match:
             frame_info['title'] = title_match.group(1)
         else:
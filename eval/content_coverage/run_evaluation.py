@@ -7,14 +7,25 @@
 
 import os
 import re
+import json
 import argparse
-from typing import Dict, Any, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 import logging
 from pathlib import Path
 
-import evaluate
 import PyPDF2
 import latex_utils
+from rouge_score import rouge_scorer
+
+# 可选：PDFium后端的文本提取比PyPDF2快一个数量级，不可用时退回PyPDF2
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+from bert_scorer import get_scorer
+from disk_cache import cached_by_file
 from text_processor import preprocess_text
 
 # 设置日志
@@ -24,10 +35,141 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 预编译的frame匹配正则
+_RE_FRAME = re.compile(r'\\begin{frame}(.*?)\\end{frame}', re.DOTALL)
+_RE_FRAME_TITLE = re.compile(r'\\frametitle{(.*?)}')
+
+# ROUGE-L打分器，直接使用rouge_score而不经过evaluate.load，参数与evaluate的rouge默认值一致（不做词干化）
+_ROUGE_SCORER = rouge_scorer.RougeScorer(['rougeL'])
+
+_ABSTRACT_PATTERN = re.compile(
+    r'abstract\s*\n(.*?)(?:\n\s*\d+\.?\s*introduction|\n\s*keywords|\n\s*\d+\.?\s*\w+)',
+    re.IGNORECASE | re.DOTALL
+)
+
+_CONCLUSION_PATTERNS = [
+    re.compile(r'\n\s*\d+\.?\s*conclu\w*\s*\n(.*?)(?:\n\s*\d+\.?\s*\w+|\s*references|\s*acknowledgements)', 
+              re.IGNORECASE | re.DOTALL),
+    re.compile(r'\n\s*conclu\w*\s*\n(.*?)(?:\n\s*\w+|\s*references|\s*acknowledgements)', 
+              re.IGNORECASE | re.DOTALL)
+]
+
+# 逐页读取时判断章节是否已开始的标题，与_ABSTRACT_PATTERN和_CONCLUSION_PATTERNS[0]正文分组之前的部分一致
+_ABSTRACT_HEADER = re.compile(r'abstract\s*\n', re.IGNORECASE)
+_CONCLUSION_HEADER = re.compile(r'\n\s*\d+\.?\s*conclu\w*\s*\n', re.IGNORECASE)
+
+# PyPDF2逐页提取文本是纯Python计算，页数不少于PDF_PARALLEL_MIN_PAGES时分发到多个进程
+PDF_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+PDF_PARALLEL_MIN_PAGES = 8
+
+_worker_reader = None
+
+def _init_pdf_worker(pdf_path: str):
+    """进程池初始化函数：每个子进程只解析一次PDF"""
+    global _worker_reader
+    _worker_reader = PyPDF2.PdfReader(pdf_path)
+
+def _extract_page_worker(index: int) -> str:
+    """在子进程中提取指定页的文本"""
+    return _worker_reader.pages[index].extract_text()
+
+def _iter_pdf_pages(pdf_path: str):
+    """
+    逐页生成PDF文本，优先使用pypdfium2
+
+    pypdfium2在C层提取文本，单进程已足够快；退回PyPDF2时，页数较多则用进程池并行提取，
+    按页序产出结果，调用方提前停止读取时取消尚未开始的页面
+    """
+    if PDFIUM_AVAILABLE:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for page in pdf:
+                textpage = page.get_textpage()
+                yield textpage.get_text_range().replace('\r\n', '\n')
+                textpage.close()
+                page.close()
+        finally:
+            pdf.close()
+        return
+
+    reader = PyPDF2.PdfReader(pdf_path)
+    num_pages = len(reader.pages)
+    workers = min(PDF_WORKERS, num_pages)
+    if workers <= 1 or num_pages < PDF_PARALLEL_MIN_PAGES:
+        for page in reader.pages:
+            yield page.extract_text()
+        return
+
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_pdf_worker, initargs=(pdf_path,))
+    try:
+        futures = [executor.submit(_extract_page_worker, i) for i in range(num_pages)]
+        for future in futures:
+            yield future.result()
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+# 摘要通常位于开头、结论通常位于末尾，全文匹配时先只搜索相应的区域
+ABSTRACT_SEARCH_CHARS = 8000
+CONCLUSION_SEARCH_CHARS = 20000
+
+def _search_abstract(full_text: str):
+    """先在全文开头查找摘要，找不到时再搜索全文"""
+    if len(full_text) > ABSTRACT_SEARCH_CHARS:
+        match = _ABSTRACT_PATTERN.search(full_text, 0, ABSTRACT_SEARCH_CHARS)
+        if match:
+            return match
+    return _ABSTRACT_PATTERN.search(full_text)
+
+def _search_conclusion(full_text: str):
+    """先在全文末尾查找结论，找不到时再搜索全文；各模式按优先级依次尝试"""
+    tail_start = max(0, len(full_text) - CONCLUSION_SEARCH_CHARS)
+    for start in ((tail_start, 0) if tail_start else (0,)):
+        for pattern in _CONCLUSION_PATTERNS:
+            match = pattern.search(full_text, start)
+            if match:
+                return match
+    return None
+
+def _search_settled(pattern: re.Pattern, header_pattern: re.Pattern, pages: List[str],
+                    first_page: int) -> Tuple[Optional[re.Match], int]:
+    """
+    逐页读取时在pages[first_page:]中查找章节，匹配须结束于最后一页之前才视为完整
+
+    Args:
+        pattern: 章节的正则表达式
+        header_pattern: 章节标题的正则表达式
+        pages: 目前已读取的各页文本
+        first_page: 本次查找的起始页
+
+    Returns:
+        (完整的匹配或None, 下次查找的起始页)；未找到时从章节标题所在页（没有标题时从最后一页，
+        标题可能跨页）继续查找，已读取的更早页面不再重复扫描
+    """
+    window = "".join(pages[first_page:])
+    match = pattern.search(window)
+    if match is None:
+        # 标题已出现但章节尚未结束时，下次仍须从标题处匹配
+        header = header_pattern.search(window)
+        if header is None:
+            return None, max(first_page, len(pages) - 1)
+        offset = 0
+        for page in range(first_page, len(pages)):
+            offset += len(pages[page])
+            if header.start() < offset:
+                return None, page
+    elif match.end() <= len(window) - len(pages[-1]):
+        return match, first_page
+    # 匹配延伸到最后一页，可能还不完整，下一页读取后从同一页重新查找
+    return None, first_page
+
+@cached_by_file
 def extract_abstract_conclusion_from_pdf(pdf_path: str) -> str:
     """
     从论文PDF中提取摘要和结论部分
     
+    逐页读取，摘要和编号的结论章节都已完整出现（其后至少还有一整页）时即停止读取，
+    不再提取参考文献和附录等后续页面；无论是否提前停止，都在已读取的文本上用相同的规则选取摘要和结论
+    
     Args:
         pdf_path: PDF文件路径
         
@@ -35,52 +177,50 @@ def extract_abstract_conclusion_from_pdf(pdf_path: str) -> str:
         摘要和结论拼接的文本
     """
     logger.info(f"从PDF提取摘要和结论: {pdf_path}")
-    text = ""
+    parts = []
     
     try:
-        # 打开PDF文件
-        with open(pdf_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            full_text = ""
-            
-            # 提取所有文本
-            for page in pdf_reader.pages:
-                full_text += page.extract_text() + "\n"
-            
-            # 查找摘要部分
-            abstract_pattern = re.compile(r'abstract\s*\n(.*?)(?:\n\s*\d+\.?\s*introduction|\n\s*keywords|\n\s*\d+\.?\s*\w+)', 
-                                        re.IGNORECASE | re.DOTALL)
-            abstract_match = abstract_pattern.search(full_text)
-            
-            if abstract_match:
-                text += abstract_match.group(1).strip() + "\n\n"
-                logger.info("已找到摘要部分")
-            else:
-                logger.warning("未能找到摘要部分")
-            
-            # 查找结论部分
-            conclusion_patterns = [
-                re.compile(r'\n\s*\d+\.?\s*conclu\w*\s*\n(.*?)(?:\n\s*\d+\.?\s*\w+|\s*references|\s*acknowledgements)', 
-                          re.IGNORECASE | re.DOTALL),
-                re.compile(r'\n\s*conclu\w*\s*\n(.*?)(?:\n\s*\w+|\s*references|\s*acknowledgements)', 
-                          re.IGNORECASE | re.DOTALL)
-            ]
-            
-            for pattern in conclusion_patterns:
-                conclusion_match = pattern.search(full_text)
-                if conclusion_match:
-                    text += conclusion_match.group(1).strip()
-                    logger.info("已找到结论部分")
-                    break
-            else:
-                logger.warning("未能找到结论部分")
+        pages = []
+        abstract_found = conclusion_found = False
+        abstract_from = conclusion_from = 0  # 各章节下次查找的起始页
+        for page_text in _iter_pdf_pages(pdf_path):
+            pages.append(page_text + "\n")
+            if not abstract_found:
+                match, abstract_from = _search_settled(_ABSTRACT_PATTERN, _ABSTRACT_HEADER, pages, abstract_from)
+                abstract_found = match is not None
+            if not conclusion_found:
+                match, conclusion_from = _search_settled(_CONCLUSION_PATTERNS[0], _CONCLUSION_HEADER, pages, conclusion_from)
+                conclusion_found = match is not None
+            if abstract_found and conclusion_found:
+                break
+
+        # 逐页查找只用于决定何时停止读取，最终的章节由全文查找选取，拼接只进行一次
+        full_text = "".join(pages)
+        abstract_match = _search_abstract(full_text)
+        conclusion_match = _search_conclusion(full_text)
+        
+        # 查找摘要部分
+        if abstract_match:
+            parts.append(abstract_match.group(1).strip() + "\n\n")
+            logger.info("已找到摘要部分")
+        else:
+            logger.warning("未能找到摘要部分")
+        
+        # 查找结论部分
+        if conclusion_match:
+            parts.append(conclusion_match.group(1).strip())
+            logger.info("已找到结论部分")
+        else:
+            logger.warning("未能找到结论部分")
                 
     except Exception as e:
         logger.error(f"PDF处理出错: {e}")
     
+    text = "".join(parts)
     logger.info(f"提取的文本长度: {len(text)} 字符")
     return text
 
+@cached_by_file
 def extract_text_from_beamer(tex_path: str) -> str:
     """
     从Beamer .tex文件中提取所有frame环境内的文本
@@ -92,33 +232,34 @@ def extract_text_from_beamer(tex_path: str) -> str:
         拼接后的文本
     """
     logger.info(f"从Beamer提取文本: {tex_path}")
-    text = ""
+    parts = []
     
     try:
         with open(tex_path, 'r', encoding='utf-8') as file:
             content = file.read()
             
-        # 找到所有frame环境
-        frame_pattern = re.compile(r'\\begin{frame}(.*?)\\end{frame}', re.DOTALL)
-        frames = frame_pattern.findall(content)
-        
-        for frame in frames:
+        # 逐个处理frame环境，标题直接在原文的frame范围内查找
+        for match in _RE_FRAME.finditer(content):
+            start, end = match.span(1)
+            
             # 提取frame标题
-            title_match = re.search(r'\\frametitle{(.*?)}', frame)
+            title_match = _RE_FRAME_TITLE.search(content, start, end)
             if title_match:
-                text += title_match.group(1) + "\n"
+                parts.append(title_match.group(1) + "\n")
             
             # 清理LaTeX命令，但保留文本
-            cleaned_text = latex_utils.extract_text_from_latex(frame)
-            text += cleaned_text + "\n\n"
+            cleaned_text = latex_utils.extract_text_from_latex(match.group(1))
+            parts.append(cleaned_text + "\n\n")
             
     except Exception as e:
         logger.error(f"Beamer文件处理出错: {e}")
     
+    text = "".join(parts)
     logger.info(f"提取的文本长度: {len(text)} 字符")
     return text
 
-def calculate_metrics(source_text: str, generated_text: str, lang: str = "en") -> Dict[str, Any]:
+def calculate_metrics(source_text: str, generated_text: str, lang: str = "en",
+                      model_type: Optional[str] = None, idf: bool = False) -> Dict[str, Any]:
     """
     计算BERTScore和ROUGE-L分数
     
@@ -126,107 +267,182 @@ def calculate_metrics(source_text: str, generated_text: str, lang: str = "en") -
         source_text: 源文本
         generated_text: 生成的文本
         lang: 语言，默认英语
+        model_type: BERTScore模型名称，为None时使用lang对应的默认模型
+        idf: BERTScore是否按IDF加权
         
     Returns:
         包含BERTScore和ROUGE-L评分的字典
     """
-    logger.info("开始计算内容覆盖度指标...")
+    return calculate_metrics_batch([(source_text, generated_text)], lang, model_type, idf)[0]
+
+def calculate_metrics_batch(text_pairs: List[Tuple[str, str]], lang: str = "en",
+                            model_type: Optional[str] = None, idf: bool = False) -> List[Dict[str, Any]]:
+    """
+    批量计算多组文本的BERTScore和ROUGE-L分数，BERTScore模型只加载一次并一次性批量计算
+    
+    Args:
+        text_pairs: (源文本, 生成的文本)列表
+        lang: 语言，默认英语
+        model_type: BERTScore模型名称，为None时使用lang对应的默认模型
+        idf: BERTScore是否按IDF加权，IDF由本批全部源文本计算
+        
+    Returns:
+        与输入顺序一致的评分字典列表
+    """
+    logger.info(f"开始计算内容覆盖度指标，共 {len(text_pairs)} 组...")
     
     # 预处理文本
-    preprocessed_source = preprocess_text(source_text)
-    preprocessed_generated = preprocess_text(generated_text)
+    references = [preprocess_text(source_text) for source_text, _ in text_pairs]
+    predictions = [preprocess_text(generated_text) for _, generated_text in text_pairs]
     
-    metrics = {}
+    all_metrics = [{} for _ in text_pairs]
     
     # 计算BERTScore
     try:
-        bertscore = evaluate.load("bertscore")
-        results = bertscore.compute(
-            predictions=[preprocessed_generated], 
-            references=[preprocessed_source], 
-            lang=lang
-        )
-        metrics["bertscore_f1"] = results["f1"][0]
-        logger.info(f"BERTScore F1: {metrics['bertscore_f1']:.4f}")
+        f1_scores = get_scorer(lang, model_type, idf).score_batch(predictions, references)
+        for metrics, f1 in zip(all_metrics, f1_scores):
+            metrics["bertscore_f1"] = f1
+            logger.info(f"BERTScore F1: {f1:.4f}")
     except Exception as e:
         logger.error(f"计算BERTScore时出错: {e}")
-        metrics["bertscore_f1"] = None
+        for metrics in all_metrics:
+            metrics["bertscore_f1"] = None
     
     # 计算ROUGE-L
     try:
-        rouge = evaluate.load("rouge")
-        results = rouge.compute(
-            predictions=[preprocessed_generated], 
-            references=[preprocessed_source]
-        )
-        metrics["rouge_l"] = results["rougeL"]
-        logger.info(f"ROUGE-L: {metrics['rouge_l']:.4f}")
+        for metrics, reference, prediction in zip(all_metrics, references, predictions):
+            rouge_l = _ROUGE_SCORER.score(reference, prediction)["rougeL"].fmeasure
+            metrics["rouge_l"] = rouge_l
+            logger.info(f"ROUGE-L: {rouge_l:.4f}")
     except Exception as e:
         logger.error(f"计算ROUGE-L时出错: {e}")
-        metrics["rouge_l"] = None
+        for metrics in all_metrics:
+            metrics["rouge_l"] = None
     
-    return metrics
+    return all_metrics
 
-def main(pdf_path: str, tex_path: str, lang: str = "en") -> Dict[str, float]:
+def _extract_texts(pdf_path: str, tex_path: str) -> Tuple[str, str, Dict[str, str]]:
     """
-    计算内容覆盖度的主函数
+    提取一组PDF和TEX文件的源文本与生成文本
     
-    Args:
-        pdf_path: 原论文PDF路径
-        tex_path: 生成的Beamer .tex文件路径
-        lang: 语言代码
-        
     Returns:
-        评估结果字典
+        (源文本, 生成的文本, 错误信息)，出错时错误信息不为空
     """
     # 确保文件存在
     if not os.path.exists(pdf_path):
         logger.error(f"PDF文件不存在: {pdf_path}")
-        return {"error": "PDF文件不存在"}
+        return "", "", {"error": "PDF文件不存在"}
     
     if not os.path.exists(tex_path):
         logger.error(f"TEX文件不存在: {tex_path}")
-        return {"error": "TEX文件不存在"}
+        return "", "", {"error": "TEX文件不存在"}
     
     # 1. 提取源文本
     source_text = extract_abstract_conclusion_from_pdf(pdf_path)
     if not source_text:
         logger.error("未能从PDF提取有效文本")
-        return {"error": "未能从PDF提取有效文本"}
+        return "", "", {"error": "未能从PDF提取有效文本"}
     
     # 2. 提取生成的文本
     generated_text = extract_text_from_beamer(tex_path)
     if not generated_text:
         logger.error("未能从TEX文件提取有效文本")
-        return {"error": "未能从TEX文件提取有效文本"}
+        return "", "", {"error": "未能从TEX文件提取有效文本"}
+    
+    return source_text, generated_text, {}
+
+def evaluate_pairs(file_pairs: List[Tuple[str, str]], lang: str = "en",
+                   model_type: Optional[str] = None, idf: bool = False) -> List[Dict[str, Any]]:
+    """
+    批量评估多组(PDF, TEX)文件的内容覆盖度
+    
+    Args:
+        file_pairs: (原论文PDF路径, 生成的Beamer .tex文件路径)列表
+        lang: 语言代码
+        model_type: BERTScore模型名称，为None时使用lang对应的默认模型
+        idf: BERTScore是否按IDF加权，IDF由所有论文的源文本计算
+        
+    Returns:
+        与输入顺序一致的评估结果字典列表
+    """
+    results = []
+    valid_indices = []
+    text_pairs = []
+    for pdf_path, tex_path in file_pairs:
+        source_text, generated_text, error = _extract_texts(pdf_path, tex_path)
+        results.append(error)
+        if not error:
+            valid_indices.append(len(results) - 1)
+            text_pairs.append((source_text, generated_text))
     
     # 3. 计算指标
-    metrics = calculate_metrics(source_text, generated_text, lang)
+    if text_pairs:
+        for index, metrics in zip(valid_indices, calculate_metrics_batch(text_pairs, lang, model_type, idf)):
+            results[index] = metrics
     
-    return metrics
+    return results
+
+def main(pdf_path: str, tex_path: str, lang: str = "en",
+         model_type: Optional[str] = None, idf: bool = False) -> Dict[str, float]:
+    """
+    计算内容覆盖度的主函数
+    
+    Args:
+        pdf_path: 原论文PDF路径
+        tex_path: 生成的Beamer .tex文件路径
+        lang: 语言代码
+        model_type: BERTScore模型名称，为None时使用lang对应的默认模型
+        idf: BERTScore是否按IDF加权
+        
+    Returns:
+        评估结果字典
+    """
+    return evaluate_pairs([(pdf_path, tex_path)], lang, model_type, idf)[0]
+
+def _print_results(results: Dict[str, Any]) -> None:
+    """打印单组评估结果"""
+    for metric, value in results.items():
+        if isinstance(value, float):
+            print(f"  {metric}: {value:.4f}")
+        else:
+            print(f"  {metric}: {value}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="评估Beamer幻灯片的内容覆盖度")
-    parser.add_argument("--pdf", required=True, help="源论文PDF文件路径")
-    parser.add_argument("--tex", required=True, help="生成的Beamer .tex文件路径")
+    parser.add_argument("--pdf", help="源论文PDF文件路径")
+    parser.add_argument("--tex", help="生成的Beamer .tex文件路径")
+    parser.add_argument("--pairs", help="批量评估的JSON文件，内容为[[pdf路径, tex路径], ...]，BERTScore模型只加载一次")
     parser.add_argument("--lang", default="en", help="语言代码，默认为英语(en)")
+    parser.add_argument("--model-type", help="BERTScore模型名称，默认使用语言对应的模型；distilbert-base-uncased速度约快3倍")
+    parser.add_argument("--idf", action="store_true", help="BERTScore按IDF加权，IDF由本次评估的所有源文本计算，适合批量评估")
     parser.add_argument("--output", help="结果输出JSON文件路径")
     
     args = parser.parse_args()
     
-    results = main(args.pdf, args.tex, args.lang)
-    
-    # 输出结果
-    print("\n内容覆盖度评估结果:")
-    for metric, value in results.items():
-        if isinstance(value, float):
-            print(f"  {metric}: {value:.4f}")
-        else:
-            print(f"  {metric}: {value}")
+    if args.pairs:
+        with open(args.pairs, 'r', encoding='utf-8') as f:
+            file_pairs = [tuple(pair) for pair in json.load(f)]
+        batch_results = evaluate_pairs(file_pairs, args.lang, args.model_type, args.idf)
+        results = [
+            {"pdf": pdf_path, "tex": tex_path, **metrics}
+            for (pdf_path, tex_path), metrics in zip(file_pairs, batch_results)
+        ]
+        
+        # 输出结果
+        for item in results:
+            print(f"\n内容覆盖度评估结果 ({item['tex']}):")
+            _print_results({k: v for k, v in item.items() if k not in ("pdf", "tex")})
+    else:
+        if not args.pdf or not args.tex:
+            parser.error("需要同时指定 --pdf 和 --tex，或使用 --pairs")
+        results = main(args.pdf, args.tex, args.lang, args.model_type, args.idf)
+        
+        # 输出结果
+        print("\n内容覆盖度评估结果:")
+        _print_results(results)
     
     # 如果指定了输出文件，则保存结果
     if args.output:
-        import json
         with open(args.output, 'w', encoding='utf-8') as f:
             json.dump(results, f, ensure_ascii=False, indent=2)
-        print(f"\n结果已保存至: {args.output}") 
\ No newline at end of file
+        print(f"\n结果已保存至: {args.output}")
@@ -0,0 +1,47 @@
+import os
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from disk_cache import DiskCache
+
+class TestDiskCache(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.cache = DiskCache(os.path.join(self._tmp.name, "cache.sqlite"))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_round_trip(self):
+        self.assertIsNone(self.cache.get("missing"))
+        self.cache.set("key", {"text": "摘要", "score": 0.5})
+        self.assertEqual(self.cache.get("key"), {"text": "摘要", "score": 0.5})
+
+    def test_shared_across_threads(self):
+        # The cache is created in this thread and used from evaluation worker threads
+        self.cache.set("main", 1)
+        result = {}
+
+        def use_cache():
+            result["main"] = self.cache.get("main")
+            self.cache.set("worker", 2)
+
+        thread = threading.Thread(target=use_cache)
+        thread.start()
+        thread.join()
+        self.assertEqual(result, {"main": 1})
+        self.assertEqual(self.cache.get("worker"), 2)
+
+    def test_concurrent_reads_and_writes(self):
+        def worker(i):
+            self.cache.set(f"key{i}", i)
+            return self.cache.get(f"key{i}")
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            self.assertEqual(list(executor.map(worker, range(64))), list(range(64)))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+from latex_utils import extract_frames, extract_text_from_latex
+
+class TestExtractTextFromLatex(unittest.TestCase):
+
+    def test_command_arguments(self):
+        self.assertEqual(extract_text_from_latex(r"\textbf{bold} and \emph{italic}"), "bold and italic")
+        self.assertEqual(extract_text_from_latex(r"\textbf{W}ord"), "Word")
+        self.assertEqual(extract_text_from_latex(r"\section*{Intro} text"), "Intro text")
+        # Optional arguments are skipped
+        self.assertEqual(extract_text_from_latex(r"\parbox[t]{x}"), "x")
+
+    def test_consecutive_arguments_are_not_concatenated(self):
+        # Colour names and URLs are not text
+        self.assertEqual(extract_text_from_latex(r"\textcolor{red}{warn} now"), "warn now")
+        self.assertEqual(extract_text_from_latex(r"\href{http://x}{link}"), "link")
+        self.assertEqual(extract_text_from_latex(r"{\color{blue} text}"), "text")
+        # Other multi-argument commands keep every argument as a separate word
+        self.assertEqual(extract_text_from_latex(r"\newcommand{first}{second}"), "first second")
+
+    def test_nested_braces(self):
+        self.assertEqual(extract_text_from_latex(r"\textbf{bold \emph{nested {deep}} text}"), "bold nested deep text")
+        self.assertEqual(extract_text_from_latex(r"\textbf{a \{b\} c}"), "a {b} c")
+
+    def test_comments(self):
+        self.assertEqual(extract_text_from_latex("keep % dropped\nnext"), "keep next")
+        self.assertEqual(extract_text_from_latex(r"50\% kept % dropped"), "50% kept")
+
+    def test_line_breaks(self):
+        self.assertEqual(extract_text_from_latex(r"line one\\line two"), "line one line two")
+        self.assertEqual(extract_text_from_latex(r"\textbf{a}\\ b"), "a b")
+
+    def test_special_characters(self):
+        self.assertEqual(extract_text_from_latex(r"\& \# \_ \$ \~"), "& # _ $ ~")
+        self.assertEqual(extract_text_from_latex(r"\textbackslash \textless x\textgreater"), "\\<x>")
+        self.assertEqual(extract_text_from_latex("``quoted''"), '"quoted"')
+
+    def test_math_images_and_items(self):
+        self.assertEqual(extract_text_from_latex(r"cost $x^2$ and \(y\)"), "cost [公式] and [公式]")
+        self.assertEqual(extract_text_from_latex(r"\begin{align*}a&=b\end{align*} after"), "[公式] after")
+        self.assertEqual(extract_text_from_latex(r"\includegraphics[width=0.5\textwidth]{fig.png} cap"), "[图片] cap")
+        self.assertEqual(extract_text_from_latex(r"\begin{itemize}\item one \item two\end{itemize}"), "* one * two")
+
+    def test_plain_text(self):
+        self.assertEqual(extract_text_from_latex("  plain\n text  "), "plain text")
+
+class TestExtractFrames(unittest.TestCase):
+
+    def test_frames(self):
+        tex = (r"\begin{document}"
+               r"\begin{frame}\frametitle{First}Hello \textbf{world}\end{frame}"
+               r"\begin{frame}No title\end{frame}"
+               r"\end{document}")
+        frames = extract_frames(tex)
+        self.assertEqual([frame['title'] for frame in frames], ["First", "无标题幻灯片 2"])
+        self.assertEqual([frame['text'] for frame in frames], ["First Hello world", "No title"])
+
+if __name__ == '__main__':
+    unittest.main()
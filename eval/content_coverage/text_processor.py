@@ -8,6 +8,21 @@
 import re
 from typing import List, Dict, Any
 
+# 预编译的正则表达式，避免每次调用时重复查找编译缓存
+_WS_RE = re.compile(r'\s+')
+_PUNCT_DUP_RE = re.compile(r'([.!?,:;])\1+')
+_CITE_RE = re.compile(r'\[\d+\]')
+_FORMULA_RE = re.compile(r'\[公式\]')
+_FIGURE_RE = re.compile(r'\[图片\]')
+_KEEP_RE = re.compile(r'[^\w\s.,!?:;()\[\]{}"-]')
+_SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# 反斜杠替换为空格的转换表
+_BACKSLASH_TRANS = str.maketrans({'\\': ' '})
+
+# ASCII范围内需要删除的字符表，与_KEEP_RE保持一致；纯ASCII文本用translate代替正则
+_ASCII_DELETE_TRANS = str.maketrans({chr(c): None for c in range(128) if _KEEP_RE.match(chr(c))})
+
 def preprocess_text(text: str) -> str:
     """
     文本预处理函数，进行标准化处理
@@ -21,28 +36,30 @@ def preprocess_text(text: str) -> str:
     # 转为小写
     text = text.lower()
     
-    # 规范化空白字符
-    text = re.sub(r'\s+', ' ', text)
+    # 空白字符只在最后统一规范化一次：中间步骤均不依赖空白的长度
     
     # 标准化标点符号
     # 移除多余的标点符号
-    text = re.sub(r'([.!?,:;])\1+', r'\1', text)
+    text = _PUNCT_DUP_RE.sub(r'\1', text)
     
     # 标准化引用标记 [1] -> ref
-    text = re.sub(r'\[\d+\]', ' ref ', text)
+    text = _CITE_RE.sub(' ref ', text)
     
     # 移除特定字符
-    text = text.replace('\\', ' ')
+    text = text.translate(_BACKSLASH_TRANS)
     
     # 标准化公式标记
-    text = re.sub(r'\[公式\]', ' formula ', text)
-    text = re.sub(r'\[图片\]', ' figure ', text)
+    text = _FORMULA_RE.sub(' formula ', text)
+    text = _FIGURE_RE.sub(' figure ', text)
     
     # 移除特殊字符但保留字母、数字、基本标点
-    text = re.sub(r'[^\w\s.,!?:;()\[\]{}"-]', '', text)
+    if text.isascii():
+        text = text.translate(_ASCII_DELETE_TRANS)
+    else:
+        text = _KEEP_RE.sub('', text)
     
     # 移除可能的多余空白
-    text = re.sub(r'\s+', ' ', text).strip()
+    text = _WS_RE.sub(' ', text).strip()
     
     return text
 
@@ -79,7 +96,7 @@ def tokenize_text(text: str) -> List[str]:
         句子列表
     """
     # 简单的句子切分
-    sentences = re.split(r'(?<=[.!?])\s+', text)
+    sentences = _SENTENCE_SPLIT_RE.split(text)
     
     # 过滤空句子
     sentences = [s.strip() for s in sentences if s.strip()]
@@ -7,15 +7,19 @@
 import os
 import re
 import json
+import mmap
 import argparse
 import logging
+import functools
 from pathlib import Path
 from typing import List, Dict, Any, Tuple
 
 import torch
+import torch.nn.functional as F
 from PIL import Image
 from transformers import CLIPProcessor, CLIPModel
-import evaluate
+from bert_score import BERTScorer
+from scipy.optimize import linear_sum_assignment
 
 # 设置日志
 logging.basicConfig(
@@ -25,6 +29,17 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 正则表达式查找figure环境中的includegraphics和caption
+_FIGURE_RE = re.compile(
+    r"\\begin{figure}.*?"
+    r"\\includegraphics(?:\[.*?\])?{([^}]+)}.*?"
+    r"\\caption{([^}]+)}.*?"
+    r"\\end{figure}",
+    re.DOTALL
+)
+# 按字节匹配的版本，用于扫描内存映射的文件；模式中的字面量均为ASCII，不会出现在UTF-8多字节字符内部
+_FIGURE_BYTES_RE = re.compile(_FIGURE_RE.pattern.encode("ascii"), re.DOTALL)
+
 def extract_generated_elements(tex_path: Path, images_dir: Path) -> List[Dict[str, Any]]:
     """从.tex文件和图片目录中提取生成的视觉元素。"""
     generated_elements = []
@@ -32,22 +47,19 @@ def extract_generated_elements(tex_path: Path, images_dir: Path) -> List[Dict[st
         logger.error(f"TEX文件不存在: {tex_path}")
         return generated_elements
 
-    with open(tex_path, 'r', encoding='utf-8') as f:
-        content = f.read()
-
-    # 正则表达式查找figure环境中的includegraphics和caption
-    pattern = re.compile(
-        r"\\begin{figure}.*?"
-        r"\\includegraphics(?:\[.*?\])?{([^}]+)}.*?"
-        r"\\caption{([^}]+)}.*?"
-        r"\\end{figure}",
-        re.DOTALL
-    )
+    with open(tex_path, 'rb') as f:
+        # 空文件无法映射
+        if f.seek(0, 2) == 0:
+            matches = []
+        else:
+            # 内存映射后直接按字节匹配，只解码匹配到的图片路径和标题，避免整个文件解码成字符串
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                matches = [(m.group(1), m.group(2)) for m in _FIGURE_BYTES_RE.finditer(mm)]
 
-    for match in pattern.finditer(content):
-        image_name = os.path.basename(match.group(1))
+    for raw_path, raw_caption in matches:
+        image_name = os.path.basename(raw_path.decode('utf-8'))
         image_path = images_dir / image_name
-        caption_text = match.group(2).strip()
+        caption_text = raw_caption.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n').strip()
 
         if image_path.exists():
             generated_elements.append({
@@ -60,67 +72,120 @@ def extract_generated_elements(tex_path: Path, images_dir: Path) -> List[Dict[st
     logger.info(f"从生成物中提取了 {len(generated_elements)} 个视觉元素。")
     return generated_elements
 
-def get_image_embedding(image_path: str, model, processor, device) -> torch.Tensor:
-    """为单个图片计算CLIP嵌入。"""
-    try:
-        image = Image.open(image_path).convert("RGB")
-        inputs = processor(images=image, return_tensors="pt", padding=True).to(device)
-        with torch.no_grad():
-            embedding = model.get_image_features(**inputs)
-        return embedding
-    except Exception as e:
-        logger.error(f"处理图片失败 {image_path}: {e}")
-        return torch.empty(0)
+CLIP_MODEL_NAME = "openai/clip-vit-base-patch32"
+
+@functools.lru_cache(maxsize=1)
+def _load_clip(device: str, compile_model: bool = False) -> Tuple[CLIPModel, CLIPProcessor]:
+    """
+    加载CLIP模型和处理器，同一进程内只加载一次。
+
+    在GPU上以FP16加载，相似度排序对这一精度损失不敏感，显存带宽减半；CPU上保持FP32。
+    compile_model为True时用torch.compile编译图像编码路径。编译本身需要数十秒，
+    只在一次评估大量图片时才划算，因此默认关闭。
+    """
+    dtype = torch.float16 if device == "cuda" else torch.float32
+    model = CLIPModel.from_pretrained(CLIP_MODEL_NAME, torch_dtype=dtype).to(device)
+    model.eval()
+    if compile_model and hasattr(torch, "compile"):
+        # 图片尺寸固定为224x224，只有批大小变化，按动态形状编译避免反复重编译
+        model.get_image_features = torch.compile(model.get_image_features, dynamic=True)
+    processor = CLIPProcessor.from_pretrained(CLIP_MODEL_NAME)
+    return model, processor
+
+@functools.lru_cache(maxsize=1)
+def _load_bertscore(device: str) -> BERTScorer:
+    """
+    加载BERTScore打分器，同一进程内只加载一次。
+
+    直接构造bert_score.BERTScorer而不经过evaluate.load，省去Hub上的元数据查询；
+    参数与evaluate的bertscore默认值一致（英文默认模型，不做基线缩放），分数可与旧结果直接比较。
+    """
+    return BERTScorer(lang="en", device=device)
+
+def get_image_embeddings(elements: List[Dict], model, processor, device) -> Tuple[torch.Tensor, List[Dict]]:
+    """
+    批量计算元素图片的CLIP嵌入，所有图片一次前向计算。
+
+    Returns:
+        ([N, D]的嵌入张量, 成功读取图片的N个元素)
+    """
+    images = []
+    valid_elements = []
+    for elem in elements:
+        try:
+            images.append(Image.open(elem["image_path"]).convert("RGB"))
+            valid_elements.append(elem)
+        except Exception as e:
+            logger.error(f"处理图片失败 {elem['image_path']}: {e}")
+
+    if not images:
+        return torch.empty(0), valid_elements
+
+    inputs = processor(images=images, return_tensors="pt", padding=True).to(device)
+    inputs["pixel_values"] = inputs["pixel_values"].to(model.dtype)
+    with torch.inference_mode():
+        embeddings = model.get_image_features(**inputs)
+    # 相似度计算统一使用FP32
+    return embeddings.float(), valid_elements
+
+def match_elements(similarity_matrix: torch.Tensor, similarity_threshold: float) -> List[Tuple[int, int]]:
+    """
+    在生成元素与基准元素之间做一对一匹配，只保留相似度不低于阈值的配对；
+    在匹配数最多的前提下使相似度之和最大。
+
+    Args:
+        similarity_matrix: [生成元素数, 基准元素数]的相似度矩阵
+        similarity_threshold: 相似度阈值
+
+    Returns:
+        (生成元素下标, 基准元素下标)列表
+    """
+    sim = similarity_matrix.detach().cpu()
+    # 用匈牙利算法求全局最优匹配。低于阈值的配对权重置0，不会挤占其他可以过阈值的配对；
+    # 余弦相似度在[-1, 1]内，过阈值的配对再加上大于两倍匹配数上限的基础权重，
+    # 使匹配数最多的方案总是胜出，同样数量时取相似度之和最大者
+    eligible = sim >= similarity_threshold
+    weights = torch.where(eligible, sim + (2 * min(sim.shape) + 1), torch.zeros_like(sim))
+    rows, cols = linear_sum_assignment(weights.numpy(), maximize=True)
+    return [(i, j) for i, j in zip(rows.tolist(), cols.tolist()) if eligible[i, j]]
 
 def calculate_fidelity_scores(
     generated_elements: List[Dict], 
     ground_truth_elements: List[Dict],
-    similarity_threshold: float = 0.9
+    similarity_threshold: float = 0.9,
+    compile_model: bool = False
 ) -> Dict[str, float]:
     """计算关键元素保真度的分数。"""
     device = "cuda" if torch.cuda.is_available() else "cpu"
     logger.info(f"使用设备: {device}")
 
     try:
-        model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(device)
-        processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
-        bertscore = evaluate.load("bertscore")
+        model, processor = _load_clip(device, compile_model)
+        bertscore = _load_bertscore(device)
     except Exception as e:
         logger.error(f"加载模型失败: {e}")
         logger.error("请确保已设置HF_ENDPOINT或网络连接正常。")
         return {"error": "模型加载失败"}
 
-    gt_embeddings = [get_image_embedding(elem["image_path"], model, processor, device) for elem in ground_truth_elements]
-    gen_embeddings = [get_image_embedding(elem["image_path"], model, processor, device) for elem in generated_elements]
+    gt_tensor, valid_gt_elements = get_image_embeddings(ground_truth_elements, model, processor, device)
+    gen_tensor, generated_elements = get_image_embeddings(generated_elements, model, processor, device)
 
-    # 过滤掉处理失败的嵌入
-    gt_embeddings = [emb for emb in gt_embeddings if emb.nelement() > 0]
-    gen_embeddings = [emb for emb in gen_embeddings if emb.nelement() > 0]
-
-    if not gt_embeddings or not gen_embeddings:
+    if gt_tensor.nelement() == 0 or gen_tensor.nelement() == 0:
         logger.warning("无法计算有效的图像嵌入。")
         return {"recall": 0.0, "precision": 0.0, "f1_score": 0.0}
 
-    # 计算相似度矩阵
-    gt_tensor = torch.cat(gt_embeddings)
-    gen_tensor = torch.cat(gen_embeddings)
-    similarity_matrix = torch.matmul(gen_tensor, gt_tensor.T)
+    # 计算余弦相似度矩阵：归一化后一次矩阵乘法
+    similarity_matrix = F.normalize(gen_tensor, dim=1) @ F.normalize(gt_tensor, dim=1).T
 
     # 视觉匹配
     matched_pairs = []
     matched_gt_indices = set()
-    for i, gen_elem in enumerate(generated_elements):
-        similarities = similarity_matrix[i]
-        best_match_idx = torch.argmax(similarities).item()
-        best_score = similarities[best_match_idx].item()
-
-        if best_score >= similarity_threshold:
-            if best_match_idx not in matched_gt_indices:
-                matched_pairs.append({
-                    "gen": gen_elem,
-                    "gt": ground_truth_elements[best_match_idx]
-                })
-                matched_gt_indices.add(best_match_idx)
+    for i, j in match_elements(similarity_matrix, similarity_threshold):
+        matched_pairs.append({
+            "gen": generated_elements[i],
+            "gt": valid_gt_elements[j]
+        })
+        matched_gt_indices.add(j)
 
     # 计算召回率 (Recall)
     recall = len(matched_gt_indices) / len(ground_truth_elements) if ground_truth_elements else 0.0
@@ -129,11 +194,16 @@ def calculate_fidelity_scores(
     if not matched_pairs:
         precision = 0.0
     else:
-        predictions = [pair["gen"]["caption_text"] for pair in matched_pairs]
-        references = [pair["gt"]["caption_text"] for pair in matched_pairs]
+        caption_pairs = [(pair["gen"]["caption_text"], pair["gt"]["caption_text"]) for pair in matched_pairs]
         
-        score_results = bertscore.compute(predictions=predictions, references=references, lang="en")
-        precision = sum(score_results["f1"]) / len(score_results["f1"])
+        # 相同的(生成标题, 基准标题)对只计算一次
+        unique_pairs = list(dict.fromkeys(caption_pairs))
+        _, _, f1_scores = bertscore.score(
+            [pred for pred, _ in unique_pairs],
+            [ref for _, ref in unique_pairs]
+        )
+        f1_by_pair = dict(zip(unique_pairs, f1_scores.tolist()))
+        precision = sum(f1_by_pair[pair] for pair in caption_pairs) / len(caption_pairs)
 
     # 计算F1分数
     if recall + precision == 0:
@@ -147,28 +217,44 @@ def calculate_fidelity_scores(
         "f1_score": f1_score
     }
 
-def main():
-    parser = argparse.ArgumentParser(description="评估关键元素的保真度。")
-    parser.add_argument("--tex-path", required=True, help="生成的.tex文件路径。")
-    parser.add_argument("--images-dir", required=True, help="包含生成图片的目录路径。")
-    parser.add_argument("--ground-truth-json", required=True, help="基准集JSON文件路径。")
-    args = parser.parse_args()
+def run(tex_path: Path, images_dir: Path, ground_truth_json: Path, compile_model: bool = False) -> Dict[str, Any]:
+    """
+    评估一份生成的.tex文件的关键元素保真度，可由基准测试脚本直接导入调用。
+
+    Args:
+        tex_path: 生成的.tex文件路径
+        images_dir: 包含生成图片的目录路径
+        ground_truth_json: 基准集JSON文件路径
+        compile_model: 是否用torch.compile编译CLIP图像编码器
 
+    Returns:
+        包含recall、precision和f1_score的分数字典，失败时包含error
+    """
     # 1. 加载基准集
     try:
-        with open(args.ground_truth_json, 'r', encoding='utf-8') as f:
+        with open(ground_truth_json, 'r', encoding='utf-8') as f:
             ground_truth_elements = json.load(f)
     except (FileNotFoundError, json.JSONDecodeError) as e:
         logger.error(f"加载基准集JSON失败: {e}")
-        return
+        return {"error": "基准集加载失败"}
 
     # 2. 提取生成的元素
-    generated_elements = extract_generated_elements(Path(args.tex_path), Path(args.images_dir))
+    generated_elements = extract_generated_elements(Path(tex_path), Path(images_dir))
 
     # 3. 计算分数
-    scores = calculate_fidelity_scores(generated_elements, ground_truth_elements)
+    return calculate_fidelity_scores(generated_elements, ground_truth_elements, compile_model=compile_model)
+
+def main():
+    parser = argparse.ArgumentParser(description="评估关键元素的保真度。")
+    parser.add_argument("--tex-path", required=True, help="生成的.tex文件路径。")
+    parser.add_argument("--images-dir", required=True, help="包含生成图片的目录路径。")
+    parser.add_argument("--ground-truth-json", required=True, help="基准集JSON文件路径。")
+    parser.add_argument("--compile", action="store_true", help="用torch.compile编译CLIP图像编码器，适合图片很多的评估。")
+    args = parser.parse_args()
+
+    scores = run(Path(args.tex_path), Path(args.images_dir), Path(args.ground_truth_json), compile_model=args.compile)
 
-    # 4. 打印结果
+    # 打印结果
     print("\n" + "="*30)
     print("   关键元素保真度评估结果")
     print("="*30)
@@ -6,10 +6,14 @@
 """
 
 import os
+import sys
 import json
 import argparse
 import logging
+import functools
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Optional
 from paddleocr import PaddleOCR
 
 # 设置日志
@@ -20,8 +24,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def ocr_image_to_text(ocr_engine, image_path: str) -> str:
-    """使用PaddleOCR从图片中提取文本。"""
+@functools.lru_cache(maxsize=1)
+def _load_ocr_engine() -> PaddleOCR:
+    """初始化PaddleOCR引擎，同一进程内只初始化一次。"""
+    # 根据新版API调整参数，移除了use_gpu
+    return PaddleOCR(use_textline_orientation=True, lang='en')
+
+def ocr_image_to_text(ocr_engine, image_path: str) -> Optional[str]:
+    """使用PaddleOCR从图片中提取文本；图片中没有文本时返回空字符串，OCR出错时返回None。"""
     try:
         # 使用新版API的predict方法，并移除不支持的cls参数
         result = ocr_engine.predict(image_path)
@@ -31,38 +41,54 @@ def ocr_image_to_text(ocr_engine, image_path: str) -> str:
             return " ".join(text_lines)
     except Exception as e:
         logger.error(f"对图片 {image_path} 进行OCR时出错: {e}")
+        return None
     return ""
 
-def process_dataset(dataset_path: Path):
+def _init_ocr_worker():
+    """进程池初始化函数：每个子进程只初始化一次OCR引擎。"""
+    _load_ocr_engine()
+
+def _ocr_worker(image_path: str) -> Optional[str]:
+    """在子进程中对单张图片进行OCR。"""
+    return ocr_image_to_text(_load_ocr_engine(), image_path)
+
+def process_dataset(dataset_path: Path, max_workers: int = 1) -> bool:
     """
     处理整个数据集，为每篇论文生成一个基准JSON文件。
+
+    Args:
+        dataset_path: 数据集根目录
+        max_workers: 并行OCR的进程数，为1时在当前进程中串行处理
+
+    Returns:
+        OCR引擎初始化成功时返回True；单张图片OCR出错时仍返回True，只记录错误日志
     """
     logger.info(f"开始处理数据集: {dataset_path}")
     
     # 初始化OCR引擎
-    # 使用英文模型，不使用GPU
-    try:
-        # 根据新版API调整参数，移除了use_gpu
-        ocr_engine = PaddleOCR(use_textline_orientation=True, lang='en')
-        logger.info("PaddleOCR引擎初始化成功。")
-    except Exception as e:
-        logger.error(f"初始化PaddleOCR失败: {e}")
-        logger.error("请确保已正确安装paddlepaddle和paddleocr。")
-        return
+    # 使用英文模型，不使用GPU；多进程时由每个子进程各自初始化
+    if max_workers <= 1:
+        try:
+            _load_ocr_engine()
+            logger.info("PaddleOCR引擎初始化成功。")
+        except Exception as e:
+            logger.error(f"初始化PaddleOCR失败: {e}")
+            logger.error("请确保已正确安装paddlepaddle和paddleocr。")
+            return False
 
     paper_dirs = sorted([d for d in dataset_path.iterdir() if d.is_dir()])
 
+    # 先收集所有论文的(序号, caption图片, graph图片)，再统一进行OCR
+    paper_tasks = []
     for paper_dir in paper_dirs:
-        logger.info(f"--- 正在处理论文: {paper_dir.name} ---")
         graph_dir = paper_dir / "graph"
         caption_dir = paper_dir / "caption"
-        output_json_path = paper_dir / "ground_truth_visuals.json"
 
         if not graph_dir.is_dir() or not caption_dir.is_dir():
             logger.warning(f"在 {paper_dir} 中找不到 graph 或 caption 目录，跳过。")
             continue
 
-        ground_truth_data = []
+        tasks = []
         
         # 获取所有caption图片并排序，以确保一致性
         caption_images = sorted(caption_dir.glob("*.png"))
@@ -75,8 +101,25 @@ def process_dataset(dataset_path: Path):
                 logger.warning(f"找不到对应的graph图片 {graph_image_path}，跳过。")
                 continue
 
-            logger.info(f"正在对 {caption_image_path} 进行OCR...")
-            caption_text = ocr_image_to_text(ocr_engine, str(caption_image_path))
+            tasks.append((i, caption_image_path, graph_image_path))
+        paper_tasks.append((paper_dir, tasks))
+
+    image_paths = [str(caption_image_path) for _, tasks in paper_tasks for _, caption_image_path, _ in tasks]
+    logger.info(f"共 {len(image_paths)} 张caption图片待OCR，进程数: {max_workers}")
+    if max_workers > 1:
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_ocr_worker) as executor:
+            caption_texts = iter(list(executor.map(_ocr_worker, image_paths, chunksize=4)))
+    else:
+        caption_texts = map(_ocr_worker, image_paths)
+
+    failed_images = 0
+    for paper_dir, tasks in paper_tasks:
+        logger.info(f"--- 正在处理论文: {paper_dir.name} ---")
+        output_json_path = paper_dir / "ground_truth_visuals.json"
+        ground_truth_data = []
+
+        for i, caption_image_path, graph_image_path in tasks:
+            caption_text = next(caption_texts)
 
             if caption_text:
                 element = {
@@ -87,13 +130,19 @@ def process_dataset(dataset_path: Path):
                 ground_truth_data.append(element)
                 logger.info(f"成功处理: {caption_image_path.name} -> '{caption_text[:50]}...'")
             else:
+                if caption_text is None:
+                    failed_images += 1
                 logger.warning(f"未能从 {caption_image_path} 提取文本。")
 
-        # 将结果保存到JSON文件
-        if ground_truth_data:
-            with open(output_json_path, 'w', encoding='utf-8') as f:
-                json.dump(ground_truth_data, f, ensure_ascii=False, indent=2)
-            logger.info(f"基准集已保存到: {output_json_path}")
+        # 将结果保存到JSON文件；没有可用图片的论文也写入空列表，表示已处理
+        with open(output_json_path, 'w', encoding='utf-8') as f:
+            json.dump(ground_truth_data, f, ensure_ascii=False, indent=2)
+        logger.info(f"基准集已保存到: {output_json_path}")
+
+    # 单张图片出错不影响退出状态，benchmark_utils据此日志判断基准集不完整
+    if failed_images:
+        logger.error(f"{failed_images} 张图片OCR出错，基准集不完整。")
+    return True
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="为关键元素保真度评估准备基准集。")
@@ -102,7 +151,14 @@ if __name__ == "__main__":
         default="dataset/silver",
         help="数据集根目录的路径。"
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=max(1, (os.cpu_count() or 2) // 2),
+        help="并行OCR的进程数，默认使用一半CPU核心。"
+    )
     args = parser.parse_args()
 
     dataset_path = Path(args.dataset_path)
-    process_dataset(dataset_path)
+    if not process_dataset(dataset_path, args.workers):
+        sys.exit(1)
@@ -0,0 +1,26 @@
+import unittest
+
+import torch
+
+from evaluate_fidelity import match_elements
+
+class TestMatchElements(unittest.TestCase):
+
+    def test_sub_threshold_pairs_do_not_displace_matches(self):
+        # The assignment with the largest raw similarity (0.99 + 0.89) keeps only one pair above 0.9
+        sim = torch.tensor([[0.90, 0.89], [0.99, 0.90]])
+        self.assertEqual(match_elements(sim, 0.9), [(0, 0), (1, 1)])
+
+    def test_more_matches_win_over_higher_similarity(self):
+        sim = torch.tensor([[0.95, 0.50, 0.50], [1.00, 0.50, 0.50], [0.50, 1.00, 0.95]])
+        self.assertEqual(len(match_elements(sim, 0.9)), 2)
+        sim = torch.tensor([[0.91, 1.00], [1.00, 0.10]])
+        self.assertEqual(match_elements(sim, 0.9), [(0, 1), (1, 0)])
+
+    def test_rectangular_and_no_match(self):
+        sim = torch.tensor([[0.95, 0.20, 0.93]])
+        self.assertEqual(match_elements(sim, 0.9), [(0, 0)])
+        self.assertEqual(match_elements(torch.tensor([[0.1, 0.2]]), 0.9), [])
+
+if __name__ == '__main__':
+    unittest.main()
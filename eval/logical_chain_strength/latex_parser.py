@@ -1,32 +1,58 @@
+import os
 import re
-from typing import List, Dict
+import json
+import mmap
+import hashlib
+from typing import List, Dict, Optional
+
+# Cleaning rules, compiled once at import time. Rules that share a replacement and can run at the
+# same point of the pipeline are folded into one alternation, so every pass is a plain C-level
+# substitution without a Python callback.
+_COMMENT_RE = re.compile(r'%.*?\n')
+_FIGURE_ENV_RE = re.compile(r'\\begin{figure}.*?\\end{figure}', re.DOTALL)
+_INCLUDEGRAPHICS_RE = re.compile(r'\\includegraphics.*?{.*?}')
+_SECTION_LABEL_RE = re.compile(
+    r'(?s:\\(?:frame|sub?section\*?|frametitle){.*?})'  # frame title and sectioning commands
+    r'|\\label{.*?}'                                   # labels
+    # citation and cross-reference keys are identifiers, not prose; drop them with their arguments
+    r'|\\(?:[a-zA-Z]*cite[a-zA-Z]*|(?:eq|auto|page|name)?ref|[cC]ref|url)\*?(?:\[[^\]]*\])*{[^{}]*}'
+)
+_ITEM_RE = re.compile(r'\\item\s+')
+_LEFTOVER_RE = re.compile(
+    r'\\(?:begin|end){(?:itemize|enumerate|description)}'  # list environments
+    r'|\\pause\s*'                                         # dynamic overlays
+    r'|\\[a-zA-Z]+'                                          # generic catch-all for other simple commands
+    r'|[{}]'                                                 # leftover curly braces
+)
+_WS_RE = re.compile(r'\s+')
+_FRAME_RE = re.compile(r'\\begin{frame}(.*?)\\end{frame}', re.DOTALL)
+_FRAME_TITLE_RE = re.compile(r'\\frametitle{(.*?)}', re.DOTALL)
+# Byte-level frame pattern for scanning a memory-mapped file; its literals are ASCII, which never
+# occurs inside a multi-byte UTF-8 sequence, so it matches the same spans as _FRAME_RE.
+_FRAME_BYTES_RE = re.compile(rb'\\begin{frame}(.*?)\\end{frame}', re.DOTALL)
+
+# On-disk cache of parsed frames, keyed by a hash of the .tex bytes. Bump the version whenever
+# the parsing or cleaning rules change so stale entries are ignored.
+FRAMES_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '_cache', 'frames')
+_FRAMES_CACHE_VERSION = 1
 
 def clean_tex_content(content: str) -> str:
     """
     A simple utility to clean common LaTeX commands from a string for better LLM processing.
     """
     # Remove comments
-    content = re.sub(r'%.*?\n', ' ', content)
-    # Remove frame title and other sectioning commands
-    content = re.sub(r'\\(frame|sub?section\*?|frametitle){.*?}', '', content, flags=re.DOTALL)
-    # Remove labels
-    content = re.sub(r'\\label{.*?}', '', content)
+    content = _COMMENT_RE.sub(' ', content)
+    # Replace figure environments and stray \includegraphics
+    content = _FIGURE_ENV_RE.sub('[FIGURE]', content)
+    content = _INCLUDEGRAPHICS_RE.sub('[IMAGE]', content)
+    # Remove frame title, sectioning commands, labels, citations and references
+    content = _SECTION_LABEL_RE.sub('', content)
     # Replace itemize/enumerate with simple lists
-    content = re.sub(r'\\item\s+', '- ', content)
-    content = re.sub(r'\\begin{(itemize|enumerate|description)}', '', content)
-    content = re.sub(r'\\end{(itemize|enumerate|description)}', '', content)
-    # Remove figure environments
-    content = re.sub(r'\\begin{figure}.*?\\end{figure}', '[FIGURE]', content, flags=re.DOTALL)
-    # Remove \includegraphics
-    content = re.sub(r'\\includegraphics.*?{.*?}', '[IMAGE]', content)
-    # Remove dynamic overlays
-    content = re.sub(r'\\pause\s*', '', content)
-    # A generic catch-all for other simple commands, be careful with this one
-    content = re.sub(r'\\[a-zA-Z]+', '', content)
-    # Remove leftover curly braces
-    content = re.sub(r'[{}]', '', content)
+    content = _ITEM_RE.sub('- ', content)
+    # Remove list environments, overlays, other commands and braces in one pass
+    content = _LEFTOVER_RE.sub('', content)
     # Normalize whitespace
-    content = re.sub(r'\s+', ' ', content).strip()
+    content = _WS_RE.sub(' ', content).strip()
     return content
 
 def extract_frames_from_tex(tex_content: str) -> List[Dict[str, str]]:
@@ -40,40 +66,88 @@ def extract_frames_from_tex(tex_content: str) -> List[Dict[str, str]]:
         A list of dictionaries, where each dictionary represents a frame
         and contains its 'title' and 'content'.
     """
-    frame_pattern = re.compile(r'\\begin{frame}(.*?)\\end{frame}', re.DOTALL)
-    title_pattern = re.compile(r'\\frametitle{(.*?)}', re.DOTALL)
+    return [_parse_frame(match.group(1)) for match in _FRAME_RE.finditer(tex_content)]
+
+def _parse_frame(frame_block: str) -> Dict[str, str]:
+    """
+    Extracts the title and cleaned content of a single frame body.
+    """
+    title_match = _FRAME_TITLE_RE.search(frame_block)
+    title = title_match.group(1).strip() if title_match else ""
+    
+    # Combine title and content for classification
+    full_content = f"Title: {title}\n\nContent: {clean_tex_content(frame_block)}"
+    
+    return {
+        "title": title,
+        "cleaned_content": full_content.strip()
+    }
+
+def _decode_block(block: bytes) -> str:
+    """
+    Decodes a UTF-8 byte slice, normalizing newlines the way text-mode reading does.
+    """
+    text = block.decode('utf-8')
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
 
-    frames = []
-    for match in frame_pattern.finditer(tex_content):
-        frame_block = match.group(1)
-        
-        title_match = title_pattern.search(frame_block)
-        title = title_match.group(1).strip() if title_match else ""
-        
-        # Combine title and content for classification
-        full_content = f"Title: {title}\n\nContent: {clean_tex_content(frame_block)}"
-        
-        frames.append({
-            "title": title,
-            "cleaned_content": full_content.strip()
-        })
-        
-    return frames
+def _load_cached_frames(digest: str) -> Optional[List[Dict[str, str]]]:
+    """
+    Returns the cached frames for a content digest, or None on a miss.
+    """
+    try:
+        with open(os.path.join(FRAMES_CACHE_DIR, f"{digest}.json"), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def _save_cached_frames(digest: str, frames: List[Dict[str, str]]) -> None:
+    """
+    Stores parsed frames under a content digest; write failures only cost the cache.
+    """
+    path = os.path.join(FRAMES_CACHE_DIR, f"{digest}.json")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(FRAMES_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(frames, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
 
-def get_frames_from_file(file_path: str) -> List[Dict[str, str]]:
+def get_frames_from_file(file_path: str, use_cache: bool = False) -> List[Dict[str, str]]:
     """
     Reads a .tex file and extracts the content of each frame.
 
+    The file is memory-mapped and scanned as bytes; only the frame bodies are decoded,
+    so large decks are never copied into one big string.
+
     Args:
         file_path: The path to the .tex file.
+        use_cache: Reuse frames parsed earlier from a file with identical bytes.
 
     Returns:
         A list of dictionaries representing the frames.
     """
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return extract_frames_from_tex(content)
+        with open(file_path, 'rb') as f:
+            # mmap cannot map an empty file
+            if f.seek(0, 2) == 0:
+                return []
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                digest = None
+                if use_cache:
+                    hasher = hashlib.blake2b(f"logical_chain_strength:{_FRAMES_CACHE_VERSION}:".encode(), digest_size=16)
+                    hasher.update(mm)
+                    digest = hasher.hexdigest()
+                    frames = _load_cached_frames(digest)
+                    if frames is not None:
+                        return frames
+                frames = [_parse_frame(_decode_block(match.group(1))) for match in _FRAME_BYTES_RE.finditer(mm)]
+        if digest:
+            _save_cached_frames(digest, frames)
+        return frames
     except FileNotFoundError:
         print(f"Error: File not found at {file_path}")
         return []
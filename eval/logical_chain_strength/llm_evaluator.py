@@ -1,6 +1,7 @@
 import os
 import sys
-from typing import List, Dict
+import asyncio
+from typing import List, Dict, Tuple
 
 # Add project root to sys.path to allow importing patch_openai
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -19,7 +20,7 @@ elif os.path.exists(os.path.join(project_root, "env.local")):
 patch_langchain_openai()
 
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.pydantic_v1 import BaseModel, Field, constr
+from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 
 # Define the structured output model for the score
@@ -34,15 +35,34 @@ class TransitionScore(BaseModel):
         description="A brief justification for the assigned score."
     )
 
+class TransitionScoreList(BaseModel):
+    """Scores for several slide transitions, in the order the pairs were given."""
+    transitions: List[TransitionScore] = Field(
+        description="Exactly one score per pair, in the same order as the pairs."
+    )
+
 class LLMTransitionEvaluator:
-    def __init__(self, model_name: str = "gpt-4o", temperature: float = 0):
+    def __init__(self, model_name: str = "gpt-4o", temperature: float = 0, max_concurrency: int = 10,
+                 pairs_per_request: int = 1, request_timeout: float = 60, max_retries: int = 3):
         """
         Initializes the LLM transition evaluator.
+
+        Args:
+            model_name: The name of the language model to use.
+            temperature: The sampling temperature.
+            max_concurrency: The maximum number of LLM requests in flight at once in a batch.
+            pairs_per_request: How many transitions are packed into one LLM request in a batch.
+                Packing amortizes the shared system prompt over several pairs; 1 scores every pair separately.
+            request_timeout: Seconds to wait for a single LLM response before it is retried.
+            max_retries: How many times a timed-out or failed request is retried, with exponential backoff,
+                before the transition falls back to a score of 0.
         """
         if not os.environ.get("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY environment variable not set.")
             
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        self.llm = ChatOpenAI(model=model_name, temperature=temperature, timeout=request_timeout, max_retries=max_retries)
+        self.max_concurrency = max_concurrency
+        self.pairs_per_request = max(1, pairs_per_request)
         self.structured_llm = self.llm.with_structured_output(TransitionScore)
         
         self.prompt = ChatPromptTemplate.from_messages([
@@ -66,6 +86,17 @@ class LLMTransitionEvaluator:
         
         self.chain = self.prompt | self.structured_llm
 
+        # Multi-pair prompt: the same system message, with the pairs listed in the human message
+        self.group_prompt = ChatPromptTemplate.from_messages([
+            self.prompt.messages[0],
+            ("human",
+             "Evaluate each of the following {num_pairs} transitions independently, each from its Slide N to its Slide N+1. "
+             "Return exactly {num_pairs} scores, in the same order as the pairs.\n\n"
+             "{pairs}"
+            )
+        ])
+        self.group_chain = self.group_prompt | self.llm.with_structured_output(TransitionScoreList)
+
     def evaluate_transition(self, slide_n_content: str, slide_n1_content: str) -> Dict[str, any]:
         """
         Evaluates the logical transition between two slides.
@@ -86,3 +117,92 @@ class LLMTransitionEvaluator:
         except Exception as e:
             print(f"An error occurred during LLM evaluation: {e}")
             return {"score": 0, "reasoning": "Error during evaluation."} # Default to 0 on error
+
+    async def aevaluate_transition(self, slide_n_content: str, slide_n1_content: str) -> Dict[str, any]:
+        """
+        Asynchronous version of evaluate_transition.
+
+        Args:
+            slide_n_content: The cleaned text content of the first slide.
+            slide_n1_content: The cleaned text content of the second slide.
+
+        Returns:
+            A dictionary containing the 'score' and 'reasoning'.
+        """
+        try:
+            response = await self.chain.ainvoke({
+                "slide_n_content": slide_n_content,
+                "slide_n1_content": slide_n1_content
+            })
+            return {"score": response.score, "reasoning": response.reasoning}
+        except Exception as e:
+            print(f"An error occurred during LLM evaluation: {e}")
+            return {"score": 0, "reasoning": "Error during evaluation."} # Default to 0 on error
+
+    async def aevaluate_transition_group(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, any]]:
+        """
+        Evaluates several transitions with a single LLM request.
+
+        If the request fails or the reply does not hold exactly one score per pair,
+        the pairs are evaluated one by one instead.
+
+        Args:
+            pairs: A list of (slide_n_content, slide_n1_content) tuples.
+
+        Returns:
+            A list of result dictionaries in the same order as the input pairs.
+        """
+        if len(pairs) == 1:
+            return [await self.aevaluate_transition(*pairs[0])]
+
+        pairs_text = "\n\n".join(
+            f"### Pair {k}\n"
+            f"--- Slide N Content ---\n{slide_n_content}\n\n"
+            f"--- Slide N+1 Content ---\n{slide_n1_content}"
+            for k, (slide_n_content, slide_n1_content) in enumerate(pairs, 1)
+        )
+        try:
+            response = await self.group_chain.ainvoke({"num_pairs": len(pairs), "pairs": pairs_text})
+            if len(response.transitions) != len(pairs):
+                raise ValueError(f"expected {len(pairs)} scores, got {len(response.transitions)}")
+            return [{"score": t.score, "reasoning": t.reasoning} for t in response.transitions]
+        except Exception as e:
+            print(f"Grouped LLM evaluation failed ({e}); evaluating the pairs one by one.")
+            return [await self.aevaluate_transition(a, b) for a, b in pairs]
+
+    async def evaluate_transitions_batch(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, any]]:
+        """
+        Evaluates several transitions concurrently.
+
+        The pairs are packed pairs_per_request at a time into LLM requests. Each request is a
+        network round-trip, so they are issued together and at most max_concurrency of them
+        are in flight at once to stay clear of rate limits.
+
+        Args:
+            pairs: A list of (slide_n_content, slide_n1_content) tuples.
+
+        Returns:
+            A list of result dictionaries in the same order as the input pairs.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        size = self.pairs_per_request
+        groups = [pairs[i:i + size] for i in range(0, len(pairs), size)]
+
+        async def evaluate(group: List[Tuple[str, str]]) -> List[Dict[str, any]]:
+            async with semaphore:
+                return await self.aevaluate_transition_group(group)
+
+        results = await asyncio.gather(*(evaluate(group) for group in groups))
+        return [result for group_results in results for result in group_results]
+
+    def evaluate_transitions(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, any]]:
+        """
+        Synchronous wrapper around evaluate_transitions_batch.
+
+        Args:
+            pairs: A list of (slide_n_content, slide_n1_content) tuples.
+
+        Returns:
+            A list of result dictionaries in the same order as the input pairs.
+        """
+        return asyncio.run(self.evaluate_transitions_batch(pairs))
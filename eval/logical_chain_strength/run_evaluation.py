@@ -1,22 +1,28 @@
 import argparse
 import json
-import numpy as np
 from latex_parser import get_frames_from_file
 from llm_evaluator import LLMTransitionEvaluator
 
-def run_evaluation(tex_file_path: str, model_name: str = "gpt-4o"):
+def run_evaluation(tex_file_path: str, model_name: str = "gpt-4o", max_concurrency: int = 10,
+                   pairs_per_request: int = 1, request_timeout: float = 60, max_retries: int = 3,
+                   use_cache: bool = False):
     """
     Runs the full logical chain strength evaluation for a given .tex file.
 
     Args:
         tex_file_path: The path to the .tex file to be evaluated.
         model_name: The name of the language model to use for evaluation.
+        max_concurrency: The maximum number of concurrent LLM requests.
+        pairs_per_request: The number of transitions scored in one LLM request.
+        request_timeout: Seconds to wait for one LLM response before retrying it.
+        max_retries: The maximum number of retries per LLM request.
+        use_cache: Reuse frames parsed earlier from an identical .tex file.
     """
     print(f"--- Starting Logical Chain Strength Evaluation for {tex_file_path} ---")
 
     # 1. Parse LaTeX file to extract frames
     print("\nStep 1: Parsing LaTeX file...")
-    frames = get_frames_from_file(tex_file_path)
+    frames = get_frames_from_file(tex_file_path, use_cache=use_cache)
     if not frames or len(frames) < 2:
         print("Not enough frames (< 2) to evaluate transitions. Aborting.")
         return
@@ -25,20 +31,23 @@ def run_evaluation(tex_file_path: str, model_name: str = "gpt-4o"):
 
     # 2. Evaluate transitions between adjacent frames
     print("\nStep 2: Evaluating transitions between adjacent frames using LLM...")
-    evaluator = LLMTransitionEvaluator(model_name=model_name)
-    transition_scores = []
+    evaluator = LLMTransitionEvaluator(
+        model_name=model_name,
+        max_concurrency=max_concurrency,
+        pairs_per_request=pairs_per_request,
+        request_timeout=request_timeout,
+        max_retries=max_retries
+    )
+    
+    # All transitions are sent concurrently; results come back in frame order
+    pairs = [
+        (frames[i]['cleaned_content'], frames[i+1]['cleaned_content'])
+        for i in range(len(frames) - 1)
+    ]
+    transition_scores = evaluator.evaluate_transitions(pairs)
     
-    for i in range(len(frames) - 1):
-        slide_n = frames[i]
-        slide_n1 = frames[i+1]
-        
-        print(f"  - Evaluating transition from Frame {i+1} ('{slide_n['title']}') to Frame {i+2} ('{slide_n1['title']}')")
-        
-        result = evaluator.evaluate_transition(
-            slide_n['cleaned_content'],
-            slide_n1['cleaned_content']
-        )
-        transition_scores.append(result)
+    for i, result in enumerate(transition_scores):
+        print(f"  - Transition from Frame {i+1} ('{frames[i]['title']}') to Frame {i+2} ('{frames[i+1]['title']}')")
         print(f"    -> Score: {result['score']}, Reasoning: {result['reasoning']}")
 
     # 3. Calculate final scores
@@ -49,9 +58,13 @@ def run_evaluation(tex_file_path: str, model_name: str = "gpt-4o"):
         average_score = 0.0
         coherence_rate = 0.0
     else:
-        average_score = np.mean(scores)
-        # Coherence rate is the percentage of scores >= 3
-        coherent_transitions = sum(1 for s in scores if s >= 3)
+        # One pass for both the mean and the coherence rate (the percentage of scores >= 3)
+        total = 0
+        coherent_transitions = 0
+        for s in scores:
+            total += s
+            coherent_transitions += s >= 3
+        average_score = total / len(scores)
         coherence_rate = coherent_transitions / len(scores)
 
     print("\n--- Evaluation Complete ---")
@@ -95,9 +108,46 @@ def main():
         default="gpt-4o",
         help="The language model to use for evaluation (e.g., 'gpt-4o')."
     )
+    parser.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=10,
+        help="The maximum number of concurrent LLM requests."
+    )
+    parser.add_argument(
+        "--pairs-per-request",
+        type=int,
+        default=1,
+        help="The number of transitions scored in one LLM request (e.g., 8). Fewer, larger requests share the system prompt."
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=60,
+        help="Seconds to wait for one LLM response before retrying it."
+    )
+    parser.add_argument(
+        "--max-retries",
+        type=int,
+        default=3,
+        help="The maximum number of retries per LLM request, with exponential backoff."
+    )
+    parser.add_argument(
+        "--use-cache",
+        action="store_true",
+        help="Reuse frames parsed earlier from an identical .tex file (stored under eval/_cache/frames)."
+    )
     args = parser.parse_args()
     
-    run_evaluation(args.tex_file, args.model)
+    run_evaluation(
+        args.tex_file,
+        args.model,
+        args.max_concurrency,
+        args.pairs_per_request,
+        args.request_timeout,
+        args.max_retries,
+        args.use_cache
+    )
 
 if __name__ == "__main__":
     main()
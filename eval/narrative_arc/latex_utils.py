@@ -1,4 +1,36 @@
+import os
 import re
+import json
+import hashlib
+
+# Patterns used by extract_frames, compiled once at import time.
+_RE_FRAME_TITLE = re.compile(r'\\frametitle\{(.*?)\}')
+_RE_COMMAND = re.compile(r'\\[a-zA-Z]+(\[.*?\])?(\{.*?\})?')
+
+# On-disk cache of extracted frames, keyed by a hash of the .tex content. Bump the version
+# whenever the extraction rules change so stale entries are ignored.
+FRAMES_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '_cache', 'frames')
+_FRAMES_CACHE_VERSION = 2
+
+_FRAME_BEGIN = '\\begin{frame}'
+_FRAME_END = '\\end{frame}'
+
+def _iter_frame_bodies(tex_content):
+    """
+    Yields the text between each \\begin{frame} and the next \\end{frame}.
+    A linear str.find scan; matches the same spans as a non-greedy DOTALL regex.
+    """
+    pos = 0
+    while True:
+        begin = tex_content.find(_FRAME_BEGIN, pos)
+        if begin == -1:
+            return
+        start = begin + len(_FRAME_BEGIN)
+        end = tex_content.find(_FRAME_END, start)
+        if end == -1:
+            return
+        yield tex_content[start:end]
+        pos = end + len(_FRAME_END)
 
 def extract_frames(tex_content):
     """
@@ -6,21 +38,41 @@ def extract_frames(tex_content):
     A frame is defined by \begin{frame}...\end{frame}.
     This function returns a list of strings, where each string is the content of a frame.
     """
-    # This regex finds all content between \begin{frame} and \end{frame}
-    # It uses re.DOTALL to make '.' match newlines.
-    # It is non-greedy (.*?) to handle multiple frames correctly.
-    frames = re.findall(r'\\begin{frame}(.*?)\\end{frame}', tex_content, re.DOTALL)
-    
     cleaned_frames = []
-    for frame in frames:
+    for frame in _iter_frame_bodies(tex_content):
         # Extract frame title if it exists
-        title_match = re.search(r'\\frametitle\{(.*?)\}', frame)
+        title_match = _RE_FRAME_TITLE.search(frame)
         title = title_match.group(1) if title_match else ""
         
         # A simple approach to remove some common LaTeX commands for cleaner text
-        content = re.sub(r'\\[a-zA-Z]+(\[.*?\])?(\{.*?\})?', '', frame)
-        content = content.replace('\n', ' ').replace('  ', ' ').strip()
+        content = _RE_COMMAND.sub('', frame)
+        # Collapse every whitespace run (newlines included) to a single space
+        content = ' '.join(content.split())
         
         cleaned_frames.append({"title": title, "content": content})
         
     return cleaned_frames
+
+def extract_frames_cached(tex_content):
+    """
+    Same as extract_frames, but reuses the frames stored on disk for identical .tex content.
+    """
+    hasher = hashlib.blake2b(f"narrative_arc:{_FRAMES_CACHE_VERSION}:".encode(), digest_size=16)
+    hasher.update(tex_content.encode('utf-8'))
+    path = os.path.join(FRAMES_CACHE_DIR, f"{hasher.hexdigest()}.json")
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        pass
+
+    frames = extract_frames(tex_content)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        os.makedirs(FRAMES_CACHE_DIR, exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(frames, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return frames
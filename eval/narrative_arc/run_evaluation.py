@@ -5,10 +5,12 @@ Metric 2.1: Narrative Arc Integrity Evaluation
 """
 
 import argparse
+import asyncio
 import json
+import logging
 import os
 import sys
-from typing import List, Dict
+from typing import List, Dict, Literal, Optional
 
 # Add project root to sys.path to allow importing patch_openai
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
@@ -18,10 +20,10 @@ if project_root not in sys.path:
 from dotenv import load_dotenv
 from patch_openai import patch_langchain_openai
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.pydantic_v1 import BaseModel, Field
+from pydantic import BaseModel, Field
 from langchain_openai import ChatOpenAI
 
-from latex_utils import extract_frames
+from latex_utils import extract_frames, extract_frames_cached
 
 # Load .env and apply patches
 if os.path.exists(os.path.join(project_root, ".env")):
@@ -30,6 +32,8 @@ elif os.path.exists(os.path.join(project_root, "env.local")):
     load_dotenv(os.path.join(project_root, "env.local"))
 patch_langchain_openai()
 
+logger = logging.getLogger(__name__)
+
 # --- Constants ---
 NARRATIVE_LABELS = ["Motivation", "Method", "Result", "Conclusion", "Other"]
 LABEL_MAP = {
@@ -42,6 +46,38 @@ LABEL_MAP = {
 
 # --- Core Logic ---
 
+def labels_to_nums(labels: List[str]) -> List[int]:
+    """
+    Maps labels to their narrative position, dropping 'Other'.
+    The length of the result is the number of core (non-'Other') frames.
+    
+    Args:
+        labels: A list of classified labels for each slide.
+        
+    Returns:
+        The narrative positions of the core frames, in slide order.
+    """
+    return [LABEL_MAP[label] for label in labels if LABEL_MAP[label] != -1]
+
+# Number of distinct narrative positions (Motivation .. Conclusion)
+NARRATIVE_STAGES = len([v for v in LABEL_MAP.values() if v != -1])
+
+def longest_non_decreasing_length(nums: List[int]) -> int:
+    """
+    Length of the longest non-decreasing subsequence of narrative positions.
+    """
+    # The alphabet has only NARRATIVE_STAGES values, so instead of patience sorting keep one
+    # counter per stage: longest[k] is the longest run seen so far that ends at a stage <= k.
+    # Repeated labels extend a run, so the answer is not bounded by the number of stages.
+    longest = [0] * NARRATIVE_STAGES
+    for num in nums:
+        extended = longest[num] + 1
+        for k in range(num, NARRATIVE_STAGES):
+            if longest[k] < extended:
+                longest[k] = extended
+            
+    return longest[-1]
+
 def get_longest_narrative_subsequence(labels: List[str]) -> int:
     """
     Calculates the length of the longest valid narrative subsequence.
@@ -54,57 +90,58 @@ def get_longest_narrative_subsequence(labels: List[str]) -> int:
     Returns:
         The length of the longest subsequence.
     """
-    if not labels:
-        return 0
-
-    # Map string labels to integers for LIS algorithm
     # We filter out 'Other' as it does not contribute to the narrative arc.
-    nums = [LABEL_MAP[label] for label in labels if LABEL_MAP[label] != -1]
-    
-    if not nums:
-        return 0
-
-    # Standard LIS algorithm (patience sorting)
-    tails = []
-    for num in nums:
-        if not tails or num >= tails[-1]:
-            tails.append(num)
-        else:
-            l, r = 0, len(tails) - 1
-            while l < r:
-                m = (l + r) // 2
-                if tails[m] < num:
-                    l = m + 1
-                else:
-                    r = m
-            tails[l] = num
-            
-    return len(tails)
+    return longest_non_decreasing_length(labels_to_nums(labels))
 
 class SlideCategory(BaseModel):
     """The category of the slide content."""
-    category: str = Field(
-        description="The single most appropriate category for the slide.",
-        enum=NARRATIVE_LABELS
+    category: Literal["Motivation", "Method", "Result", "Conclusion", "Other"] = Field(
+        description="The single most appropriate category for the slide."
     )
 
+# The system message is a fixed string with no per-frame content, so every request starts with
+# the same prefix and the provider can serve it from its prompt cache.
+CLASSIFIER_SYSTEM_PROMPT = (
+    "You are an expert academic reviewer. Your task is to classify the content of a presentation slide into one of the following five categories based on its primary role in a scientific narrative: [Motivation, Method, Result, Conclusion, Other].\n\n"
+    "Use your best judgment based on these guidelines:\n"
+    "- **Motivation**: Content that introduces the problem, background, or research question. (e.g., 'Why this work is important.')\n"
+    "- **Method**: Content that describes the methodology, experimental setup, or proposed algorithm. (e.g., 'How we did it.')\n"
+    "- **Result**: Content that presents the findings, data, figures, and outcomes of the experiments. (e.g., 'What we found.')\n"
+    "- **Conclusion**: Content that summarizes the work, discusses implications, limitations, or future directions. (e.g., 'What it means.')\n"
+    "- **Other**: Use for slides that do not clearly fit a single category above, such as title pages, outlines, acknowledgements, or highly mixed content.\n\n"
+    "Analyze the provided slide content and determine its single most fitting category."
+)
+
 class LLMClassifier:
-    def __init__(self, model_name: str = "gpt-4o", temperature: float = 0):
+    def __init__(self, model_name: str = "gpt-4o", temperature: float = 0, max_concurrency: int = 10,
+                 prompt_cache_key: Optional[str] = None, request_timeout: float = 60, max_retries: int = 3):
+        """
+        Initializes the slide classifier.
+
+        Args:
+            model_name: The name of the language model to use.
+            temperature: The sampling temperature.
+            max_concurrency: The maximum number of classification requests in flight at once.
+            prompt_cache_key: Optional OpenAI prompt_cache_key, routing all requests that share
+                the system prompt to the same cache.
+            request_timeout: Seconds to wait for a single LLM response before it is retried.
+            max_retries: How many times a timed-out or failed request is retried, with exponential backoff,
+                before the frame falls back to "Other".
+        """
         if not os.environ.get("OPENAI_API_KEY"):
             raise ValueError("OPENAI_API_KEY environment variable not set.")
-        self.llm = ChatOpenAI(model=model_name, temperature=temperature)
+        model_kwargs = {"prompt_cache_key": prompt_cache_key} if prompt_cache_key else {}
+        self.llm = ChatOpenAI(
+            model=model_name,
+            temperature=temperature,
+            timeout=request_timeout,
+            max_retries=max_retries,
+            model_kwargs=model_kwargs
+        )
+        self.max_concurrency = max_concurrency
         self.structured_llm = self.llm.with_structured_output(SlideCategory)
         self.prompt = ChatPromptTemplate.from_messages([
-            ("system",
-             "You are an expert academic reviewer. Your task is to classify the content of a presentation slide into one of the following five categories based on its primary role in a scientific narrative: [Motivation, Method, Result, Conclusion, Other].\n\n"
-             "Use your best judgment based on these guidelines:\n"
-             "- **Motivation**: Content that introduces the problem, background, or research question. (e.g., 'Why this work is important.')\n"
-             "- **Method**: Content that describes the methodology, experimental setup, or proposed algorithm. (e.g., 'How we did it.')\n"
-             "- **Result**: Content that presents the findings, data, figures, and outcomes of the experiments. (e.g., 'What we found.')\n"
-             "- **Conclusion**: Content that summarizes the work, discusses implications, limitations, or future directions. (e.g., 'What it means.')\n"
-             "- **Other**: Use for slides that do not clearly fit a single category above, such as title pages, outlines, acknowledgements, or highly mixed content.\n\n"
-             "Analyze the provided slide content and determine its single most fitting category."
-            ),
+            ("system", CLASSIFIER_SYSTEM_PROMPT),
             ("human", "Please classify the following slide content:\n\n---\n\n{slide_content}")
         ])
         self.chain = self.prompt | self.structured_llm
@@ -117,12 +154,54 @@ class LLMClassifier:
             logger.error(f"An error occurred during LLM classification: {e}")
             return "Other"
 
+    async def aclassify_frame(self, frame_content: str) -> str:
+        """Asynchronous version of classify_frame."""
+        try:
+            response = await self.chain.ainvoke({"slide_content": frame_content})
+            return response.category
+        except Exception as e:
+            logger.error(f"An error occurred during LLM classification: {e}")
+            return "Other"
+
+    async def aclassify_frames(self, frame_contents: List[str]) -> List[str]:
+        """
+        Classifies several frames concurrently.
+
+        Frames with identical content are classified only once. At most max_concurrency
+        requests are in flight at a time.
+
+        Args:
+            frame_contents: The text of each frame.
+
+        Returns:
+            The label of each frame, in input order.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        unique_contents = list(dict.fromkeys(frame_contents))
+
+        async def classify(content: str) -> str:
+            async with semaphore:
+                return await self.aclassify_frame(content)
+
+        labels = await asyncio.gather(*(classify(content) for content in unique_contents))
+        label_by_content = dict(zip(unique_contents, labels))
+        return [label_by_content[content] for content in frame_contents]
+
+    def classify_frames(self, frame_contents: List[str]) -> List[str]:
+        """Synchronous wrapper around aclassify_frames."""
+        return asyncio.run(self.aclassify_frames(frame_contents))
+
 # --- Main Execution ---
 
 def main():
     parser = argparse.ArgumentParser(description="Evaluate the narrative arc integrity of a Beamer presentation.")
     parser.add_argument("--tex_file", type=str, required=True, help="Path to the generated .tex file.")
     parser.add_argument("--mock", action="store_true", help="Use mock classification instead of calling LLM API.")
+    parser.add_argument("--max_concurrency", type=int, default=10, help="Maximum number of concurrent LLM requests.")
+    parser.add_argument("--request_timeout", type=float, default=60, help="Seconds to wait for one LLM response before retrying it.")
+    parser.add_argument("--max_retries", type=int, default=3, help="Maximum number of retries per LLM request, with exponential backoff.")
+    parser.add_argument("--use_cache", action="store_true", help="Reuse frames extracted earlier from identical .tex content (stored under eval/_cache/frames).")
+    parser.add_argument("--prompt_cache_key", type=str, default=None, help="Optional OpenAI prompt_cache_key shared by all classification requests.")
     args = parser.parse_args()
 
     if not os.path.exists(args.tex_file):
@@ -132,7 +211,7 @@ def main():
     with open(args.tex_file, 'r', encoding='utf-8') as f:
         tex_content = f.read()
 
-    frames = extract_frames(tex_content)
+    frames = extract_frames_cached(tex_content) if args.use_cache else extract_frames(tex_content)
     if not frames:
         print(json.dumps({"score": 0, "total_frames": 0, "longest_subsequence_len": 0, "sequence": []}))
         return
@@ -144,16 +223,24 @@ def main():
         classified_labels = [mock_sequence[i % len(mock_sequence)] for i in range(len(frames))]
     else:
         # Real LLM classification
-        classifier = LLMClassifier()
-        for frame in frames:
-            # Combine title and text for a more complete context
-            content_to_classify = f"Title: {frame.get('title', '')}\n\nBody: {frame.get('text', '')}"
-            label = classifier.classify_frame(content_to_classify)
-            classified_labels.append(label)
+        classifier = LLMClassifier(
+            max_concurrency=args.max_concurrency,
+            prompt_cache_key=args.prompt_cache_key,
+            request_timeout=args.request_timeout,
+            max_retries=args.max_retries
+        )
+        # Combine title and text for a more complete context
+        contents_to_classify = [
+            f"Title: {frame.get('title', '')}\n\nBody: {frame.get('text', '')}"
+            for frame in frames
+        ]
+        classified_labels = classifier.classify_frames(contents_to_classify)
 
 
-    longest_subsequence_len = get_longest_narrative_subsequence(classified_labels)
-    core_frames_count = len([label for label in classified_labels if label != "Other"])
+    # Map the labels once; the same list gives both the LIS and the number of core frames
+    narrative_nums = labels_to_nums(classified_labels)
+    longest_subsequence_len = longest_non_decreasing_length(narrative_nums)
+    core_frames_count = len(narrative_nums)
     score = longest_subsequence_len / core_frames_count if core_frames_count > 0 else 1.0 # If no core frames, score is 1 (no violations)
 
     result = {
@@ -46,6 +46,11 @@ class TestNarrativeArcLogic(unittest.TestCase):
         # LIS of [0, 1, 0, 2, 3] is [0, 1, 2, 3]. Length is 4.
         self.assertEqual(get_longest_narrative_subsequence(labels9), 4)
 
+        # Test case 10: Repeated labels after a drop
+        labels10 = ["Motivation", "Method", "Method", "Motivation", "Motivation", "Motivation"]
+        # Longest non-decreasing subsequence of [0, 1, 1, 0, 0, 0] is [0, 0, 0, 0]. Length is 4.
+        self.assertEqual(get_longest_narrative_subsequence(labels10), 4)
+
     def test_extract_frames(self):
         tex_content = r"""
 \documentclass{beamer}
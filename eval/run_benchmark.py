@@ -5,14 +5,16 @@
 对数据集中的所有论文运行生成和评估流程，并计算平均分。
 """
 
-import os
 import sys
-import subprocess
-import re
-import json
+import argparse
+import functools
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from types import ModuleType
+from typing import Dict, Optional
+
+from benchmark_utils import MAIN_TEX_RE, average_scores, generation_session_id, list_paper_dirs, load_evaluators, parse_main_output, prepare_ground_truth, run_command_matching, run_evaluator
 
 # 设置日志
 logging.basicConfig(
@@ -22,228 +24,110 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_command(command: List[str], env: Optional[Dict[str, str]] = None) -> Tuple[bool, str, str]:
-    """运行命令并返回其成功状态、标准输出和标准错。"""
-    logger.info(f"运行命令: {' '.join(command)}")
-    try:
-        full_env = os.environ.copy()
-        if env:
-            full_env.update(env)
-        process = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            env=full_env,
-        )
-        return True, process.stdout, process.stderr
-    except subprocess.CalledProcessError as e:
-        logger.error(f"命令失败: {' '.join(command)}")
-        logger.error(f"Stderr: {e.stderr}")
-        return False, e.stdout, e.stderr
-    except FileNotFoundError as e:
-        logger.error(f"找不到命令: {e}")
-        return False, "", str(e)
-
-def parse_main_output(output: str) -> Optional[str]:
-    """从main.py的输出中解析成的.tex文件路径。"""
-    match = re.search(r"--previous-tex='([^']+\.tex)'", output)
-    if match:
-        path = match.group(1)
-        logger.info(f"找到生成的tex文件: {path}")
-        return path
-    logger.warning("在main.py的输出中找不到.tex文件路径。")
-    return None
-
-def parse_evaluation_output(output: str) -> Optional[Dict[str, float]]:
-    """从run_evaluation.py的输出中解析内容覆盖度分数。"""
-    try:
-        bertscore_match = re.search(r"bertscore_f1:\s*([\d\.]+)", output)
-        rouge_l_match = re.search(r"rouge_l:\s*([\d\.]+)", output)
-        if bertscore_match and rouge_l_match:
-            scores = {
-                "bertscore_f1": float(bertscore_match.group(1)),
-                "rouge_l": float(rouge_l_match.group(1)),
-            }
-            logger.info(f"找到内容覆盖度分数: {scores}")
-            return scores
-    except Exception as e:
-        logger.error(f"解析内容覆盖度输出失败: {e}")
-    logger.warning("无法从内容覆盖度输出中解析分数。")
-    return None
-
-def parse_fidelity_output(output: str) -> Optional[Dict[str, float]]:
-    """从evaluate_fidelity.py的输出中解析保真度分数。"""
-    try:
-        recall_match = re.search(r"Recall:\s*([\d\.]+)", output)
-        precision_match = re.search(r"Precision:\s*([\d\.]+)", output)
-        f1_match = re.search(r"F1 Score:\s*([\d\.]+)", output)
-        if recall_match and precision_match and f1_match:
-            scores = {
-                "fidelity_recall": float(recall_match.group(1)),
-                "fidelity_precision": float(precision_match.group(1)),
-                "fidelity_f1_score": float(f1_match.group(1)),
-            }
-            logger.info(f"找到关键元素真度分数: {scores}")
-            return scores
-    except Exception as e:
-        logger.error(f"解析保真度输出失败: {e}")
-    logger.warning("无法从保真度输出中解析分数。")
-    return None
-
-def parse_text_figure_coherence_output(output: str) -> Optional[Dict[str, float]]:
-    """从text_figure_coherence/run_evaluation.py的输出中解析图文匹配度分数。"""
-    try:
-        # The output might contain logs before the JSON. Find the start of the JSON.
-        json_start_index = output.find('{')
-        if json_start_index == -1:
-            logger.warning("在图文匹配度输出中找不到JSON对象。")
-            return None
-        
-        json_output = output[json_start_index:]
-        data = json.loads(json_output)
-
-        if "average_coherence_score" in data:
-            score = data["average_coherence_score"]
-            if score is not None:
-                scores = {"text_figure_coherence": float(score)}
-                logger.info(f"找到图文匹配度分数: {scores}")
-                return scores
-    except json.JSONDecodeError as e:
-        logger.error(f"解析图文匹配度输出失败 (JSON): {e}")
-        logger.error(f"原始输出: {output}")
-    except Exception as e:
-        logger.error(f"解析图文匹配度输出失败: {e}")
-    logger.warning("无法从图文匹配度输出中解析分数。")
-    return None
+def process_paper(paper_dir: Path, evaluators: Dict[str, Optional[ModuleType]]) -> Optional[Dict[str, float]]:
+    """
+    对单篇论文运行生成和全部评估。
 
-def parse_logical_chain_output(output: str) -> Optional[Dict[str, float]]:
-    """从logical_chain_strength/run_evaluation.py的输出中解析逻辑链条分数。"""
-    try:
-        # The output might contain logs before the JSON. Find the start of the JSON.
-        json_start_index = output.find('{')
-        if json_start_index == -1:
-            logger.warning("在逻辑链条输出中找不到JSON对象。")
-            return None
-        
-        json_output = output[json_start_index:]
-        data = json.loads(json_output)
+    Args:
+        paper_dir: 论文目录，包含paper.pdf和ground_truth_visuals.json
+        evaluators: load_evaluators导入的评估模块
 
-        if "average_score" in data and "coherence_rate" in data:
-            scores = {
-                "logical_chain_avg_score": float(data["average_score"]),
-                "logical_chain_coherence_rate": float(data["coherence_rate"]),
-            }
-            logger.info(f"找到逻辑链条强度分数: {scores}")
-            return scores
-    except json.JSONDecodeError as e:
-        logger.error(f"解析逻辑链条输出失败 (JSON): {e}")
-        logger.error(f"原始输出: {output}")
-    except Exception as e:
-        logger.error(f"解析逻辑链条输出失败: {e}")
-    logger.warning("无法从逻辑链条输出中解析分数。")
-    return None
+    Returns:
+        该论文的各项分数，失败时返回None
+    """
+    logger.info(f"--- 正在处理论文: {paper_dir.name} ---")
+    pdf_path = paper_dir / "paper.pdf"
+    if not pdf_path.exists():
+        logger.warning(f"在 {paper_dir} 中找不到 paper.pdf，跳过。")
+        return None
+
+    logger.info(f"步骤 1: 为 {pdf_path} 生成 .tex 文件")
+    main_command = ["python3", "main.py", str(pdf_path), "--language", "en",
+                    "--session-id", generation_session_id(paper_dir)]
+    success, output_lines = run_command_matching(main_command, [MAIN_TEX_RE])
+    if not success:
+        logger.error(f"为 {pdf_path} 生成 .tex 文件失败。跳过。")
+        return None
+
+    tex_path_str = parse_main_output(*output_lines)
+    if not tex_path_str or not Path(tex_path_str).exists():
+        logger.error(f"找不到或无法访问生成的.tex文件。跳过。")
+        return None
+    
+    tex_path = Path(tex_path_str)
+    images_dir = tex_path.parent / "images"
+    if not images_dir.exists():
+        session_id = tex_path.parent.name
+        images_dir = Path(tex_path.parent.parent.parent) / "images" / session_id
+    
+    current_paper_scores = {}
+    # 评估器已在本进程中导入，直接调用并使用返回的分数字典
+    logger.info(f"步骤 2a: 评估内容覆盖度 {tex_path}")
+    current_paper_scores.update(run_evaluator(evaluators, "coverage", str(pdf_path), str(tex_path), "en") or {})
+
+    logger.info(f"步骤 2b: 评估关键元素保真度 {tex_path}")
+    ground_truth_json = paper_dir / "ground_truth_visuals.json"
+    if not ground_truth_json.exists():
+        logger.warning(f"找不到 {ground_truth_json}，跳过保真度评估。")
+    else:
+        current_paper_scores.update(run_evaluator(evaluators, "fidelity", tex_path, images_dir, ground_truth_json) or {})
+    
+    logger.info(f"步骤 2c: 评估逻辑链条强度 {tex_path}")
+    current_paper_scores.update(run_evaluator(evaluators, "logical_chain", str(tex_path)) or {})
+
+    logger.info(f"步骤 3: 评估图文匹配度 {tex_path}")
+    current_paper_scores.update(run_evaluator(evaluators, "coherence", tex_path) or {})
+
+    if not current_paper_scores:
+        logger.error(f"为 {paper_dir.name} 解析任何分数均失败。跳过。")
+        return None
+    logger.info(f"成功处理并评分 {paper_dir.name}")
+    return current_paper_scores
 
 def main():
     """
     在数据集运行基准测试的主函数。
     """
+    parser = argparse.ArgumentParser(description="对数据集中的所有论文运行生成和评估流程")
+    parser.add_argument(
+        "--max-parallel-papers",
+        type=int,
+        default=1,
+        help="同时处理的论文数。各论文的生成和评估相互独立，但评估模型会同时占用显存，默认逐篇处理。"
+    )
+    args = parser.parse_args()
+
     dataset_path = Path("dataset/silver")
     if not dataset_path.is_dir():
         logger.error(f"找不到数据集目录: {dataset_path}")
         sys.exit(1)
 
     logger.info("--- 步骤 0: 准备所有基准集 ---")
-    prepare_command = ["python3", "eval/key_elements_fidelity/prepare_ground_truth.py", "--dataset-path", str(dataset_path)]
-    success, _, _ = run_command(prepare_command)
-    if not success:
+    if not prepare_ground_truth(dataset_path):
         logger.error("准备基准集失败。正在中止。")
         sys.exit(1)
     logger.info("--- 所有基准集准备就绪 ---")
 
-    all_scores = []
-    paper_dirs = sorted([d for d in dataset_path.iterdir() if d.is_dir()])
-
-    for paper_dir in paper_dirs:
-        logger.info(f"--- 正在处理论文: {paper_dir.name} ---")
-        pdf_path = paper_dir / "paper.pdf"
-        if not pdf_path.exists():
-            logger.warning(f"在 {paper_dir} 中找不到 paper.pdf，跳过。")
-            continue
-
-        logger.info(f"步骤 1: 为 {pdf_path} 生成 .tex 文件")
-        main_command = ["python3", "main.py", str(pdf_path), "--language", "en"]
-        success, main_stdout, main_stderr = run_command(main_command)
-        if not success:
-            logger.error(f"为 {pdf_path} 生成 .tex 文件失败。跳过。")
-            continue
+    paper_dirs = list_paper_dirs(dataset_path)
+    evaluators = load_evaluators()
 
-        combined_output = main_stdout + "\n" + main_stderr
-        tex_path_str = parse_main_output(combined_output)
-        if not tex_path_str or not Path(tex_path_str).exists():
-            logger.error(f"找不到或无法访问生成的.tex文件。跳过。")
-            continue
-        
-        tex_path = Path(tex_path_str)
-        images_dir = tex_path.parent / "images"
-        if not images_dir.exists():
-            session_id = tex_path.parent.name
-            images_dir = Path(tex_path.parent.parent.parent) / "images" / session_id
-        
-        current_paper_scores = {}
+    # 各论文的生成子进程使用各自的会话ID，输出目录互不干扰；评估器在本进程中共享，加载模型的评估依次进行
+    with ThreadPoolExecutor(max_workers=max(1, args.max_parallel_papers)) as executor:
+        results = list(executor.map(functools.partial(process_paper, evaluators=evaluators), paper_dirs))
 
-        logger.info(f"步骤 2a: 评估内容覆盖度 {tex_path}")
-        eval_env = {"HF_ENDPOINT": "https://hf-mirror.com"}
-        coverage_command = ["python3", "eval/content_coverage/run_evaluation.py", "--pdf", str(pdf_path), "--tex", str(tex_path), "--lang", "en"]
-        success, coverage_stdout, _ = run_command(coverage_command, env=eval_env)
-        if success:
-            coverage_scores = parse_evaluation_output(coverage_stdout)
-            if coverage_scores:
-                current_paper_scores.update(coverage_scores)
-
-        logger.info(f"步骤 2b: 评估关键元素保真度 {tex_path}")
-        ground_truth_json = paper_dir / "ground_truth_visuals.json"
-        if not ground_truth_json.exists():
-            logger.warning(f"找不到 {ground_truth_json}，跳保真度评估。")
-        else:
-            fidelity_command = ["python3", "eval/key_elements_fidelity/evaluate_fidelity.py", "--tex-path", str(tex_path), "--images-dir", str(images_dir), "--ground-truth-json", str(ground_truth_json)]
-            success, fidelity_stdout, _ = run_command(fidelity_command, env=eval_env)
-            if success:
-                fidelity_scores = parse_fidelity_output(fidelity_stdout)
-                if fidelity_scores:
-                    current_paper_scores.update(fidelity_scores)
-        
-        logger.info(f"步骤 2c: 评估逻辑链条强度 {tex_path}")
-        logical_chain_command = ["python3", "eval/logical_chain_strength/run_evaluation.py", str(tex_path)]
-        success, logical_chain_stdout, _ = run_command(logical_chain_command)
-        if success:
-            logical_chain_scores = parse_logical_chain_output(logical_chain_stdout)
-            if logical_chain_scores:
-                current_paper_scores.update(logical_chain_scores)
-
-        logger.info(f"步骤 3: 评估图文匹配度 {tex_path}")
-        coherence_command = ["python3", "eval/text_figure_coherence/run_evaluation.py", "--tex-path", str(tex_path)]
-        success, coherence_stdout, _ = run_command(coherence_command)
-        if success:
-            coherence_scores = parse_text_figure_coherence_output(coherence_stdout)
-            if coherence_scores:
-                current_paper_scores.update(coherence_scores)
-
-        if current_paper_scores:
-            all_scores.append(current_paper_scores)
-            logger.info(f"成功处理并评分 {paper_dir.name}")
-        else:
-            logger.error(f"为 {paper_dir.name} 解析任何分数均失败。跳过。")
+    # 按论文目录顺序汇总，结果与逐篇处理时一致
+    all_scores = []
+    scored_papers = []
+    for paper_dir, scores in zip(paper_dirs, results):
+        if scores:
+            all_scores.append(scores)
+            scored_papers.append(paper_dir)
 
     if not all_scores:
         logger.warning("没有成功处理的论文。无法计算均分。")
         sys.exit(1)
 
-    avg_scores = {}
-    for key in all_scores[0].keys():
-        valid_scores = [s[key] for s in all_scores if key in s]
-        if valid_scores:
-            avg_scores[key] = sum(valid_scores) / len(valid_scores)
+    avg_scores = average_scores(all_scores)
 
     logger.info("--- 基准测试完成 ---")
     print("\n" + "="*40)
@@ -253,13 +137,11 @@ def main():
     print("\n" + "-"*40)
     print("        单篇论文得分详情")
     print("-"*40)
-    for i, paper_dir in enumerate(paper_dirs):
-        if i < len(all_scores):
-            print(f"\n--- 论文: {paper_dir.name} ---")
-            scores = all_scores[i]
-            for metric, value in scores.items():
-                formatted_metric = metric.replace('_', ' ').title()
-                print(f"  {formatted_metric:<25}: {value:.4f}")
+    for paper_dir, scores in zip(scored_papers, all_scores):
+        print(f"\n--- 论文: {paper_dir.name} ---")
+        for metric, value in scores.items():
+            formatted_metric = metric.replace('_', ' ').title()
+            print(f"  {formatted_metric:<25}: {value:.4f}")
     print("\n" + "="*40)
     print("           平均分总结")
     print("="*40)
@@ -282,7 +164,7 @@ def main():
         print(f"平均逻辑连贯率:   {avg_scores['logical_chain_coherence_rate']:.4f}")
     print("\n--- 指标 3.1: 图文匹配度 ---")
     if "text_figure_coherence" in avg_scores:
-        print(f"均图文匹配度分数: {avg_scores['text_figure_coherence']:.4f}")
+        print(f"平均图文匹配度分数: {avg_scores['text_figure_coherence']:.4f}")
     print("="*40)
 
 if __name__ == "__main__":
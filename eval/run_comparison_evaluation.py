@@ -5,16 +5,16 @@
 同时运行有planner和无planner版本的生成和评估，并对比结果
 """
 
-import os
 import sys
-import subprocess
 import json
 import logging
 import time
 from pathlib import Path
-from typing import Dict, List, Optional
 import argparse
 
+from benchmark_utils import average_scores, load_evaluators, run_command
+from run_evaluation_from_manifest import evaluate_manifest
+
 # 设置日志
 logging.basicConfig(
     level=logging.INFO,
@@ -23,80 +23,16 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_command(command: List[str], env: Optional[Dict[str, str]] = None) -> tuple[bool, str, str]:
-    """运行命令并返回其成功状态、标准输出和标准错误。"""
-    logger.info(f"运行命令: {' '.join(command)}")
-    try:
-        full_env = os.environ.copy()
-        if env:
-            full_env.update(env)
-        process = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            env=full_env,
-        )
-        return True, process.stdout, process.stderr
-    except subprocess.CalledProcessError as e:
-        logger.error(f"命令失败: {' '.join(command)}")
-        logger.error(f"Stderr: {e.stderr}")
-        return False, e.stdout, e.stderr
-    except FileNotFoundError as e:
-        logger.error(f"找不到命令: {e}")
-        return False, "", str(e)
-
-def parse_evaluation_results(output: str) -> Dict[str, float]:
-    """从评估输出中解析结果"""
-    results = {}
-    
-    # 解析各种指标
-    import re
-    
-    # BERTScore F1
-    bertscore_match = re.search(r"平均 BERTScore F1:\s*([\d\.]+)", output)
-    if bertscore_match:
-        results["bertscore_f1"] = float(bertscore_match.group(1))
-    
-    # ROUGE-L
-    rouge_match = re.search(r"平均 ROUGE-L:\s*([\d\.]+)", output)
-    if rouge_match:
-        results["rouge_l"] = float(rouge_match.group(1))
-    
-    # 保真度指标
-    fidelity_recall_match = re.search(r"平均召回率 \(Recall\):\s*([\d\.]+)", output)
-    if fidelity_recall_match:
-        results["fidelity_recall"] = float(fidelity_recall_match.group(1))
-    
-    fidelity_precision_match = re.search(r"平均精确度 \(Precision\):\s*([\d\.]+)", output)
-    if fidelity_precision_match:
-        results["fidelity_precision"] = float(fidelity_precision_match.group(1))
-    
-    fidelity_f1_match = re.search(r"平均 F1 分数:\s*([\d\.]+)", output)
-    if fidelity_f1_match:
-        results["fidelity_f1_score"] = float(fidelity_f1_match.group(1))
-    
-    # 逻辑链条强度
-    logical_chain_score_match = re.search(r"平均逻辑链条分数:\s*([\d\.]+)", output)
-    if logical_chain_score_match:
-        results["logical_chain_avg_score"] = float(logical_chain_score_match.group(1))
-    
-    logical_chain_coherence_match = re.search(r"平均逻辑连贯率:\s*([\d\.]+)", output)
-    if logical_chain_coherence_match:
-        results["logical_chain_coherence_rate"] = float(logical_chain_coherence_match.group(1))
-    
-    # 图文匹配度
-    text_figure_match = re.search(r"平均图文匹配度分数:\s*([\d\.]+)", output)
-    if text_figure_match:
-        results["text_figure_coherence"] = float(text_figure_match.group(1))
-    
-    return results
+def _discard_line(line: str) -> None:
+    """生成脚本的输出不需要解析，逐行丢弃（DEBUG级别日志中仍可查看，失败时保留标准错误的末尾几行）"""
 
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(description="运行有planner和无planner版本的对比评估")
     parser.add_argument("--skip-generation", action="store_true", help="跳过生成步骤，直接使用现有的manifest文件")
+    parser.add_argument("--force", action="store_true", help="重新生成全部论文，不复用已有manifest中的生成结果")
     parser.add_argument("--only-no-planner", action="store_true", help="只运行无planner版本")
+    parser.add_argument("--use-cache", action="store_true", help="评估时复用输入文件未变化的论文上次的分数，适合反复生成对比报告")
     args = parser.parse_args()
     
     start_time = time.time()
@@ -106,17 +42,18 @@ def main():
     manifest_no_planner = Path("output/eval_manifest_no_planner.json")
     
     if not args.skip_generation:
+        force_args = ["--force"] if args.force else []
         if not args.only_no_planner:
             # 步骤1: 运行有planner版本的生成
             logger.info("=== 步骤1: 运行有planner版本的生成 ===")
-            success, stdout, stderr = run_command(["python3", "eval/run_generation.py"])
+            success, stdout, stderr = run_command(["python3", "eval/run_generation.py"] + force_args, line_handler=_discard_line)
             if not success:
                 logger.error("有planner版本生成失败")
                 sys.exit(1)
         
         # 步骤2: 运行无planner版本的生成
         logger.info("=== 步骤2: 运行无planner版本的生成 ===")
-        success, stdout, stderr = run_command(["python3", "eval/run_generation_no_planner.py"])
+        success, stdout, stderr = run_command(["python3", "eval/run_generation_no_planner.py"] + force_args, line_handler=_discard_line)
         if not success:
             logger.error("无planner版本生成失败")
             sys.exit(1)
@@ -131,28 +68,24 @@ def main():
         sys.exit(1)
     
     results = {}
+    # 两个版本的评估在本进程中进行，评估器和模型只加载一次
+    evaluators = load_evaluators()
     
     if not args.only_no_planner:
         # 步骤3: 运行有planner版本的评估
         logger.info("=== 步骤3: 运行有planner版本的评估 ===")
-        success, stdout, stderr = run_command([
-            "python3", "eval/run_evaluation_from_manifest.py", 
-            "--manifest-path", str(manifest_with_planner)
-        ])
-        if success:
-            results["with_planner"] = parse_evaluation_results(stdout)
+        all_scores = evaluate_manifest(manifest_with_planner, evaluators, use_cache=args.use_cache)
+        if all_scores:
+            results["with_planner"] = average_scores(all_scores)
             logger.info("有planner版本评估完成")
         else:
             logger.error("有planner版本评估失败")
     
     # 步骤4: 运行无planner版本的评估
     logger.info("=== 步骤4: 运行无planner版本的评估 ===")
-    success, stdout, stderr = run_command([
-        "python3", "eval/run_evaluation_from_manifest.py", 
-        "--manifest-path", str(manifest_no_planner)
-    ])
-    if success:
-        results["no_planner"] = parse_evaluation_results(stdout)
+    all_scores = evaluate_manifest(manifest_no_planner, evaluators, use_cache=args.use_cache)
+    if all_scores:
+        results["no_planner"] = average_scores(all_scores)
         logger.info("无planner版本评估完成")
     else:
         logger.error("无planner版本评估失败")
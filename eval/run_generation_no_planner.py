@@ -5,14 +5,14 @@
 对数据集中的所有论文运行无planner版本的生成流程，并创建一个包含 (pdf_path, tex_path) 配对的JSON清单文件。
 """
 
-import os
 import sys
-import subprocess
+import argparse
 import re
-import json
 import logging
 from pathlib import Path
-from typing import List, Dict, Tuple, Optional
+from typing import Dict, Optional
+
+from benchmark_utils import configure_llm_rate_limit, generate_manifest, generation_session_id, list_paper_dirs, run_command_matching, search_outputs
 
 # 设置日志
 logging.basicConfig(
@@ -22,33 +22,14 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-def run_command(command: List[str], env: Optional[Dict[str, str]] = None) -> Tuple[bool, str, str]:
-    """运行命令并返回其成功状态、标准输出和标准错误。"""
-    logger.info(f"运行命令: {' '.join(command)}")
-    try:
-        full_env = os.environ.copy()
-        if env:
-            full_env.update(env)
-        process = subprocess.run(
-            command,
-            capture_output=True,
-            text=True,
-            check=True,
-            env=full_env,
-        )
-        return True, process.stdout, process.stderr
-    except subprocess.CalledProcessError as e:
-        logger.error(f"命令失败: {' '.join(command)}")
-        logger.error(f"Stderr: {e.stderr}")
-        return False, e.stdout, e.stderr
-    except FileNotFoundError as e:
-        logger.error(f"找不到命令: {e}")
-        return False, "", str(e)
-
-def parse_main_no_planner_output(output: str) -> Optional[str]:
-    """从main_no_planner.py的输出中解析生成的.tex文件路径。"""
+# 解析main_no_planner.py输出的正则，模块加载时编译一次
+_PDF_RE = re.compile(r"生成的PDF文件:\s*([^\s]+\.pdf)")
+_TEX_RE = re.compile(r"TEX代码已保存至:\s*([^\s]+\.tex)")
+
+def parse_main_no_planner_output(*outputs: str) -> Optional[str]:
+    """从main_no_planner.py的输出（标准输出、标准错误）中解析生成的.tex文件路径。"""
     # 查找生成的PDF文件路径，然后推断tex文件路径
-    pdf_match = re.search(r"生成的PDF文件:\s*([^\s]+\.pdf)", output)
+    pdf_match = search_outputs(_PDF_RE, *outputs)
     if pdf_match:
         pdf_path = pdf_match.group(1)
         # 将.pdf替换为.tex来获取tex文件路径
@@ -58,7 +39,7 @@ def parse_main_no_planner_output(output: str) -> Optional[str]:
             return tex_path
     
     # 备用方法：直接查找tex文件路径
-    tex_match = re.search(r"TEX代码已保存至:\s*([^\s]+\.tex)", output)
+    tex_match = search_outputs(_TEX_RE, *outputs)
     if tex_match:
         tex_path = tex_match.group(1)
         logger.info(f"找到生成的tex文件: {tex_path}")
@@ -67,10 +48,76 @@ def parse_main_no_planner_output(output: str) -> Optional[str]:
     logger.warning("在main_no_planner.py的输出中找不到.tex文件路径。")
     return None
 
+def generate_paper(paper_dir: Path) -> Optional[Dict[str, Optional[str]]]:
+    """
+    为单篇论文运行无planner版本的生成流程。
+
+    Args:
+        paper_dir: 论文目录，包含paper.pdf
+
+    Returns:
+        清单条目，失败时返回None
+    """
+    logger.info(f"--- 正在处理论文: {paper_dir.name} (无planner版本) ---")
+    pdf_path = paper_dir / "paper.pdf"
+    if not pdf_path.exists():
+        logger.warning(f"在 {paper_dir} 中找不到 paper.pdf，跳过。")
+        return None
+
+    logger.info(f"为 {pdf_path} 生成 .tex 文件 (无planner版本)")
+    main_command = ["python3", "main_no_planner.py", str(pdf_path), "--language", "en",
+                    "--session-id", generation_session_id(paper_dir)]
+    success, output_lines = run_command_matching(main_command, [_PDF_RE, _TEX_RE])
+    if not success:
+        logger.error(f"为 {pdf_path} 生成 .tex 文件失败 (无planner版本)。跳过。")
+        return None
+
+    tex_path_str = parse_main_no_planner_output(*output_lines)
+    if not tex_path_str or not Path(tex_path_str).exists():
+        logger.error(f"找不到或无法访问生成的.tex文件。跳过。")
+        return None
+
+    tex_path = Path(tex_path_str)
+    # 确定图片目录的明确路径
+    session_id = tex_path.parent.name
+    images_dir = Path("output/images") / session_id
+    if not images_dir.is_dir():
+        logger.warning(f"找不到生成的图片目录: {images_dir}。创建空目录。")
+        images_dir.mkdir(parents=True, exist_ok=True)
+
+    entry = {
+        "pdf_path": str(pdf_path.resolve()),
+        "tex_path": str(tex_path.resolve()),
+        "paper_dir": str(paper_dir.resolve()),
+        "images_dir": str(images_dir.resolve())
+    }
+    logger.info(f"成功为 {paper_dir.name} 生成文件 (无planner版本)。")
+    return entry
+
 def main():
     """
     在数据集上运行无planner版本生成的主函数。
     """
+    parser = argparse.ArgumentParser(description="对数据集中的所有论文运行无planner版本的生成流程并创建评估清单。")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="同时生成的论文数。每篇论文在独立的子进程和会话目录中生成，耗时主要在等待语言模型API，可按API限额调大；默认逐篇生成。"
+    )
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=None,
+        help="所有论文合计每分钟允许的语言模型请求数，按API账户的限额设置，避免并行生成时触发429错误；默认沿用环境变量LLM_REQUESTS_PER_MINUTE，均未设置时不限速。"
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="重新生成全部论文。默认复用已有清单中.tex仍存在且PDF未变化的论文。"
+    )
+    args = parser.parse_args()
+
     dataset_path = Path("dataset/silver")
     output_manifest_path = Path("output/eval_manifest_no_planner.json")
     
@@ -81,52 +128,17 @@ def main():
     # 确保输出目录存在
     output_manifest_path.parent.mkdir(parents=True, exist_ok=True)
 
-    generation_results = []
-    paper_dirs = sorted([d for d in dataset_path.iterdir() if d.is_dir()])
-
-    for paper_dir in paper_dirs:
-        logger.info(f"--- 正在处理论文: {paper_dir.name} (无planner版本) ---")
-        pdf_path = paper_dir / "paper.pdf"
-        if not pdf_path.exists():
-            logger.warning(f"在 {paper_dir} 中找不到 paper.pdf，跳过。")
-            continue
-
-        logger.info(f"为 {pdf_path} 生成 .tex 文件 (无planner版本)")
-        main_command = ["python3", "main_no_planner.py", str(pdf_path), "--language", "en"]
-        success, main_stdout, main_stderr = run_command(main_command)
-        if not success:
-            logger.error(f"为 {pdf_path} 生成 .tex 文件失败 (无planner版本)。跳过。")
-            continue
-
-        combined_output = main_stdout + "\n" + main_stderr
-        tex_path_str = parse_main_no_planner_output(combined_output)
-        if not tex_path_str or not Path(tex_path_str).exists():
-            logger.error(f"找不到或无法访问生成的.tex文件。跳过。")
-            continue
-        
-        tex_path = Path(tex_path_str)
-        # 确定图片目录的明确路径
-        session_id = tex_path.parent.name
-        images_dir = Path("output/images") / session_id
-        if not images_dir.is_dir():
-            logger.warning(f"找不到生成的图片目录: {images_dir}。创建空目录。")
-            images_dir.mkdir(parents=True, exist_ok=True)
-
-        generation_results.append({
-            "pdf_path": str(pdf_path.resolve()),
-            "tex_path": str(tex_path.resolve()),
-            "paper_dir": str(paper_dir.resolve()),
-            "images_dir": str(images_dir.resolve())
-        })
-        logger.info(f"成功为 {paper_dir.name} 生成文件 (无planner版本)。")
+    paper_dirs = list_paper_dirs(dataset_path)
+
+    configure_llm_rate_limit(args.requests_per_minute, args.concurrency)
+
+    generation_results = generate_manifest(paper_dirs, generate_paper, output_manifest_path, args.concurrency, args.force,
+                                           main_script="main_no_planner.py")
 
     if not generation_results:
         logger.error("没有成功生成任何文件。")
         sys.exit(1)
 
-    with open(output_manifest_path, 'w', encoding='utf-8') as f:
-        json.dump(generation_results, f, indent=4)
-
     logger.info(f"--- 无planner版本生成完成 ---")
     logger.info(f"生成结果清单已保存到: {output_manifest_path}")
     logger.info(f"生成了 {len(generation_results)} 个文件")
@@ -0,0 +1,124 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import benchmark_utils
+from benchmark_utils import GROUND_TRUTH_STAMP_NAME, generate_manifest, prepare_ground_truth
+
+class Interrupted(Exception):
+    pass
+
+class TestGenerateManifest(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.paper_dirs = []
+        for name in ["paper_a", "paper_b", "paper_c", "paper_d"]:
+            paper_dir = self.root / name
+            paper_dir.mkdir()
+            (paper_dir / "paper.pdf").write_bytes(name.encode("utf-8"))
+            self.paper_dirs.append(paper_dir)
+        self.manifest_path = self.root / "manifest.json"
+        self.journal_path = self.manifest_path.with_suffix(".jsonl")
+        self.generated = []
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def generate(self, paper_dir, fail_on=None):
+        if paper_dir.name == fail_on:
+            raise Interrupted(paper_dir.name)
+        self.generated.append(paper_dir.name)
+        tex_path = paper_dir / "output.tex"
+        tex_path.write_text("tex", encoding="utf-8")
+        return {
+            "pdf_path": str(paper_dir / "paper.pdf"),
+            "tex_path": str(tex_path),
+            "paper_dir": str(paper_dir.resolve()),
+        }
+
+    def test_resume_after_interruption(self):
+        # The first run fails at paper_c: no manifest, but the papers that finished are journaled
+        with self.assertRaises(Interrupted):
+            generate_manifest(self.paper_dirs, lambda d: self.generate(d, fail_on="paper_c"), self.manifest_path)
+        self.assertFalse(self.manifest_path.exists())
+        with open(self.journal_path, encoding="utf-8") as f:
+            journaled = [json.loads(line)["paper_dir"] for line in f]
+        self.assertEqual(sorted(journaled), [str(d.resolve()) for d in self.paper_dirs if d.name != "paper_c"])
+
+        # A line half-written when the run was killed is ignored
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write('{"paper_dir": "trunc')
+
+        self.generated.clear()
+        entries = generate_manifest(self.paper_dirs, self.generate, self.manifest_path)
+
+        # Only the papers that were not journaled are generated again
+        self.assertEqual(self.generated, ["paper_c"])
+        # The manifest follows paper directory order, not completion order
+        expected = [str(d.resolve()) for d in self.paper_dirs]
+        self.assertEqual([entry["paper_dir"] for entry in entries], expected)
+        with open(self.manifest_path, encoding="utf-8") as f:
+            self.assertEqual([entry["paper_dir"] for entry in json.load(f)], expected)
+        # The journal and temporary file are removed once the manifest is written
+        self.assertFalse(self.journal_path.exists())
+        self.assertFalse(self.manifest_path.with_suffix(".tmp").exists())
+
+    def test_changed_pdf_and_force_regenerate(self):
+        generate_manifest(self.paper_dirs, self.generate, self.manifest_path)
+
+        self.generated.clear()
+        (self.paper_dirs[1] / "paper.pdf").write_bytes(b"revised")
+        generate_manifest(self.paper_dirs, self.generate, self.manifest_path)
+        self.assertEqual(self.generated, ["paper_b"])
+
+        self.generated.clear()
+        generate_manifest(self.paper_dirs, self.generate, self.manifest_path, force=True)
+        self.assertEqual(self.generated, [d.name for d in self.paper_dirs])
+
+# Stand-in for prepare_ground_truth.py: writes an empty ground truth for every paper
+# and reports OCR errors the same way the real script does when FAIL_OCR exists
+FAKE_PREPARE_SCRIPT = """
+import sys, logging
+from pathlib import Path
+dataset_path = Path(sys.argv[sys.argv.index("--dataset-path") + 1])
+for paper_dir in dataset_path.iterdir():
+    if (paper_dir / "caption").is_dir() and (paper_dir / "graph").is_dir():
+        (paper_dir / "ground_truth_visuals.json").write_text("[]", encoding="utf-8")
+if (dataset_path / "FAIL_OCR").exists():
+    logging.error("1 张图片OCR出错，基准集不完整。")
+"""
+
+class TestPrepareGroundTruth(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.dataset = self.root / "dataset"
+        for sub in ["caption", "graph"]:
+            (self.dataset / "paper_a" / sub).mkdir(parents=True)
+        (self.dataset / "paper_b").mkdir()
+        script = self.root / "prepare_ground_truth.py"
+        script.write_text(FAKE_PREPARE_SCRIPT, encoding="utf-8")
+        patcher = mock.patch.object(benchmark_utils, "PREPARE_GROUND_TRUTH_SCRIPT", script)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.stamp_path = self.dataset / GROUND_TRUTH_STAMP_NAME
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_stamp_written_for_paper_without_images(self):
+        self.assertTrue(prepare_ground_truth(self.dataset))
+        self.assertTrue(self.stamp_path.exists())
+
+    def test_ocr_errors_skip_stamp(self):
+        (self.dataset / "FAIL_OCR").touch()
+        self.assertTrue(prepare_ground_truth(self.dataset))
+        self.assertFalse(self.stamp_path.exists())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,6 +6,11 @@
 
 import os
 import sys
+import asyncio
+import hashlib
+import importlib.util
+import shutil
+import sqlite3
 import subprocess
 import re
 import json
@@ -16,10 +21,14 @@ from pathlib import Path
 from typing import List, Dict, Tuple, Optional
 
 import fitz  # PyMuPDF
+import httpx
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from tqdm import tqdm
 
+# 安装了h2时VLM请求走HTTP/2，多个并发请求复用同一连接；h2由httpx自行导入，这里只检测是否已安装
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
 # --- 配置 ---
 # 将此路径设置为您的API密钥所在的文件
 sys.path.append(str(Path(__file__).parent.parent.parent))
@@ -38,20 +47,55 @@ patch_openai.patch_langchain_openai()
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# 幻灯片渲染为JPEG时的质量
+SLIDE_JPEG_QUALITY = 80
+# 幻灯片渲染分辨率；96dpi下一页beamer默认尺寸（128mm x 96mm）的幻灯片约为480x360像素，足以辨认文字和图片
+SLIDE_RENDER_DPI = 96
+# 幻灯片分数缓存路径，可通过环境变量TEXT_FIGURE_COHERENCE_CACHE修改，设为空字符串则禁用缓存
+SCORE_CACHE_PATH = os.environ.get("TEXT_FIGURE_COHERENCE_CACHE", os.path.join(".cache", "text_figure_coherence.sqlite"))
+# 用于评估的VLM模型
+VLM_MODEL = "gpt-4o"
+# 单次VLM请求的超时时间（秒）
+VLM_REQUEST_TIMEOUT = 60.0
+# 提示模型只回复一个1-5的数字
+VLM_SCORE_PROMPT = (
+    "Rate 1-5 how well the slide's text conveys the figure's key message. "
+    "1: Unrelated. 3: Descriptive but not insightful. 5: Masterfully guides attention to the figure's core takeaway. "
+    "Reply with exactly one digit."
+)
+# gpt-4o分词器（o200k_base）中数字"1"~"5"各自是单个token，id为16~20；
+# 对它们施加同样的偏置不改变彼此之间的相对概率，只压低其他输出，配合max_tokens=1保证回复恰好是一个分数
+SCORE_LOGIT_BIAS = {token_id: 20 for token_id in range(16, 21)}
+
+# 出现这些命令时pdflatex需要第二遍编译才能得到正确的引用和目录
+LATEX_RERUN_RE = re.compile(r'\\(?:ref|pageref|autoref|cite|label|tableofcontents)\b')
+
 # --- 核心功能 ---
 
 def compile_latex_to_pdf(tex_path: Path) -> Optional[Path]:
-    """使用 pdflatex 编译 .tex 文件为 PDF。"""
+    """
+    将 .tex 文件编译为 PDF。
+
+    优先使用 latexmk，它按 .aux 等辅助文件是否变化决定编译遍数，引用无需更新时只编译一遍；
+    找不到 latexmk 时退回为 pdflatex，只有文档中有交叉引用、文献引用或目录时才编译第二遍。
+    遇到第一个错误即停止编译（-halt-on-error），有错误的文件不再继续编译完整个文档。
+    """
     if not tex_path.exists():
         logger.error(f"找不到 TeX 文件: {tex_path}")
         return None
 
     output_dir = tex_path.parent
-    for _ in range(2):  # 运行两次以确保引用正确
-        process = subprocess.run(
-            ["pdflatex", "-interaction=nonstopmode", "-output-directory", str(output_dir), str(tex_path)],
-            capture_output=True, text=True
-        )
+    if shutil.which("latexmk"):
+        commands = [["latexmk", "-pdf", "-interaction=nonstopmode", "-halt-on-error", "-file-line-error",
+                     f"-output-directory={output_dir}", str(tex_path)]]
+    else:
+        commands = [["pdflatex", "-interaction=nonstopmode", "-halt-on-error", "-file-line-error",
+                     "-output-directory", str(output_dir), str(tex_path)]]
+        # 有引用时运行第二遍以确保引用正确
+        if LATEX_RERUN_RE.search(tex_path.read_text(encoding='utf-8', errors='ignore')):
+            commands *= 2
+    for command in commands:
+        process = subprocess.run(command, capture_output=True, text=True)
         if process.returncode != 0:
             logger.error(f"LaTeX 编译失败。查看日志: {output_dir / tex_path.with_suffix('.log').name}")
             # logger.error(process.stdout)
@@ -65,65 +109,187 @@ def compile_latex_to_pdf(tex_path: Path) -> Optional[Path]:
 
 def find_frames_with_images(tex_content: str) -> List[int]:
     """解析 TeX 内容以找到包含图片的帧（从1开始计数）。"""
-    # A simple but effective way: count frames and check for \includegraphics inside.
-    frame_indices = []
-    frames = tex_content.split(r'\begin{frame}')
-    for i, frame_content in enumerate(frames[1:], start=1):
-        if r'\includegraphics' in frame_content:
-            frame_indices.append(i)
-    logger.info(f"在 {len(frames)-1} 帧中找到 {len(frame_indices)} 帧包含图片: {frame_indices}")
+    # 记录每个 \begin{frame} 的位置，在相邻两个位置之间查找 \includegraphics，不切分出各帧的子串
+    marker = r'\begin{frame}'
+    starts = []
+    pos = tex_content.find(marker)
+    while pos != -1:
+        starts.append(pos + len(marker))
+        pos = tex_content.find(marker, starts[-1])
+    ends = [start - len(marker) for start in starts[1:]] + [len(tex_content)]
+    frame_indices = [
+        i for i, (start, end) in enumerate(zip(starts, ends), start=1)
+        if tex_content.find(r'\includegraphics', start, end) != -1
+    ]
+    logger.info(f"在 {len(starts)} 帧中找到 {len(frame_indices)} 帧包含图片: {frame_indices}")
     return frame_indices
 
-def render_pdf_pages_to_images(pdf_path: Path, page_numbers: List[int]) -> List[bytes]:
-    """将指定的PDF页面渲染为PNG图像字节。"""
+def render_pdf_pages_to_images(pdf_path: Path, page_numbers: List[int]) -> List[str]:
+    """
+    将指定的PDF页面渲染为JPEG图像（体积约为PNG的几分之一，上传给VLM的数据更少）。
+
+    每页渲染后立即编码为base64字符串，之后直接嵌入请求，不再保留原始图像字节；
+    渲染时不带alpha通道，像素缓冲区在渲染下一页前释放。
+    """
     images = []
+    matrix = fitz.Matrix(SLIDE_RENDER_DPI / 72, SLIDE_RENDER_DPI / 72)
     try:
-        doc = fitz.open(pdf_path)
-        for page_num in page_numbers:
-            if 1 <= page_num <= doc.page_count:
+        with fitz.open(pdf_path) as doc:
+            # 超出实际页数的帧号（编译结果与解析出的帧数不一致时）直接忽略
+            page_numbers = [p for p in page_numbers if 1 <= p <= doc.page_count]
+            for page_num in page_numbers:
                 page = doc.load_page(page_num - 1)  # PyMuPDF is 0-indexed
-                pix = page.get_pixmap(dpi=150)
-                img_bytes = pix.tobytes("png")
-                images.append(img_bytes)
-        doc.close()
+                pix = page.get_pixmap(matrix=matrix, alpha=False)
+                images.append(base64.b64encode(pix.tobytes("jpeg", jpg_quality=SLIDE_JPEG_QUALITY)).decode("ascii"))
+                del pix
     except Exception as e:
         logger.error(f"渲染PDF页面时出错: {e}")
     return images
 
-def evaluate_image_with_vlm(client: ChatOpenAI, image_bytes: bytes) -> Optional[int]:
-    """使用VLM评估单个图像的图文匹配度。"""
+def parse_score(text: str) -> Optional[int]:
+    """
+    从VLM回复中解析1-5的分数。
+
+    回复首字符即为合法分数时直接返回；否则退回到正则查找，均不满足时返回None。
+    """
+    text = text.strip()
+    if text and text[0] in "12345" and not text[1:2].isdigit():
+        return int(text[0])
+    match = re.search(r'(?<!\d)[1-5](?!\d)', text)
+    return int(match.group()) if match else None
+
+async def aevaluate_image_with_vlm(client: ChatOpenAI, base64_image: str) -> Optional[int]:
+    """使用VLM评估单个图像（base64编码的JPEG）的图文匹配度。"""
     try:
-        base64_image = base64.b64encode(image_bytes).decode('utf-8')
         msg = HumanMessage(
             content=[
                 {
                     "type": "text",
-                    "text": "On a scale of 1-5, how well does the text on this slide explain the key message of the figure? 1: Unrelated. 3: Descriptive but not insightful. 5: Masterfully guides attention to the figure's core takeaway. Please respond with only a single integer."
+                    "text": VLM_SCORE_PROMPT
                 },
                 {
                     "type": "image_url",
-                    "image_url": {"url": f"data:image/png;base64,{base64_image}"},
+                    "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"},
                 },
             ]
         )
-        response = client.invoke([msg])
-        score_text = response.content
-        return int(re.search(r'\d+', score_text).group())
+        response = await client.ainvoke([msg])
+        score = parse_score(response.content)
+        if score is None:
+            logger.warning(f"无法从VLM回复中解析分数: {response.content!r}")
+        return score
     except Exception as e:
         logger.error(f"调用VLM API时出错: {e}")
         return None
 
-def main():
-    parser = argparse.ArgumentParser(description="评估演示文稿的图文匹配度。")
-    parser.add_argument("--tex-path", type=Path, required=True, help="指向生成的.tex文件的路径。")
-    args = parser.parse_args()
+async def aevaluate_images_with_vlm(slide_images: List[str], max_concurrency: int) -> List[Optional[int]]:
+    """
+    并发评估多张幻灯片图像，每张一次VLM请求，同时进行的请求数不超过max_concurrency。
+
+    所有请求共用一个保持连接的HTTP客户端，只在建立前max_concurrency个连接时进行TLS握手，评估结束后关闭。
+
+    Args:
+        slide_images: base64编码的幻灯片图像
+        max_concurrency: 同时进行的VLM请求数上限
+
+    Returns:
+        与slide_images顺序一致的分数，评估失败的为None
+    """
+    semaphore = asyncio.Semaphore(max_concurrency)
+    limits = httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency)
+    async with httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=limits, timeout=VLM_REQUEST_TIMEOUT) as http_client:
+        client = ChatOpenAI(model=VLM_MODEL, max_tokens=1, logit_bias=SCORE_LOGIT_BIAS,
+                            http_async_client=http_client)
+        with tqdm(total=len(slide_images), desc="Evaluating slides with VLM") as progress:
+            async def evaluate(base64_image: str) -> Optional[int]:
+                async with semaphore:
+                    score = await aevaluate_image_with_vlm(client, base64_image)
+                progress.update()
+                return score
+
+            return await asyncio.gather(*(evaluate(base64_image) for base64_image in slide_images))
+
+def open_score_cache() -> Optional[sqlite3.Connection]:
+    """打开幻灯片分数缓存（WAL模式，允许多个评估进程同时读写），缓存被禁用或无法打开时返回None"""
+    if not SCORE_CACHE_PATH:
+        return None
+    try:
+        directory = os.path.dirname(SCORE_CACHE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(SCORE_CACHE_PATH)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache (k TEXT PRIMARY KEY, score INTEGER NOT NULL)")
+        return conn
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"无法打开幻灯片分数缓存 {SCORE_CACHE_PATH}，将不使用缓存: {e}")
+        return None
+
+def slide_cache_key(base64_image: str) -> str:
+    """由幻灯片图像内容（连同模型和提示词，二者变化时缓存自动失效）计算缓存键"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"{VLM_MODEL}\x1f{VLM_SCORE_PROMPT}\x1f".encode("utf-8"))
+    digest.update(base64_image.encode("ascii"))
+    return digest.hexdigest()
 
-    tex_path = args.tex_path
+def evaluate_slides(slide_images: List[str], max_concurrency: int) -> List[Optional[int]]:
+    """
+    评估多张幻灯片图像；与之前评估过的图像逐字节相同的幻灯片直接复用缓存分数，只有其余的才调用VLM。
+
+    Args:
+        slide_images: base64编码的幻灯片图像
+        max_concurrency: 同时进行的VLM请求数上限
+
+    Returns:
+        与slide_images顺序一致的分数，评估失败的为None
+    """
+    cache = open_score_cache()
+    if cache is None:
+        return asyncio.run(aevaluate_images_with_vlm(slide_images, max_concurrency))
+
+    try:
+        keys = [slide_cache_key(base64_image) for base64_image in slide_images]
+        results = []
+        for key in keys:
+            row = cache.execute("SELECT score FROM cache WHERE k = ?", (key,)).fetchone()
+            results.append(row[0] if row else None)
+        # 同一演示文稿中重复出现的图像也只评估一次
+        missing: Dict[str, int] = {}
+        for i, (key, score) in enumerate(zip(keys, results)):
+            if score is None:
+                missing.setdefault(key, i)
+        if len(missing) < len(slide_images):
+            logger.info(f"{len(slide_images) - len(missing)} 张幻灯片命中缓存或与其他幻灯片相同，{len(missing)} 张需要VLM评估")
+
+        if missing:
+            scores = asyncio.run(aevaluate_images_with_vlm([slide_images[i] for i in missing.values()], max_concurrency))
+            score_by_key = dict(zip(missing, scores))
+            results = [score_by_key.get(key) if score is None else score for key, score in zip(keys, results)]
+            # 评估失败的不缓存，下次重新评估
+            with cache:
+                cache.executemany("INSERT OR REPLACE INTO cache (k, score) VALUES (?, ?)",
+                                  [(key, score) for key, score in score_by_key.items() if score is not None])
+        return results
+    finally:
+        cache.close()
+
+def run(tex_path: Path, max_concurrency: int = 10) -> Optional[Dict]:
+    """
+    评估一份生成的.tex文件的图文匹配度，可由基准测试脚本直接导入调用。
+
+    Args:
+        tex_path: 生成的.tex文件路径
+        max_concurrency: 同时进行的VLM请求数上限
+
+    Returns:
+        包含average_coherence_score的结果字典；编译、读取或渲染失败时返回None
+    """
+    tex_path = Path(tex_path)
 
     # 1. 编译 LaTeX -> PDF
     pdf_path = compile_latex_to_pdf(tex_path)
     if not pdf_path:
-        sys.exit(1)
+        return None
 
     # 2. 找到包含图片的帧
     try:
@@ -131,30 +297,25 @@ def main():
             tex_content = f.read()
     except Exception as e:
         logger.error(f"读取 TeX 文件失败: {e}")
-        sys.exit(1)
+        return None
         
     frames_with_images_indices = find_frames_with_images(tex_content)
     if not frames_with_images_indices:
         logger.warning("未找到包含图片的帧。无法计算分数。")
         # Output a neutral/default score or indicate no score
-        print(json.dumps({"average_coherence_score": None, "evaluated_frames": 0}))
-        sys.exit(0)
+        return {"average_coherence_score": None, "evaluated_frames": 0}
 
     # 3. 渲染这些帧为图片
     slide_images = render_pdf_pages_to_images(pdf_path, frames_with_images_indices)
     if not slide_images:
         logger.error("渲染PDF页面为图片失败。")
-        sys.exit(1)
+        return None
 
-    # 4. 使用VLM评估每张图片
-    client = ChatOpenAI(model="gpt-4o", max_tokens=5)
-    scores = []
-    for image_bytes in tqdm(slide_images, desc="Evaluating slides with VLM"):
-        score = evaluate_image_with_vlm(client, image_bytes)
-        if score is not None:
-            scores.append(score)
+    # 4. 使用VLM并发评估各张图片（已缓存的跳过）
+    results = evaluate_slides(slide_images, max(1, max_concurrency))
+    scores = [score for score in results if score is not None]
     
-    # 5. 计算并输出最终分数
+    # 5. 计算最终分数
     if not scores:
         logger.error("VLM评估所有幻灯片均失败。")
         average_score = None
@@ -162,11 +323,21 @@ def main():
         average_score = sum(scores) / len(scores)
         logger.info(f"最终平均图文匹配度分数: {average_score:.4f}")
 
-    result = {
+    return {
         "average_coherence_score": average_score,
         "evaluated_frames": len(scores),
         "total_frames_with_figures": len(frames_with_images_indices)
     }
+
+def main():
+    parser = argparse.ArgumentParser(description="评估演示文稿的图文匹配度。")
+    parser.add_argument("--tex-path", type=Path, required=True, help="指向生成的.tex文件的路径。")
+    parser.add_argument("--max-concurrency", type=int, default=10, help="同时进行的VLM请求数上限。")
+    args = parser.parse_args()
+
+    result = run(args.tex_path, args.max_concurrency)
+    if result is None:
+        sys.exit(1)
     print(json.dumps(result, indent=4))
 
 if __name__ == "__main__":
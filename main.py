@@ -31,6 +31,8 @@ from modules.pdf_parser import extract_pdf_content
 from modules.presentation_planner import generate_presentation_plan
 from modules.tex_workflow import run_tex_workflow, run_revision_tex_workflow
 
+logger = logging.getLogger(__name__)
+
 def setup_logging(verbose=False):
     """设置日志级别和格式"""
     level = logging.DEBUG if verbose else logging.INFO
@@ -124,6 +126,10 @@ def parse_args():
         action='store_true',
         help='启用交互式修订模式，在生成初版后对TEX代码进行迭代修改'
     )
+    parser.add_argument(
+        '--session-id',
+        help='会话ID，用作各阶段输出的子目录名；默认使用当前时间戳，并行运行多篇论文时应为每篇指定不同的值'
+    )
     
     return parser.parse_args()
 
@@ -159,101 +165,67 @@ def interactive_dialog(planner, logger):
         
     return planner.presentation_plan
 
-def main():
-    """主函数"""
-    # 解析命令行参数
-    args = parse_args()
-    
-    # 设置日志
-    logger = setup_logging(args.verbose)
-    
-    # 检查API密钥
+def run_pipeline(pdf_path: str, output_dir: str = "output", language: str = "zh", model_name: str = "gpt-4o",
+                 theme: str = "Madrid", max_retries: int = 5, session_id: Optional[str] = None,
+                 enable_llm_enhancement: bool = True, interactive: bool = False,
+                 skip_tex: bool = False) -> Optional[Dict[str, str]]:
+    """
+    对一篇论文依次运行PDF内容提取、演示计划生成和TEX生成编译
+
+    可在其他脚本中导入后直接调用，多篇论文共用一次模块导入和补丁加载。
+
+    Args:
+        pdf_path: 输入PDF文件路径
+        output_dir: 输出目录
+        language: 输出语言，zh为中文，en为英文
+        model_name: 使用的语言模型
+        theme: Beamer主题
+        max_retries: 编译失败时的最大重试次数
+        session_id: 会话ID，为None时使用当前时间戳
+        enable_llm_enhancement: 是否启用LLM增强（未设置API密钥时自动禁用）
+        interactive: 是否在生成计划后进入交互式优化
+        skip_tex: 是否跳过TEX生成和编译步骤
+
+    Returns:
+        Dict: 各阶段输出文件的路径（raw_content_path, plan_path，未跳过TEX时还有pdf_path, tex_path），失败时返回None
+    """
+    # 检查输入文件
+    if not os.path.exists(pdf_path):
+        logger.error(f"PDF文件不存在: {pdf_path}")
+        return None
+
     api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        logger.error("未设置OPENAI_API_KEY环境变量")
-        return 1
-    
-    # 创建输出目录
-    output_dir = args.output_dir
-    
-    # 使用唯一的会话ID来区分不同的运行
-    session_id = f"{int(time.time())}"
-    
-    # 创建各阶段输出目录
+    session_id = session_id or f"{int(time.time())}"
     raw_dir = os.path.join(output_dir, "raw", session_id)
     plan_dir = os.path.join(output_dir, "plan", session_id)
     tex_dir = os.path.join(output_dir, "tex", session_id)
     img_dir = os.path.join(output_dir, "images", session_id)
-    
     for dir_path in [raw_dir, plan_dir, tex_dir, img_dir]:
         os.makedirs(dir_path, exist_ok=True)
-    
-    # 检查是否为修订模式
-    if args.revise:
-        # 验证修订模式的必要参数
-        if not args.original_plan or not args.previous_tex or not args.feedback:
-            logger.error("修订模式需要提供--original-plan, --previous-tex和--feedback参数")
-            return 1
-            
-        # 检查文件是否存在
-        if not os.path.exists(args.original_plan):
-            logger.error(f"原始演示计划文件不存在: {args.original_plan}")
-            return 1
-            
-        if not os.path.exists(args.previous_tex):
-            logger.error(f"先前版本的TEX文件不存在: {args.previous_tex}")
-            return 1
-            
-        # 运行修订版TEX工作流
-        logger.info("启动修订模式...")
-        
-        success, message, pdf_path = run_revision_tex_workflow(
-            original_plan_path=args.original_plan,
-            previous_tex_path=args.previous_tex,
-            user_feedback=args.feedback,
-            output_dir=tex_dir,
-            model_name=args.model,
-            language=args.language,
-            theme=args.theme,
-            max_retries=args.max_retries
-        )
-        
-        if success:
-            logger.info(f"修订版TEX生成和编译成功: {message}")
-            logger.info(f"生成的PDF文件: {pdf_path}")
-            return 0
-        else:
-            logger.error(f"修订版TEX生成和编译失败: {message}")
-            return 1
-    
-    # 非修订模式的原有逻辑
-    # 检查输入文件
-    if not os.path.exists(args.pdf_path):
-        logger.error(f"PDF文件不存在: {args.pdf_path}")
-        return 1
         
     # 步骤1: 提取PDF内容
     logger.info("步骤1: 提取PDF内容...")
     try:
         # 决定是否启用LLM增强
-        enable_llm_enhancement = not args.disable_llm_enhancement and bool(api_key)
+        use_llm_enhancement = enable_llm_enhancement and bool(api_key)
         
-        if not enable_llm_enhancement:
-            if args.disable_llm_enhancement:
+        if not use_llm_enhancement:
+            if not enable_llm_enhancement:
                 logger.info("用户禁用了LLM增强功能")
             else:
                 logger.warning("未设置API密钥，将禁用LLM增强功能")
         
         pdf_content, raw_content_path = extract_pdf_content(
-            pdf_path=args.pdf_path, 
+            pdf_path=pdf_path, 
             output_dir=raw_dir,
-            enable_llm_enhancement=enable_llm_enhancement,
-            model_name=args.model,
-            api_key=api_key
+            enable_llm_enhancement=use_llm_enhancement,
+            model_name=model_name,
+            api_key=api_key,
+            session_id=session_id
         )
         if not pdf_content:
             logger.error("PDF内容提取失败")
-            return 1
+            return None
             
         logger.info(f"PDF内容已保存到: {raw_content_path}")
         
@@ -267,7 +239,7 @@ def main():
             logger.info("使用基础PDF解析（未启用LLM增强）")
     except Exception as e:
         logger.error(f"PDF内容提取失败: {str(e)}")
-        return 1
+        return None
             
     # 步骤2: 生成演示计划
     logger.info("步骤2: 生成演示计划...")
@@ -275,32 +247,33 @@ def main():
         presentation_plan, plan_path, planner = generate_presentation_plan(
             raw_content_path=raw_content_path,
             output_dir=plan_dir,
-            model_name=args.model,
-            language=args.language
+            model_name=model_name,
+            language=language
         )
             
         if not presentation_plan:
             logger.error("演示计划生成失败")
-            return 1
+            return None
             
         logger.info(f"演示计划已保存到: {plan_path}")
+        result = {"raw_content_path": raw_content_path, "plan_path": plan_path}
             
         # 如果启用了交互式模式，进入对话
-        if args.interactive and planner:
+        if interactive and planner:
             logger.info("开始交互式优化...")
             presentation_plan = interactive_dialog(planner, logger)
             
             # 保存优化后的计划
-            plan_path = planner.save_presentation_plan(presentation_plan)
+            plan_path = result["plan_path"] = planner.save_presentation_plan(presentation_plan)
             logger.info(f"优化后的演示计划已保存到: {plan_path}")
     except Exception as e:
         logger.error(f"演示计划生成失败: {str(e)}")
-        return 1
+        return None
         
     # 如果指定跳过TEX生成和编译，则在此结束
-    if args.skip_tex:
+    if skip_tex:
         logger.info("已跳过TEX生成和编译步骤")
-        return 0
+        return result
     
     # 步骤3: 运行TEX工作流（生成TEX并编译）
     logger.info("步骤3: 生成和编译TEX...")
@@ -308,34 +281,119 @@ def main():
         success, message, pdf_path = run_tex_workflow(
             presentation_plan_path=plan_path,
             output_dir=tex_dir,
-            model_name=args.model,
-            language=args.language,
-            theme=args.theme,
-            max_retries=args.max_retries
+            model_name=model_name,
+            language=language,
+            theme=theme,
+            max_retries=max_retries
         )
         
         if success:
             logger.info(f"TEX生成和编译成功: {message}")
             logger.info(f"生成的PDF文件: {pdf_path}")
             
-            # 输出修订模式的用法提示
-            previous_tex_path = os.path.join(tex_dir, 'output.tex')
-            if not os.path.exists(previous_tex_path):
+            tex_path = os.path.join(tex_dir, 'output.tex')
+            if not os.path.exists(tex_path):
                 # 尝试查找其他tex文件
                 tex_files = [f for f in os.listdir(tex_dir) if f.endswith(".tex")]
                 if tex_files:
-                    previous_tex_path = os.path.join(tex_dir, tex_files[0])
+                    tex_path = os.path.join(tex_dir, tex_files[0])
+            result.update(pdf_path=pdf_path, tex_path=tex_path)
+            return result
+        else:
+            logger.error(f"TEX生成和编译失败: {message}")
+            return None
+    except Exception as e:
+        logger.error(f"TEX工作流执行失败: {str(e)}")
+        return None
 
-            logger.info("\n如需修改演示文稿，可使用以下命令运行修订模式：")
-            logger.info(f"python main.py --revise --original-plan='{plan_path}' --previous-tex='{previous_tex_path}' --feedback=\"您的修改建议\" --output-dir='{output_dir}' --theme={args.theme}")
+def main():
+    """主函数"""
+    # 解析命令行参数
+    args = parse_args()
+    
+    # 设置日志
+    logger = setup_logging(args.verbose)
+    
+    # 检查API密钥
+    api_key = os.environ.get("OPENAI_API_KEY")
+    if not api_key:
+        logger.error("未设置OPENAI_API_KEY环境变量")
+        return 1
+    
+    # 创建输出目录
+    output_dir = args.output_dir
+    
+    # 使用唯一的会话ID来区分不同的运行
+    session_id = args.session_id or f"{int(time.time())}"
+    
+    # 创建各阶段输出目录
+    raw_dir = os.path.join(output_dir, "raw", session_id)
+    plan_dir = os.path.join(output_dir, "plan", session_id)
+    tex_dir = os.path.join(output_dir, "tex", session_id)
+    img_dir = os.path.join(output_dir, "images", session_id)
+    
+    for dir_path in [raw_dir, plan_dir, tex_dir, img_dir]:
+        os.makedirs(dir_path, exist_ok=True)
+    
+    # 检查是否为修订模式
+    if args.revise:
+        # 验证修订模式的必要参数
+        if not args.original_plan or not args.previous_tex or not args.feedback:
+            logger.error("修订模式需要提供--original-plan, --previous-tex和--feedback参数")
+            return 1
+            
+        # 检查文件是否存在
+        if not os.path.exists(args.original_plan):
+            logger.error(f"原始演示计划文件不存在: {args.original_plan}")
+            return 1
             
+        if not os.path.exists(args.previous_tex):
+            logger.error(f"先前版本的TEX文件不存在: {args.previous_tex}")
+            return 1
+            
+        # 运行修订版TEX工作流
+        logger.info("启动修订模式...")
+        
+        success, message, pdf_path = run_revision_tex_workflow(
+            original_plan_path=args.original_plan,
+            previous_tex_path=args.previous_tex,
+            user_feedback=args.feedback,
+            output_dir=tex_dir,
+            model_name=args.model,
+            language=args.language,
+            theme=args.theme,
+            max_retries=args.max_retries
+        )
+        
+        if success:
+            logger.info(f"修订版TEX生成和编译成功: {message}")
+            logger.info(f"生成的PDF文件: {pdf_path}")
             return 0
         else:
-            logger.error(f"TEX生成和编译失败: {message}")
+            logger.error(f"修订版TEX生成和编译失败: {message}")
             return 1
-    except Exception as e:
-        logger.error(f"TEX工作流执行失败: {str(e)}")
+    
+    # 非修订模式：提取、规划并生成TEX
+    result = run_pipeline(
+        pdf_path=args.pdf_path,
+        output_dir=output_dir,
+        language=args.language,
+        model_name=args.model,
+        theme=args.theme,
+        max_retries=args.max_retries,
+        session_id=session_id,
+        enable_llm_enhancement=not args.disable_llm_enhancement,
+        interactive=args.interactive,
+        skip_tex=args.skip_tex
+    )
+    if not result:
         return 1
 
+    if "tex_path" in result:
+        # 输出修订模式的用法提示
+        logger.info("\n如需修改演示文稿，可使用以下命令运行修订模式：")
+        logger.info(f"python main.py --revise --original-plan='{result['plan_path']}' --previous-tex='{result['tex_path']}' --feedback=\"您的修改建议\" --output-dir='{output_dir}' --theme={args.theme}")
+    return 0
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -91,6 +91,10 @@ def parse_args():
         default='Madrid',
         help='Beamer主题，如Madrid, Berlin, Singapore等'
     )
+    parser.add_argument(
+        '--session-id',
+        help='会话ID，用作各阶段输出的子目录名；默认使用当前时间戳，并行运行多篇论文时应为每篇指定不同的值'
+    )
     
     return parser.parse_args()
 
@@ -112,7 +116,7 @@ def main():
     output_dir = args.output_dir
     
     # 使用唯一的会话ID来区分不同的运行
-    session_id = str(int(time.time()))
+    session_id = args.session_id or str(int(time.time()))
     
     # 创建各阶段输出目录
     raw_dir = os.path.join(output_dir, "raw", session_id)
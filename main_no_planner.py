@@ -92,6 +92,10 @@ def parse_args():
         default='Madrid',
         help='Beamer主题，如Madrid, Berlin, Singapore等'
     )
+    parser.add_argument(
+        '--session-id',
+        help='会话ID，用作各阶段输出的子目录名；默认使用当前时间戳，并行运行多篇论文时应为每篇指定不同的值'
+    )
     
     return parser.parse_args()
 
@@ -113,7 +117,7 @@ def main():
     output_dir = args.output_dir
     
     # 使用唯一的会话ID来区分不同的运行
-    session_id = str(int(time.time()))
+    session_id = args.session_id or str(int(time.time()))
     
     # 创建各阶段输出目录
     raw_dir = os.path.join(output_dir, "raw", session_id)
@@ -132,7 +136,7 @@ def main():
     # 步骤1: 提取PDF内容
     logger.info("步骤1: 提取PDF内容...")
     try:
-        pdf_content, raw_content_path = extract_pdf_content(args.pdf_path, raw_dir)
+        pdf_content, raw_content_path = extract_pdf_content(args.pdf_path, raw_dir, session_id=session_id)
         if not pdf_content:
             logger.error("PDF内容提取失败")
             return 1
@@ -9,6 +9,8 @@ from typing import Optional
 from langchain_openai import ChatOpenAI
 from langchain.prompts import ChatPromptTemplate
 
+from .llm_rate_limiter import get_rate_limiter
+
 class BasicTexGenerator:
     def __init__(self, model_name: str = "gpt-4o", language: str = "en", theme: str = "Madrid"):
         """
@@ -26,7 +28,7 @@ class BasicTexGenerator:
         
         # 初始化语言模型
         try:
-            self.llm = ChatOpenAI(model=model_name, temperature=0.1)
+            self.llm = ChatOpenAI(model=model_name, temperature=0.1, rate_limiter=get_rate_limiter())
             self.logger.info(f"已初始化语言模型: {model_name}")
         except Exception as e:
             self.logger.error(f"初始化语言模型失败: {str(e)}")
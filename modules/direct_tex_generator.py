@@ -14,6 +14,7 @@ from patch_openai import patch_langchain_openai, patch_openai_client
 
 # 导入提示词
 from prompts import DIRECT_TEX_GENERATION_PROMPT
+from .llm_rate_limiter import get_rate_limiter
 
 # 尝试加载环境变量
 if os.path.exists(".env"):
@@ -93,7 +94,8 @@ class DirectTexGenerator:
             self.llm = ChatOpenAI(
                 model_name=self.model_name,
                 temperature=self.temperature,
-                openai_api_key=self.api_key
+                openai_api_key=self.api_key,
+                rate_limiter=get_rate_limiter()
             )
             self.logger.info(f"已初始化语言模型: {self.model_name}")
         except Exception as e:
@@ -8,6 +8,8 @@ from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import JsonOutputParser
 
+from .llm_rate_limiter import get_rate_limiter
+
 logger = logging.getLogger(__name__)
 
 PROMPT_TEMPLATE = """
@@ -44,7 +46,7 @@ Generate a JSON object with a single key, "new_code".
 class EditorAgent:
     def __init__(self, model_name: str):
         # LangChain会自动从环境变量中读取OPENAI_API_KEY和OPENAI_API_BASE
-        self.llm = ChatOpenAI(model=model_name, temperature=0)
+        self.llm = ChatOpenAI(model=model_name, temperature=0, rate_limiter=get_rate_limiter())
         self.history = []
         logger.info(f"EditorAgent initialized with model: {model_name}")
 
@@ -6,26 +6,38 @@ import os
 import json
 import time
 import logging
+import functools
+import threading
 from datetime import datetime
 from marker.converters.pdf import PdfConverter
 from marker.models import create_model_dict
 from marker.output import text_from_rendered
 from surya.settings import settings
 
+# 同一进程中多篇论文共用一份marker模型，转换逐篇进行：
+# 批量生成时提取阶段串行，其他论文的规划（等待LLM）和TEX编译阶段与之重叠
+_marker_lock = threading.Lock()
+
+@functools.lru_cache(maxsize=1)
+def _load_marker_models():
+    """加载marker模型（同一进程内只加载一次）"""
+    return create_model_dict()
+
 class LightweightExtractor:
-    def __init__(self, pdf_path, output_dir="output"):
+    def __init__(self, pdf_path, output_dir="output", session_id=None):
         """
         初始化轻量级内容提取器
         
         Args:
             pdf_path: PDF文件路径
             output_dir: 输出目录
+            session_id: 会话ID，决定图片目录output/images/<session_id>；为None时使用当前时间戳
         """
         self.pdf_path = pdf_path
         self.output_dir = output_dir
         
-        # 使用时间戳创建唯一的会话ID
-        self.session_id = f"{int(time.time())}"
+        # 未指定时使用时间戳创建唯一的会话ID
+        self.session_id = session_id or f"{int(time.time())}"
         
         # 创建会话特定的图片目录
         self.img_dir = os.path.join("output", "images", self.session_id)
@@ -66,13 +78,14 @@ class LightweightExtractor:
         try:
             self.logger.info(f"开始使用marker-pdf提取内容: {self.pdf_path}")
             
-            # 创建转换器
-            converter = PdfConverter(artifact_dict=create_model_dict())
-            
-            # 转换PDF
-            start_time = time.time()
-            rendered = converter(self.pdf_path)
-            conversion_time = time.time() - start_time
+            with _marker_lock:
+                # 创建转换器
+                converter = PdfConverter(artifact_dict=_load_marker_models())
+                
+                # 转换PDF
+                start_time = time.time()
+                rendered = converter(self.pdf_path)
+                conversion_time = time.time() - start_time
             
             self.logger.info(f"PDF转换完成，耗时: {conversion_time:.2f}秒")
             
@@ -195,7 +208,7 @@ class LightweightExtractor:
                 self.logger.warning(f"清理临时文件时出错: {str(e)}")
 
 # 便捷函数
-def extract_lightweight_content(pdf_path, output_dir="output", cleanup_temp=False):
+def extract_lightweight_content(pdf_path, output_dir="output", cleanup_temp=False, session_id=None):
     """
     从PDF文件中提取轻量级内容（便捷函数）
     
@@ -203,11 +216,12 @@ def extract_lightweight_content(pdf_path, output_dir="output", cleanup_temp=Fals
         pdf_path: PDF文件路径
         output_dir: 输出目录
         cleanup_temp: 是否清理临时文件
+        session_id: 会话ID，为None时由提取器使用当前时间戳
         
     Returns:
         tuple: (提取的内容字典, 保存的文件路径)
     """
-    extractor = LightweightExtractor(pdf_path, output_dir)
+    extractor = LightweightExtractor(pdf_path, output_dir, session_id)
     content = extractor.extract_content()
     
     if content:
@@ -30,6 +30,7 @@ from prompts import (
     SLIDES_PLANNING_PROMPT,
     INTERACTIVE_REFINEMENT_SYSTEM_MESSAGE
 )
+from .llm_rate_limiter import get_rate_limiter
 
 class LightweightPlanner:
     def __init__(
@@ -103,7 +104,8 @@ class LightweightPlanner:
             self.llm = ChatOpenAI(
                 model_name=self.model_name,
                 temperature=self.temperature,
-                openai_api_key=self.api_key
+                openai_api_key=self.api_key,
+                rate_limiter=get_rate_limiter()
             )
             self.logger.info(f"已初始化语言模型: {self.model_name}")
         except Exception as e:
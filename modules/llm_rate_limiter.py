@@ -0,0 +1,40 @@
+"""
+语言模型请求限速模块：同一进程内的所有语言模型客户端共享一个令牌桶
+多篇论文并行生成时把请求速率控制在API限额以内，避免触发429错误后的重试拖慢整体进度
+"""
+import os
+import logging
+import functools
+from typing import Optional
+
+try:
+    from langchain_core.rate_limiters import InMemoryRateLimiter
+    RATE_LIMITER_AVAILABLE = True
+except ImportError:
+    RATE_LIMITER_AVAILABLE = False
+
+# 每分钟允许的请求数，未设置或不大于0时不限速
+REQUESTS_PER_MINUTE_ENV = "LLM_REQUESTS_PER_MINUTE"
+
+@functools.lru_cache(maxsize=None)
+def get_rate_limiter() -> Optional["InMemoryRateLimiter"]:
+    """
+    获取进程内共享的限速器（线程安全，同步和异步调用均可使用），作为ChatOpenAI的rate_limiter参数传入
+
+    Returns:
+        InMemoryRateLimiter实例；未设置LLM_REQUESTS_PER_MINUTE或无法导入限速器时返回None，即不限速
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        requests_per_minute = float(os.environ.get(REQUESTS_PER_MINUTE_ENV) or 0)
+    except ValueError:
+        logger.warning(f"环境变量{REQUESTS_PER_MINUTE_ENV}不是有效的数字，不对语言模型请求限速")
+        return None
+    if requests_per_minute <= 0:
+        return None
+    if not RATE_LIMITER_AVAILABLE:
+        logger.warning("无法导入langchain_core的限速器，不对语言模型请求限速")
+        return None
+
+    logger.info(f"语言模型请求限速: 每分钟 {requests_per_minute:g} 次")
+    return InMemoryRateLimiter(requests_per_second=requests_per_minute / 60, check_every_n_seconds=0.1)
@@ -9,6 +9,7 @@ import logging
 import re
 from typing import Dict, Any, Optional
 from .lightweight_extractor import extract_lightweight_content
+from .llm_rate_limiter import get_rate_limiter
 
 # 导入LLM相关包
 try:
@@ -50,7 +51,8 @@ def enhance_content_with_llm(lightweight_content: Dict[str, Any], model_name: st
         llm = ChatOpenAI(
             model_name=model_name,
             temperature=0.2,
-            openai_api_key=api_key
+            openai_api_key=api_key,
+            rate_limiter=get_rate_limiter()
         )
         
         # 获取完整文本
@@ -98,7 +100,7 @@ def enhance_content_with_llm(lightweight_content: Dict[str, Any], model_name: st
         logger.error(f"LLM增强处理时出错: {str(e)}")
         return lightweight_content
 
-def extract_pdf_content(pdf_path, output_dir="output", cleanup_temp=False, enable_llm_enhancement=True, model_name="gpt-4o", api_key=None):
+def extract_pdf_content(pdf_path, output_dir="output", cleanup_temp=False, enable_llm_enhancement=True, model_name="gpt-4o", api_key=None, session_id=None):
     """
     提取PDF内容（包括文本、图像、元数据等）并可选地进行LLM增强
     
@@ -109,6 +111,7 @@ def extract_pdf_content(pdf_path, output_dir="output", cleanup_temp=False, enabl
         enable_llm_enhancement: 是否启用LLM增强处理
         model_name: 要使用的语言模型名称
         api_key: OpenAI API密钥
+        session_id: 会话ID，决定图片目录output/images/<session_id>；为None时使用当前时间戳
         
     Returns:
         tuple: (提取的内容, 内容保存的文件路径)
@@ -116,7 +119,7 @@ def extract_pdf_content(pdf_path, output_dir="output", cleanup_temp=False, enabl
     logging.info(f"开始从PDF中提取内容: {pdf_path}")
     
     # 调用轻量级提取器模块的功能
-    lightweight_content, lightweight_content_path = extract_lightweight_content(pdf_path, output_dir, cleanup_temp)
+    lightweight_content, lightweight_content_path = extract_lightweight_content(pdf_path, output_dir, cleanup_temp, session_id)
     
     if not lightweight_content:
         logging.error("PDF内容提取失败")
@@ -117,7 +117,25 @@ class PresentationPlanner:
             str: 保存的文件路径
         """
         return self.lightweight_planner.save_presentation_plan(presentation_plan, output_file)
-    
+
+    def set_presentation_plan(self, presentation_plan: Dict[str, Any]):
+        """
+        直接载入已有的演示计划（如缓存命中时），无需调用语言模型
+
+        Args:
+            presentation_plan: 演示计划
+        """
+        self.presentation_plan = presentation_plan
+        self.paper_info = presentation_plan.get("paper_info", {})
+        self.key_content = presentation_plan.get("key_content", {})
+        self.slides_plan = presentation_plan.get("slides_plan", [])
+
+        # 同步到轻量级规划器，保证后续对话基于该计划
+        self.lightweight_planner.presentation_plan = presentation_plan
+        self.lightweight_planner.paper_info = self.paper_info
+        self.lightweight_planner.key_content = self.key_content
+        self.lightweight_planner.slides_plan = self.slides_plan
+
     def interactive_refinement(self, initial_feedback=None) -> Dict[str, Any]:
         """
         与用户进行多轮交互，优化演示计划
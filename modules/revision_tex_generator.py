@@ -14,6 +14,7 @@ from patch_openai import patch_langchain_openai, patch_openai_client
 
 # 导入提示词
 from prompts import TEX_REVISION_SYSTEM_MESSAGE, TEX_REVISION_HUMAN_MESSAGE
+from .llm_rate_limiter import get_rate_limiter
 
 # 尝试加载环境变量
 if os.path.exists(".env"):
@@ -99,7 +100,8 @@ class RevisionTexGenerator:
             self.llm = ChatOpenAI(
                 model_name=self.model_name,
                 temperature=self.temperature,
-                openai_api_key=self.api_key
+                openai_api_key=self.api_key,
+                rate_limiter=get_rate_limiter()
             )
             self.logger.info(f"已初始化语言模型: {self.model_name}")
         except Exception as e:
@@ -31,7 +31,7 @@ class SimpleTextExtractor:
         try:
             # 打开PDF文件
             doc = fitz.open(pdf_path)
-            full_text = ""
+            page_texts = []
             
             # 逐页提取文本
             for page_num in range(len(doc)):
@@ -40,18 +40,15 @@ class SimpleTextExtractor:
                 # 提取文本，保留基本格式
                 text = page.get_text()
                 
-                # 添加页面分隔符
-                if page_num > 0:
-                    full_text += f"\n\n--- Page {page_num + 1} ---\n\n"
-                else:
-                    full_text += f"--- Page {page_num + 1} ---\n\n"
-                
-                # 清理和格式化文本
+                # 清理和格式化文本，并添加页面分隔符
                 cleaned_text = self._clean_text(text)
-                full_text += cleaned_text
+                page_texts.append(f"--- Page {page_num + 1} ---\n\n{cleaned_text}")
             
             doc.close()
             
+            # 各页之间以空行分隔，一次性拼接
+            full_text = "\n\n".join(page_texts)
+            
             self.logger.info(f"成功提取PDF文本，总长度: {len(full_text)} 字符")
             return full_text
             
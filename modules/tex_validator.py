@@ -4,15 +4,67 @@ TEX 验证器模块：验证生成的 TEX 代码能否成功编译
 
 import os
 import re
+import hashlib
 import subprocess
 import tempfile
 import logging
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List, Any, Optional, Tuple, Union
 
 # 导入提示词
 from prompts import TEX_ERROR_FIX_PROMPT
 
+# 后台线程池：执行与TEX生成（LLM调用）互不依赖的准备工作，如中文字体检测
+_background_executor = ThreadPoolExecutor(max_workers=1)
+
+# 预编译导言区格式文件(.fmt)的缓存目录，相同导言区的重试和多次编译可直接复用
+FORMAT_CACHE_DIR = os.path.join("cache", "fmt")
+_PREAMBLE_END = "\\begin{document}"
+# 格式文件无法加载时TeX引擎输出的错误信息（找不到、不是有效格式、版本不兼容等）
+_FORMAT_ERROR_RE = re.compile(
+    r"can't find the format file|can't be found|not a valid format|Fatal format file error"
+    r"|made by different executable version",
+    re.IGNORECASE
+)
+
+# mylatexformat宏包是否可用，首次需要时再通过kpsewhich检测
+_mylatexformat_available = None
+
+def _has_mylatexformat() -> bool:
+    """检测TeX发行版中是否安装了mylatexformat宏包"""
+    global _mylatexformat_available
+    if _mylatexformat_available is None:
+        try:
+            process = subprocess.run(
+                ["kpsewhich", "mylatexformat.ltx"],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+            _mylatexformat_available = process.returncode == 0 and bool(process.stdout.strip())
+        except (OSError, subprocess.TimeoutExpired):
+            _mylatexformat_available = False
+    return _mylatexformat_available
+
+# 各编译器的版本信息，计入格式文件的缓存键；TeX发行版升级后旧的格式文件不再被使用
+_compiler_versions: Dict[str, str] = {}
+
+def _compiler_version(compiler: str) -> str:
+    """获取编译器的版本信息（--version的输出），无法获取时返回空字符串"""
+    if compiler not in _compiler_versions:
+        try:
+            process = subprocess.run(
+                [compiler, "--version"],
+                capture_output=True,
+                text=True,
+                timeout=10
+            )
+            _compiler_versions[compiler] = process.stdout.strip()
+        except (OSError, subprocess.TimeoutExpired):
+            _compiler_versions[compiler] = ""
+    return _compiler_versions[compiler]
+
 class TexValidator:
     def __init__(self, output_dir: str = "output", language: str = "en", session_id: str = None):
         """
@@ -31,11 +83,18 @@ class TexValidator:
         # 确保输出目录存在
         os.makedirs(output_dir, exist_ok=True)
         
-        # 如果是中文，检查系统中可用的中文字体
+        # 如果是中文，在后台检查系统中可用的中文字体，与TEX代码生成并行进行
         if language == "zh":
-            self.available_fonts = self._check_available_fonts()
+            self._fonts_future = _background_executor.submit(self._check_available_fonts)
         else:
-            self.available_fonts = []
+            self._fonts_future = None
+    
+    @property
+    def available_fonts(self) -> List[str]:
+        """系统中可用的中文字体列表，首次访问时等待后台检测完成"""
+        if self._fonts_future is None:
+            return []
+        return self._fonts_future.result()
     
     def _check_available_fonts(self) -> List[str]:
         """
@@ -143,6 +202,11 @@ class TexValidator:
                 # 使用-interaction=nonstopmode参数，遇到错误时不会暂停
                 # 添加 -shell-escape 以支持 minted 等需要执行外部命令的宏包
                 cmd = [compiler, "-shell-escape", "-interaction=nonstopmode", tex_basename]
+                
+                # 使用预编译的导言区格式，跳过每次编译时对Beamer导言区的重复解析
+                fmt_name = self._prepare_format(temp_dir, tex_basename, compiler, timeout)
+                if fmt_name:
+                    cmd.insert(-1, f"-fmt={fmt_name}")
                 self.logger.info(f"运行编译命令: {' '.join(cmd)}")
                 
                 # 设置工作目录为临时目录
@@ -154,6 +218,21 @@ class TexValidator:
                     timeout=timeout
                 )
                 
+                # 格式文件可能已过期或与当前TeX发行版不兼容；只有输出表明格式文件无法加载时才不使用格式文件重新编译，
+                # 文档本身的错误直接返回第一次编译的结果
+                if process.returncode != 0 and fmt_name and _FORMAT_ERROR_RE.search(f"{process.stdout}\n{process.stderr}"):
+                    self.logger.warning("预编译格式文件无法加载，改为常规编译重试")
+                    cmd.remove(f"-fmt={fmt_name}")
+                    process = subprocess.run(
+                        cmd,
+                        cwd=temp_dir,
+                        capture_output=True,
+                        text=True,
+                        timeout=timeout
+                    )
+                    # 格式文件有问题，删除缓存以便下次重新生成
+                    self._discard_format(fmt_name)
+                
                 stdout = process.stdout
                 
                 # 检查是否编译成功
@@ -211,6 +290,88 @@ class TexValidator:
             except Exception as e:
                 return False, f"编译过程中发生错误: {str(e)}", None
     
+    def _prepare_format(self, temp_dir: str, tex_basename: str, compiler: str, timeout: int) -> Optional[str]:
+        """
+        为TEX文件的导言区准备预编译格式文件，并复制到编译目录
+        
+        格式文件按编译器、编译器版本和导言区内容的哈希缓存。XeTeX无法将系统字体写入格式文件，
+        因此只对pdflatex启用；mylatexformat不可用或生成失败时返回None，按常规方式编译
+        
+        Args:
+            temp_dir: 编译所在的临时目录
+            tex_basename: TEX文件名
+            compiler: 编译器名称
+            timeout: 生成格式文件的超时时间（秒）
+            
+        Returns:
+            Optional[str]: 可传给-fmt参数的格式名称
+        """
+        if compiler != "pdflatex" or not _has_mylatexformat():
+            return None
+        
+        try:
+            with open(os.path.join(temp_dir, tex_basename), 'r', encoding='utf-8') as f:
+                tex_content = f.read()
+        except OSError:
+            return None
+        
+        preamble_end = tex_content.find(_PREAMBLE_END)
+        if preamble_end == -1:
+            return None
+        
+        digest = hashlib.sha256(
+            f"{compiler}\n{_compiler_version(compiler)}\n{tex_content[:preamble_end]}".encode('utf-8')
+        ).hexdigest()
+        fmt_name = f"preamble_{digest[:16]}"
+        fmt_basename = f"{fmt_name}.fmt"
+        cached_fmt = os.path.join(FORMAT_CACHE_DIR, fmt_basename)
+        
+        if not os.path.exists(cached_fmt):
+            cmd = [
+                compiler, "-ini", "-shell-escape", "-interaction=nonstopmode",
+                f"-jobname={fmt_name}", f"&{compiler}", "mylatexformat.ltx", tex_basename
+            ]
+            self.logger.info(f"生成导言区格式文件: {' '.join(cmd)}")
+            try:
+                process = subprocess.run(
+                    cmd,
+                    cwd=temp_dir,
+                    capture_output=True,
+                    text=True,
+                    timeout=timeout
+                )
+            except (OSError, subprocess.TimeoutExpired) as e:
+                self.logger.warning(f"生成导言区格式文件失败: {str(e)}")
+                return None
+            
+            built_fmt = os.path.join(temp_dir, fmt_basename)
+            if process.returncode != 0 or not os.path.exists(built_fmt):
+                self.logger.warning("生成导言区格式文件失败，使用常规编译")
+                return None
+            
+            os.makedirs(FORMAT_CACHE_DIR, exist_ok=True)
+            tmp_fmt = f"{cached_fmt}.{os.getpid()}.tmp"
+            shutil.copy2(built_fmt, tmp_fmt)
+            os.replace(tmp_fmt, cached_fmt)
+            return fmt_name
+        
+        # 格式文件需位于编译目录中才能被-fmt找到
+        shutil.copy2(cached_fmt, os.path.join(temp_dir, fmt_basename))
+        return fmt_name
+    
+    def _discard_format(self, fmt_name: str):
+        """
+        删除缓存的格式文件
+
+        Args:
+            fmt_name: 格式名称
+        """
+        try:
+            os.remove(os.path.join(FORMAT_CACHE_DIR, f"{fmt_name}.fmt"))
+            self.logger.info(f"已删除无法使用的格式文件: {fmt_name}")
+        except OSError:
+            pass
+    
     def _process_image_references(self, tex_file: str, images_dir: str):
         """
         处理TEX文件中的图片引用，更新图片路径
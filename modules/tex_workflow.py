@@ -166,9 +166,6 @@ class TexWorkflow:
                         
                         self.logger.info(f"已保存修复后的代码: {output_tex}")
                         
-                        # 等待1秒再次尝试编译
-                        time.sleep(1)
-                        
             if success:
                 return True, "TEX生成和编译成功", pdf_path
             else:
@@ -547,9 +544,6 @@ def run_revision_tex_workflow(
                         f.write(fixed_tex_code)
                     
                     logging.info(f"已保存修复后的代码: {tex_path}")
-                    
-                    # 等待1秒再次尝试编译
-                    time.sleep(1)
         
         if not success:
             logging.error(f"编译修订版TEX文件失败: {error_message}")
@@ -652,7 +646,6 @@ def run_direct_tex_workflow(
                         f.write(fixed_tex_code)
                     
                     logging.info(f"已保存修复后的代码: {tex_path}")
-                    time.sleep(1)
         
         if success:
             return True, "直接TEX生成和编译成功", pdf_path